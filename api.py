@@ -0,0 +1,43 @@
+"""
+Async JSON API for mobile clients, sharing the Flask app's database and models.
+
+    JWT_SECRET=... uvicorn api:api --workers 4
+
+Authenticate with POST /auth/login and send the token as
+`Authorization: Bearer <token>`. Tokens are signed with JWT_SECRET (at least
+32 random bytes), which every worker must share; the API refuses to start
+without it unless TESTING is set.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+
+from auth_router import auth_router
+from api_router import api_router
+from api_core import engine, flask_app
+from dietitian import rules
+from dietitian.schema import ensure_schema
+from migrations import LEASE_SECONDS
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    if flask_app.config['AUTO_CREATE_SCHEMA']:
+        with flask_app.app_context():
+            ensure_schema(wait=LEASE_SECONDS)    # before serving, unlike a Flask worker's first request
+    yield
+    await engine.dispose()
+
+
+api = FastAPI(title="Ayurvedic Diet Planner API", lifespan=lifespan)
+api.include_router(auth_router)
+api.include_router(api_router, prefix="/api/v1")
+
+
+@api.middleware("http")
+async def refresh_rules(request: Request, call_next):
+    """Pick up an edited rule pack, like the Flask app's before_request (a stat() at most every RULES_CHECK_INTERVAL)."""
+    if rules.refresh_due():
+        await run_in_threadpool(rules.refresh)
+    return await call_next(request)
@@ -0,0 +1,107 @@
+"""
+Shared plumbing for the async JSON API (api.py): async database sessions on the
+same database and models as the Flask app, password hashing off the event
+loop, and JWT issue/verify.
+"""
+import asyncio
+import datetime
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import db_profiles
+from dietitian import create_app
+from dietitian.auth import PatientView
+from dietitian.models import Patient, db
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+# the Flask app supplies configuration and an app context for the shared sync helpers
+flask_app = create_app()
+
+JWT_ALGORITHM = "HS256"
+JWT_MIN_SECRET_BYTES = 32       # shorter HS256 keys can be brute-forced (PyJWT warns)
+JWT_TTL = datetime.timedelta(hours=int(os.environ.get("JWT_TTL_HOURS", "12")))
+
+# ---- Async database ----
+with flask_app.app_context():
+    _sync_url = db.engine.url          # Flask-SQLAlchemy has resolved relative SQLite paths here
+_async_url = _sync_url.set(drivername=ASYNC_DRIVERS[_sync_url.get_backend_name()])
+engine = create_async_engine(
+    _async_url, **db_profiles.engine_options(flask_app.config['DB_PROFILE'], str(_sync_url)))
+db_profiles.install(engine.sync_engine, flask_app.config['DB_PROFILE'])
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def get_db():
+    async with SessionLocal() as session:
+        yield session
+
+
+# ---- Passwords ----
+# Hashing is deliberately slow; run it in a small pool so it never blocks the loop.
+_hash_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("HASH_WORKERS", "4")),
+                                thread_name_prefix="hasher")
+
+
+class Hasher:
+    @staticmethod
+    async def hash_password(password):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_pool, generate_password_hash, password)
+
+    @staticmethod
+    async def verify_password(password, hashed):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_pool, check_password_hash, hashed, password)
+
+
+# ---- JWT ----
+def _jwt_secret():
+    """JWT_SECRET from the environment (a throwaway one under TESTING); refuse to start without a strong one."""
+    secret = os.environ.get("JWT_SECRET")
+    if not secret and flask_app.testing:
+        return secrets.token_urlsafe(JWT_MIN_SECRET_BYTES)
+    if not secret:
+        raise RuntimeError("JWT_SECRET is not set; anyone could sign tokens with a default key. Set it to a "
+                           "random value, e.g. python -c 'import secrets; print(secrets.token_urlsafe(32))'")
+    if len(secret.encode()) < JWT_MIN_SECRET_BYTES:
+        raise RuntimeError(f"JWT_SECRET must be at least {JWT_MIN_SECRET_BYTES} bytes")
+    return secret
+
+
+JWT_SECRET = _jwt_secret()
+
+
+def create_access_token(claims):
+    payload = dict(claims)
+    payload["exp"] = datetime.datetime.now(datetime.timezone.utc) + JWT_TTL
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def decode_access_token(token):
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def current_patient(credentials: HTTPAuthorizationCredentials = Depends(_bearer), session=Depends(get_db)):
+    """Slim PatientView for the bearer token's user."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    claims = decode_access_token(credentials.credentials)
+    columns = [getattr(Patient, f) for f in PatientView._fields]
+    row = (await session.execute(db.select(*columns).where(Patient.id == claims.get("user_id")))).first()
+    if row is None:
+        raise HTTPException(status_code=401, detail="Unknown user")
+    return PatientView(*row)
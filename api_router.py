@@ -0,0 +1,160 @@
+import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_core import current_patient, flask_app, get_db
+from dietitian import queries
+from dietitian.catalog import meal_resolver, nutrition_summary as summarize
+from dietitian.history import meal_records, reaches_archive
+from dietitian.models import MealLog
+from dietitian.plans import plan_bundle
+from dietitian.recommendations import loaded_recommender, recommend_for, recommender_observe
+from dietitian.rollup import ROLLUP_FIELDS, daily_nutrition_upserts, meal_rows
+from dietitian.sync import SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, CursorAhead, seq_bump, stamp, sync as sync_changes
+from api_schemas import EatenIn, MealOut, MealsIn, NutritionSummary, SyncIn
+
+api_router = APIRouter(tags=["Patient"])
+
+
+# ------------------------------
+# MEAL LOGGING
+# ------------------------------
+@api_router.get("/meals", response_model=List[MealOut])
+async def list_meals(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+                     patient=Depends(current_patient), db: AsyncSession = Depends(get_db)):
+    end = end or datetime.date.today()
+    start = start or end - datetime.timedelta(days=7)
+    with flask_app.app_context():
+        archived = reaches_archive(start)
+    if archived:
+        return await run_in_threadpool(_history, patient.id, start, end)
+    rows = await db.scalars(queries.meals_between(patient.id, start, end))
+    return rows.all()
+
+
+@api_router.post("/meals", status_code=201)
+async def log_meals(body: MealsIn, patient=Depends(current_patient), db: AsyncSession = Depends(get_db)):
+    meals = [{**m.model_dump(), "date": m.date.isoformat() if m.date else None} for m in body.meals]
+    try:
+        rows, deltas = meal_rows(patient.id, meals)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    existing = []
+    if loaded_recommender() is not None:
+        existing = (await db.execute(
+            select(MealLog.date, MealLog.food)
+            .where(MealLog.patient_id == patient.id, MealLog.date.in_({r["date"] for r in rows})))).all()
+    stamp(rows, (await db.execute(seq_bump(patient.id, len(rows)))).scalar_one())
+    await db.execute(insert(MealLog), rows)
+    for stmt in daily_nutrition_upserts(deltas, db.bind.dialect.name):
+        await db.execute(stmt)
+    await db.commit()
+    recommender_observe(rows, existing)
+    return {"inserted": len(rows)}
+
+
+@api_router.post("/meals/eaten")
+async def mark_eaten(body: EatenIn, patient=Depends(current_patient), db: AsyncSession = Depends(get_db)):
+    seq = (await db.execute(seq_bump(patient.id))).scalar_one()
+    changed = await db.execute(queries.mark_eaten(patient.id, body.ids, seq))
+    deltas, eaten_foods = {}, []
+    for m in changed:
+        delta = deltas.setdefault((patient.id, m.date), {"eaten_count": 0})
+        delta["eaten_count"] += 1
+        eaten_foods.append(m.food)
+    for stmt in daily_nutrition_upserts(deltas, db.bind.dialect.name):
+        await db.execute(stmt)
+    await db.commit()
+    recommender_observe([], [], eaten_foods)
+    return {"updated": sum(d["eaten_count"] for d in deltas.values())}
+
+
+def _history(patient_id, start, end):
+    with flask_app.app_context():
+        rows = list(meal_records([patient_id], start, end))
+    rows.sort(key=lambda m: (-m.date.toordinal(), m.id))
+    return rows
+
+
+# ------------------------------
+# DELTA SYNC
+# ------------------------------
+@api_router.get("/sync")
+async def get_changes(cursor: int = Query(0, ge=0), limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+                      patient=Depends(current_patient)):
+    """Changes to the patient's meals and profile since cursor (0: everything). See dietitian/sync.py."""
+    return await run_in_threadpool(_sync, patient, cursor, None, limit)
+
+
+@api_router.post("/sync")
+async def push_changes(body: SyncIn, limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+                       patient=Depends(current_patient)):
+    """Apply offline edits, then return the changes since body.cursor with "applied" and "conflicts"."""
+    return await run_in_threadpool(_sync, patient, body.cursor, body.changes, limit)
+
+
+def _sync(patient, cursor, changes, limit):
+    with flask_app.app_context():
+        try:
+            return sync_changes(patient.id, cursor, changes, limit)
+        except CursorAhead as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# PLAN AND NUTRITION
+# ------------------------------
+@api_router.get("/suggestions")
+async def suggestions(k: int = Query(5, ge=1, le=20), patient=Depends(current_patient)):
+    items, history_size = await run_in_threadpool(_recommend, patient, k)
+    return {"recommended_items": items, "history_items": history_size}
+
+
+def _recommend(patient, k):
+    with flask_app.app_context():
+        return recommend_for(patient, k)
+
+
+@api_router.get("/plan")
+async def get_plan(patient=Depends(current_patient)):
+    if not patient.prakriti:
+        raise HTTPException(status_code=409, detail="Fill the questionnaire first")
+    bundle = await run_in_threadpool(_plan_bundle, patient)
+    return {
+        "prakriti": patient.prakriti, "agni": patient.agni, "ama": patient.ama,
+        "plan": bundle["plan"], "nutrition": bundle["nutrition"], "evaluation": bundle["evaluation"],
+    }
+
+
+def _plan_bundle(patient):
+    with flask_app.app_context():
+        return plan_bundle(patient)
+
+
+@api_router.get("/nutrition/summary", response_model=NutritionSummary)
+async def nutrition_summary(date: Optional[datetime.date] = None,
+                            patient=Depends(current_patient), db: AsyncSession = Depends(get_db)):
+    date = date or datetime.date.today()
+    rows = (await db.execute(
+        queries.meals_on(patient.id, date).with_only_columns(MealLog.meal, MealLog.food))).all()
+    items = [food or meal_resolver().resolve(meal) or meal for meal, food in rows]
+    total, details = summarize(items)
+    return {"date": date, "items": items, "total": total, "details": details}
+
+
+@api_router.get("/nutrition/trend")
+async def nutrition_trend(days: int = Query(30, ge=1, le=366),
+                          patient=Depends(current_patient), db: AsyncSession = Depends(get_db)):
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    rows = await db.scalars(queries.daily_nutrition_between(patient.id, start, end))
+    return {
+        "start": start.isoformat(), "end": end.isoformat(),
+        "days": [{"date": r.date.isoformat(), **{f: getattr(r, f) for f in ROLLUP_FIELDS}} for r in rows],
+    }
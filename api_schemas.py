@@ -0,0 +1,63 @@
+import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class UserCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=150)
+    email: str = Field(min_length=3, max_length=150)
+    password: str = Field(min_length=1)
+    age: Optional[int] = None
+    allergy: Optional[str] = Field(default=None, max_length=250)
+
+
+class UserOut(BaseModel):
+    id: int
+    name: str
+    email: str
+
+    model_config = {"from_attributes": True}
+
+
+class LoginSchema(BaseModel):
+    email: str
+    password: str
+
+
+class MealIn(BaseModel):
+    meal: str = Field(min_length=1, max_length=250)
+    meal_type: Optional[str] = Field(None, max_length=50)
+    date: Optional[datetime.date] = None
+    eaten: bool = False
+
+
+class MealsIn(BaseModel):
+    meals: List[MealIn] = Field(min_length=1, max_length=500)
+
+
+class MealOut(BaseModel):
+    id: int
+    date: datetime.date
+    meal: str
+    meal_type: Optional[str]
+    food: Optional[str]
+    eaten: bool
+
+    model_config = {"from_attributes": True}
+
+
+class EatenIn(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500)
+
+
+class SyncIn(BaseModel):
+    cursor: int = Field(default=0, ge=0)
+    changes: List[Dict[str, Any]] = Field(default_factory=list, max_length=500)
+
+
+class NutritionSummary(BaseModel):
+    date: datetime.date
+    items: List[str]
+    total: Dict[str, float]
+    details: Dict[str, Dict[str, float]]
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.user import User
-from app.schemas.auth_schema import UserCreate, UserOut, LoginSchema
-from app.database import get_db
-from app.utils.hashing import Hasher
-from app.utils.jwt import create_access_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dietitian.models import Patient as User
+from api_schemas import UserCreate, UserOut, LoginSchema
+from api_core import get_db, Hasher, create_access_token
 
 auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -13,19 +13,20 @@ auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 # REGISTER USER
 # ------------------------------
 @auth_router.post("/register", response_model=UserOut)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    existing_user = (await db.execute(select(User.id).where(User.email == user.email))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     new_user = User(
         name=user.name,
         email=user.email,
-        password=Hasher.hash_password(user.password)
+        age=user.age,
+        allergy=user.allergy,
+        password=await Hasher.hash_password(user.password)
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return new_user
 
@@ -34,13 +35,14 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
 # LOGIN USER
 # ------------------------------
 @auth_router.post("/login")
-async def login_user(credentials: LoginSchema, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == credentials.email).first()
-    
+async def login_user(credentials: LoginSchema, db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(
+        select(User.id, User.password).where(User.email == credentials.email))).first()
+
     if not user:
         raise HTTPException(status_code=400, detail="Invalid email")
 
-    if not Hasher.verify_password(credentials.password, user.password):
+    if not await Hasher.verify_password(credentials.password, user.password):
         raise HTTPException(status_code=400, detail="Incorrect password")
 
     # create JWT access token
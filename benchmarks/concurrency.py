@@ -0,0 +1,124 @@
+"""
+Multi-worker concurrency benchmark for the database engine profiles.
+
+Each worker process imports the app against a shared scratch database (like a
+gunicorn worker would), registers its own patients and drives them through a
+typical session loop: log a meal, open the dashboard, tick the meal just
+logged as eaten, view the meal log and nutrition analysis. Reports throughput, p50/p99 latency and
+failed requests per profile as JSON lines.
+
+The SQLite profiles run against a temporary file. The server profile runs
+against the PostgreSQL/MySQL database given by --database (default
+DATABASE_URL); use a scratch database, the workers add patients and meals.
+
+    python benchmarks/concurrency.py --workers 8 --patients 4 --seconds 10
+    python benchmarks/concurrency.py --profiles sqlite,sqlite-plain --out results.jsonl
+    python benchmarks/concurrency.py --profiles server --database postgresql://localhost/bench
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEALS = ["Khichdi", "Idli", "Dosa", "Poha", "Curd rice", "Pumpkin soup", "Chapati", "Sambar"]
+
+
+def _worker(args):
+    worker_id, uri, profile, patients, seconds, tag = args
+    os.environ["DATABASE_URL"] = uri
+    os.environ["DB_PROFILE"] = profile
+    sys.path.insert(0, ROOT)
+    from app import app
+
+    clients = []
+    for n in range(patients):
+        c = app.test_client()
+        email = f"{tag}w{worker_id}p{n}@bench.local"
+        c.post("/register", data={"name": email, "email": email, "password": "pw"})
+        c.post("/login", data={"email": email, "password": "pw"})
+        clients.append(c)
+
+    latencies, errors = [], 0
+
+    def timed(c, method, url, **kwargs):
+        nonlocal errors
+        t0 = time.perf_counter()
+        r = getattr(c, method)(url, **kwargs)
+        latencies.append(time.perf_counter() - t0)
+        if r.status_code >= 500:
+            errors += 1
+        return r
+
+    deadline = time.perf_counter() + seconds
+    step = 0
+    while time.perf_counter() < deadline:
+        c = clients[step % len(clients)]
+        meal = MEALS[step % len(MEALS)]
+        # the fragment response carries the new row's id, so the tick below updates this patient's meal
+        r = timed(c, "post", "/log_meal", data={"meal_name": meal, "meal_type": "Lunch"},
+                  headers={"X-Fragment": "dashboard"})
+        logged = [m["id"] for m in (r.get_json(silent=True) or {}).get("meals", [])]
+        timed(c, "get", "/dashboard")
+        timed(c, "post", "/update_meal_log", data={f"eaten_{mid}": "on" for mid in logged})
+        timed(c, "get", "/meal_log")
+        timed(c, "get", "/nutrition_analysis")
+        step += 1
+    return latencies, errors
+
+
+def run(profile, workers, patients, seconds, database=None):
+    """database: the server profile's URL (required for it; the SQLite profiles use a temporary file)."""
+    tag = f"r{time.time_ns()}"     # fresh patients on a reused server database
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = database if profile == "server" else f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # create the schema once before the workers race for it
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1) as pool:
+            pool.map(_worker, [(-1, uri, profile, 1, 0, tag)])
+        with ctx.Pool(workers) as pool:
+            results = pool.map(_worker, [(w, uri, profile, patients, seconds, tag) for w in range(workers)])
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = sum(e for _, e in results)
+
+    def pct(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+    return {
+        "profile": profile, "workers": workers, "patients_per_worker": patients,
+        "seconds": seconds, "requests": len(latencies), "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "p50_ms": pct(0.50), "p99_ms": pct(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profiles", default="sqlite,sqlite-plain")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--patients", type=int, default=4, help="simulated patients per worker")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--out", help="append JSON lines to this file")
+    parser.add_argument("--database", default=os.environ.get("DATABASE_URL"),
+                        help="PostgreSQL/MySQL URL for the server profile (default: DATABASE_URL)")
+    args = parser.parse_args()
+    profiles = args.profiles.split(",")
+    if "server" in profiles and (not args.database or args.database.startswith("sqlite")):
+        parser.error("the server profile needs --database (or DATABASE_URL) naming a PostgreSQL or MySQL database")
+
+    for profile in profiles:
+        result = run(profile, args.workers, args.patients, args.seconds, args.database)
+        line = json.dumps(result)
+        print(line)
+        if args.out:
+            with open(args.out, "a") as f:
+                f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
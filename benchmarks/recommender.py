@@ -0,0 +1,95 @@
+"""
+Recommendation query latency at scale.
+
+Builds a CooccurrenceModel from synthetic MealLog history (default 1M logged
+meals in 3-meal patient-days over a 2,000-food catalogue, with a skewed food
+popularity), then times top-k queries for random patient histories with a
+suitability mask, before and after pending incremental updates.
+
+    python benchmarks/recommender.py --meals 1000000 --foods 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recommender import CooccurrenceModel  # noqa: E402
+
+
+def synthetic_baskets(rng, foods, meals, per_day=3):
+    # Zipf-like popularity so the co-occurrence matrix has realistic hot rows
+    weights = 1.0 / np.arange(1, len(foods) + 1)
+    weights /= weights.sum()
+    picks = rng.choice(len(foods), size=meals, p=weights)
+    eaten = rng.random(meals) < 0.7
+    for start in range(0, meals, per_day):
+        ids = picks[start:start + per_day]
+        yield [foods[i] for i in ids], eaten[start:start + per_day].tolist()
+
+
+def percentile(samples, p):
+    return round(float(np.percentile(samples, p)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--meals", type=int, default=1_000_000)
+    parser.add_argument("--foods", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="append the JSON result to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    foods = [f"Food {i}" for i in range(args.foods)]
+
+    t0 = time.perf_counter()
+    model = CooccurrenceModel.build(foods, synthetic_baskets(rng, foods, args.meals))
+    build_s = time.perf_counter() - t0
+
+    allowed = rng.random(len(foods)) < 0.6
+    histories = [
+        {foods[i]: float(w) for i, w in zip(rng.integers(0, len(foods), 20), rng.random(20) + 0.5)}
+        for _ in range(args.queries)
+    ]
+
+    def timed_queries():
+        samples = []
+        for h in histories:
+            t = time.perf_counter()
+            model.top_k(h, k=args.k, allowed=allowed)
+            samples.append(time.perf_counter() - t)
+        return samples
+
+    compacted = timed_queries()
+
+    # a day's worth of incremental updates left uncompacted
+    for foods_today, _ in synthetic_baskets(rng, foods, 30_000):
+        model.record_meals(foods_today[:1], foods_today[1:])
+    pending = model.delta_size
+    with_delta = timed_queries()
+    t0 = time.perf_counter()
+    model.compact()
+    compact_s = time.perf_counter() - t0
+
+    result = {
+        "meals": args.meals, "foods": args.foods, "pairs": int(len(model.data)),
+        "build_s": round(build_s, 2), "compact_s": round(compact_s, 3), "pending_increments": pending,
+        "query_p50_ms": percentile(compacted, 50), "query_p99_ms": percentile(compacted, 99),
+        "query_with_delta_p50_ms": percentile(with_delta, 50),
+        "query_with_delta_p99_ms": percentile(with_delta, 99),
+    }
+    line = json.dumps(result)
+    print(line)
+    if args.out:
+        with open(args.out, "a") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Synthetic clinic data for benchmarks.
+
+Seeds an empty database with patients whose prakriti/agni/ama come from
+scoring randomly answered questionnaires (answers biased towards one dosha
+per patient, so single-dosha types dominate and ties are rarer), and with
+MealLog history: Breakfast/Lunch/Dinner plus an occasional snack on
+consecutive days ending today, mostly picked from the patient's own diet
+plan, some typed as free text, about 70% ticked as eaten. DailyNutrition is
+rebuilt from the result.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --patients 10000 --meals 1000000
+
+Every seeded patient logs in with password `bench` (emails patient<N>@bench.local).
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from dietitian import catalog  # noqa: E402
+from dietitian.models import MealLog, Patient, db  # noqa: E402
+from dietitian.rollup import rebuild_daily_nutrition  # noqa: E402
+from dietitian.schema import ensure_schema, stamp_change_seqs  # noqa: E402
+
+PASSWORD = "bench"
+ALLERGIES = [None, None, None, None, "nut", "dairy", "egg", "gluten", "fish"]
+SNACKS = ["Fruit salad", "Buttermilk", "Coconut water", "Ginger tea", "Smoothie", "masala chai", "Roasted chana"]
+SLOTS = ("Breakfast", "Lunch", "Dinner")
+
+
+def questionnaires(rng, n):
+    """n questionnaire answer dicts, each biased towards a randomly drawn dosha."""
+    from prakriti import DOSHAS, FEATURE_MAP
+
+    lean = rng.choice(len(DOSHAS), size=n, p=[0.4, 0.35, 0.25])
+    rows = []
+    for i in range(n):
+        row = {}
+        for field, answers in FEATURE_MAP.items():
+            favoured = [a for a, d in answers.items() if d == DOSHAS[lean[i]]]
+            pool = favoured if rng.random() < 0.6 else list(answers)
+            row[field] = pool[rng.integers(len(pool))]
+        row["agni"] = ""
+        row["ama_signs"] = "heaviness" if rng.random() < 0.3 else ""
+        rows.append(row)
+    return rows
+
+
+def _typed(rng, name):
+    """How a patient might type a food name."""
+    r = rng.random()
+    if r < 0.5:
+        return name.lower()
+    if r < 0.8:
+        return f"{name} with pickle"
+    return name[:-1] if len(name) > 4 else name
+
+
+def seed(app, patients=1000, meals=100_000, seed=7, chunk_size=10_000, log=print):
+    """Fill app's database. Returns a summary dict."""
+    from prakriti import score_features
+    from werkzeug.security import generate_password_hash
+
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    today = datetime.date.today()
+    per_day = 3.2
+    days = max(1, int(np.ceil(meals / (patients * per_day))))
+    hashed = generate_password_hash(PASSWORD)
+    profiles = score_features(questionnaires(rng, patients))
+
+    with app.app_context():
+        ensure_schema()
+        first_id = (db.session.scalar(db.select(db.func.max(Patient.id))) or 0) + 1
+        rows = [
+            {"id": first_id + i, "name": f"Patient {first_id + i}", "email": f"patient{first_id + i}@bench.local",
+             "password": hashed, "age": int(rng.integers(18, 80)),
+             "allergy": ALLERGIES[rng.integers(len(ALLERGIES))],
+             "prakriti": prakriti, "agni": agni, "ama": ama}
+            for i, (prakriti, agni, ama) in enumerate(profiles)
+        ]
+        for i in range(0, len(rows), chunk_size):
+            db.session.execute(db.insert(Patient), rows[i:i + chunk_size])
+        db.session.commit()
+        log(f"patients: {patients} in {time.perf_counter() - t0:.1f}s")
+
+        plans = {}
+        batch, written = [], 0
+        for n, p in enumerate(rows):
+            key = (p["prakriti"], p["agni"], p["ama"])
+            if key not in plans:
+                plans[key] = catalog.generate_meal_plan(*key)
+            plan = plans[key]
+            for d in range(days):
+                if written + len(batch) >= meals:
+                    break
+                day = today - datetime.timedelta(days=days - 1 - d)
+                names = []
+                for slot, fallback in zip(SLOTS, (catalog.breakfast_list, catalog.lunch_list, catalog.dinner_list)):
+                    pool = plan.get(slot) if plan.get(slot) and rng.random() < 0.7 else fallback
+                    names.append((slot, pool[rng.integers(len(pool))]))
+                if rng.random() < per_day - len(SLOTS):
+                    names.append(("Snack", SNACKS[rng.integers(len(SNACKS))]))
+                for slot, name in names:
+                    meal = _typed(rng, name) if rng.random() < 0.15 else name
+                    batch.append({"patient_id": p["id"], "date": day, "meal": meal, "meal_type": slot,
+                                  "food": catalog.meal_resolver().resolve(meal), "eaten": bool(rng.random() < 0.7)})
+            if len(batch) >= chunk_size or n == len(rows) - 1:
+                batch = batch[:meals - written]
+                if batch:
+                    db.session.execute(db.insert(MealLog), batch)
+                    db.session.commit()
+                written += len(batch)
+                batch = []
+        log(f"meals: {written} over {days} days in {time.perf_counter() - t0:.1f}s")
+        with db.engine.begin() as conn:
+            stamp_change_seqs(conn)         # bulk inserts skip the sync sequence
+
+        rollup = rebuild_daily_nutrition()
+        log(f"daily nutrition: {rollup} patient-days in {time.perf_counter() - t0:.1f}s")
+
+    return {"patients": patients, "meals": written, "days": days, "patient_days": rollup,
+            "first_patient_id": first_id, "seed_s": round(time.perf_counter() - t0, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--meals", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from dietitian import create_app
+
+    summary = seed(create_app(), args.patients, args.meals, args.seed, log=lambda m: print(m, file=sys.stderr))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Worker startup cost.
+
+Each run starts a fresh interpreter that does what a WSGI worker does:
+import the `app` entry point, then serve a first request through the test
+client (which is where lazily created state - schema, catalogue tables,
+numpy-backed helpers - gets paid for). Reports the median and max import
+time, first-request time and peak RSS, plus the slowest modules from
+`python -X importtime` in one extra run, as one JSON line.
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --runs 10 --out startup.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from app import app
+t1 = time.perf_counter()
+client = app.test_client()
+status = client.get('/login').status_code
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_request_s": t2 - t1, "status": status,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def probe(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    """The `top` slowest top-level packages to import, from -X importtime."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # top-level packages, wherever first imported (times can overlap when one imports another)
+        if cumulative.strip().isdigit() and "." not in name and name not in ("app", "site"):
+            rows.append((int(cumulative) / 1000, name))
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to report")
+    parser.add_argument("--out", help="append the JSON result to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        probe(env)   # first boot creates the schema; measure warm restarts like a worker pool does
+        runs = [probe(env) for _ in range(args.runs)]
+        imports = slowest_imports(env, args.top)
+
+    def summary(key, scale=1000, unit="ms"):
+        values = [r[key] * scale for r in runs]
+        return {f"{key[:-2]}_p50_{unit}": round(statistics.median(values), 1),
+                f"{key[:-2]}_max_{unit}": round(max(values), 1)}
+
+    result = {
+        "runs": args.runs,
+        **summary("import_s"), **summary("first_request_s"),
+        "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+        "status": sorted({r["status"] for r in runs}),
+        "slowest_imports": imports,
+    }
+    line = json.dumps(result)
+    print(line)
+    if args.out:
+        with open(args.out, "a") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Benchmark suite: micro-benchmarks of the analysis helpers plus end-to-end
+timing of every Flask route through the test client, against a database
+seeded by benchmarks/seed.py.
+
+Results are written as one JSON document (run metadata, then p50/p99/mean
+per benchmark) so runs can be compared; --compare prints the p50 ratio
+against an earlier result file and exits non-zero when any benchmark got
+slower than --threshold.
+
+    python benchmarks/suite.py --patients 10000 --meals 1000000 --out bench.json
+    python benchmarks/suite.py --out new.json --compare bench.json
+    python benchmarks/suite.py --database sqlite:///bench.db --no-seed   # reuse a seeded database
+
+Seeding goes to a temporary database unless --database names one, which
+must then be empty; DATABASE_URL is only used with --no-seed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from seed import PASSWORD, questionnaires, seed  # noqa: E402
+
+from dietitian import catalog, create_app  # noqa: E402
+from dietitian.exports import export_jobs  # noqa: E402
+from dietitian.models import MealLog, Patient, db  # noqa: E402
+from dietitian.schema import ensure_schema  # noqa: E402
+
+
+def stats(samples):
+    ms = np.asarray(samples) * 1000
+    return {"n": len(ms), "mean_ms": round(float(ms.mean()), 4),
+            "p50_ms": round(float(np.percentile(ms, 50)), 4), "p99_ms": round(float(np.percentile(ms, 99)), 4)}
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def micro_benchmarks(rng, n):
+    from prakriti import analyze_prakriti_and_agni_ama, score_features
+
+    profiles = sorted({(p.prakriti, p.agni, p.ama, p.allergy or "")
+                       for p in db.session.execute(
+                           db.select(Patient.prakriti, Patient.agni, Patient.ama, Patient.allergy).limit(5000))})
+    foods = list(catalog.nutrition_db)
+
+    def pick(seq):
+        return seq[rng.integers(len(seq))]
+
+    evaluate_args = []
+    for _ in range(n):
+        prakriti, agni, ama, allergy = pick(profiles)
+        evaluate_args.append((pick(foods), prakriti, agni, ama, [a.strip() for a in allergy.split(",") if a]))
+    summary_args = [([pick(foods) for _ in range(10)],) for _ in range(n)]
+    analyze_args = [(q,) for q in questionnaires(rng, n)]
+    plan_args = [pick(profiles)[:3] for _ in range(n)]
+    batch = questionnaires(rng, 1000)
+
+    return {
+        "evaluate_food": stats(timed(catalog.evaluate_food, evaluate_args)),
+        "nutrition_summary": stats(timed(catalog.nutrition_summary, summary_args)),
+        "analyze_prakriti_and_agni_ama": stats(timed(analyze_prakriti_and_agni_ama, analyze_args)),
+        "score_features_1000": stats(timed(score_features, [(batch,)] * max(1, n // 100))),
+        "generate_meal_plan": stats(timed(catalog.generate_meal_plan, plan_args)),
+    }
+
+
+def route_benchmarks(app, patient_id, n):
+    """Time every route as a logged-in seeded patient; `n` requests per route after one warm-up."""
+    c = app.test_client()
+    email = f"patient{patient_id}@bench.local"
+    today = datetime.date.today().isoformat()
+    with app.app_context():
+        jobs = export_jobs()
+        meal_ids = db.session.scalars(
+            db.select(MealLog.id).where(MealLog.patient_id == patient_id)
+            .order_by(MealLog.id.desc()).limit(n + 1)).all()
+    counter = iter(range(10 ** 9))
+    job = {}
+
+    def start_export():
+        r = c.get(f"/export_diet?start={today}")
+        job["id"] = r.headers["Location"].rstrip("/").split("/")[-1]
+        return r
+
+    def download():
+        if "id" not in job:
+            start_export()
+        deadline = time.time() + 60
+        while jobs.status(job["id"])["state"] == "running" and time.time() < deadline:
+            time.sleep(0.05)
+
+    def downloaded(r):
+        # a failed job's download redirects back to its status page
+        return (jobs.status(job["id"])["state"] == "done"
+                and r.status_code == 200 and r.mimetype == "application/pdf")
+
+    # (name, request factory, optional setup run untimed before each request,
+    #  optional check of the response; by default any status below 400 passes)
+    routes = [
+        ("GET /", lambda: c.get("/"), None),
+        ("GET /register", lambda: c.get("/register"), None),
+        ("POST /register", lambda: c.post("/register", data={
+            "name": "New", "email": f"new{next(counter)}-{time.time_ns()}@bench.local", "password": "pw"}), None),
+        ("GET /login", lambda: c.get("/login"), None),
+        ("POST /login", lambda: c.post("/login", data={"email": email, "password": PASSWORD}), None),
+        ("GET /dashboard", lambda: c.get("/dashboard"), None),
+        ("GET /questionnaire", lambda: c.get("/questionnaire"), None),
+        ("GET /diet_plan_page", lambda: c.get("/diet_plan_page"), None),
+        ("POST /log_meal", lambda: c.post("/log_meal", data={"meal_name": "Khichdi", "meal_type": "Lunch"}), None),
+        ("POST /update_meal_log", lambda: c.post(
+            "/update_meal_log", data={f"eaten_{meal_ids.pop()}": "on"} if meal_ids else {}), None),
+        ("GET /meal_log", lambda: c.get("/meal_log"), None),
+        ("GET /nutrition_analysis", lambda: c.get("/nutrition_analysis"), None),
+        ("GET /profile", lambda: c.get("/profile"), None),
+        ("GET /export_diet", start_export, None),
+        ("GET /exports/<job_id>", lambda: c.get(f"/exports/{job['id']}?format=json"), None),
+        ("GET /exports/<job_id>/download", lambda: c.get(f"/exports/{job['id']}/download"), download,
+         downloaded),
+        ("POST /api/meals/bulk", lambda: c.post("/api/meals/bulk", json={"meals": [
+            {"meal": m, "meal_type": "Snack", "date": today} for m in ("Buttermilk", "Fruit salad", "Idli")]}), None),
+        ("GET /api/nutrition/trend", lambda: c.get("/api/nutrition/trend?days=30"), None),
+        ("GET /api/plan/optimized", lambda: c.get("/api/plan/optimized?calories=1800&protein=60"), None),
+        ("GET /api/plan/optimized?days=7", lambda: c.get("/api/plan/optimized?days=7"), None),
+        ("POST /api/ml/suggest", lambda: c.post("/api/ml/suggest", json={"k": 5}), None),
+        ("GET /logout", lambda: c.get("/logout"), None),
+    ]
+
+    c.post("/login", data={"email": email, "password": PASSWORD})
+    results = {}
+    for name, request, setup, *check in routes:
+        ok = check[0] if check else (lambda r: r.status_code < 400)
+        samples, errors = [], 0
+        for i in range(n + 1):
+            if name == "GET /logout":
+                c.post("/login", data={"email": email, "password": PASSWORD})
+            if setup:
+                setup()
+            t = time.perf_counter()
+            r = request()
+            elapsed = time.perf_counter() - t
+            if not ok(r):
+                errors += 1
+            if i:
+                samples.append(elapsed)
+        results[name] = {**stats(samples), "errors": errors}
+    return results
+
+
+def metadata(app, summary):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+        "platform": platform.platform(), "db_profile": app.config["DB_PROFILE"], "data": summary,
+    }
+
+
+def compare(result, baseline, threshold):
+    """Print p50 ratios against `baseline`; return the names that regressed beyond `threshold`."""
+    regressed = []
+    for group in ("micro", "routes"):
+        for name, new in result[group].items():
+            old = baseline.get(group, {}).get(name)
+            if not old or not old["p50_ms"]:
+                continue
+            ratio = new["p50_ms"] / old["p50_ms"]
+            flag = ""
+            if ratio > threshold:
+                regressed.append(f"{group}:{name}")
+                flag = "  REGRESSION"
+            print(f"{group:6} {name:36} {old['p50_ms']:10.4f} -> {new['p50_ms']:10.4f} ms  x{ratio:.2f}{flag}",
+                  file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--meals", type=int, default=100_000)
+    parser.add_argument("--database", help="database URL to seed (must be empty) or, with --no-seed, to reuse "
+                                           "(default: a temporary SQLite file, or DATABASE_URL with --no-seed)")
+    parser.add_argument("--no-seed", action="store_true", help="use the existing database's data as is")
+    parser.add_argument("--micro-n", type=int, default=5000, help="calls per micro-benchmark")
+    parser.add_argument("--route-n", type=int, default=50, help="requests per route")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 ratio counted as a regression")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    elif not args.no_seed:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    app = create_app()
+
+    log = lambda m: print(m, file=sys.stderr)  # noqa: E731
+    if args.no_seed:
+        with app.app_context():
+            patient_id = db.session.scalar(
+                db.select(Patient.id).where(Patient.email.like("patient%@bench.local")).limit(1))
+        if patient_id is None:
+            parser.error("--no-seed needs a database seeded by benchmarks/seed.py")
+        summary = {"seeded": False}
+    else:
+        with app.app_context():
+            ensure_schema()
+            if db.session.scalar(db.select(Patient.id).limit(1)) is not None:
+                parser.error(f"{args.database} already has patients; seed an empty database or pass --no-seed")
+        summary = seed(app, args.patients, args.meals, args.seed, log=log)
+        patient_id = summary["first_patient_id"]
+
+    rng = np.random.default_rng(args.seed)
+    with app.app_context():
+        micro = micro_benchmarks(rng, args.micro_n)
+    log("micro-benchmarks done")
+    routes = route_benchmarks(app, patient_id, args.route_n)
+    log("route benchmarks done")
+
+    result = {"meta": metadata(app, summary), "micro": micro, "routes": routes}
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(result, json.load(f), args.threshold)
+    if tmp:
+        tmp.cleanup()
+    if regressed:
+        sys.exit(f"{len(regressed)} benchmark(s) regressed: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Database engine profiles.
+
+The profile is picked from DB_PROFILE (or from the DATABASE_URL scheme) and
+supplies SQLALCHEMY_ENGINE_OPTIONS plus per-connection setup:
+
+    sqlite        WAL journal, synchronous=NORMAL, busy_timeout and a larger
+                  page cache so readers don't block behind writers and
+                  concurrent writers wait instead of failing with
+                  "database is locked".
+    sqlite-plain  SQLite with driver defaults (kept for benchmarking).
+    server        Pool sizing, pre-ping and recycling for PostgreSQL/MySQL.
+"""
+import os
+
+from sqlalchemy import event
+
+DEFAULT_URI = "sqlite:///database.db"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,      # ms
+    "cache_size": -20000,      # negative = KiB, ~20 MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+PROFILES = {
+    "sqlite": {
+        "pragmas": SQLITE_PRAGMAS,
+        "engine_options": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10,
+                           "connect_args": {"timeout": 5}},
+    },
+    "sqlite-plain": {
+        "pragmas": {},
+        "engine_options": {},
+    },
+    "server": {
+        "pragmas": {},
+        "engine_options": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10,
+                           "pool_pre_ping": True, "pool_recycle": 1800},
+    },
+}
+
+
+def database_uri():
+    return os.environ.get("DATABASE_URL", DEFAULT_URI)
+
+
+def profile_name(uri):
+    name = os.environ.get("DB_PROFILE")
+    if name:
+        if name not in PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {', '.join(PROFILES)}")
+        return name
+    return "sqlite" if uri.startswith("sqlite") else "server"
+
+
+def engine_options(name, uri):
+    options = dict(PROFILES[name]["engine_options"])
+    if uri in ("sqlite://", "sqlite:///") or (uri.startswith("sqlite") and ":memory:" in uri):
+        # a private in-memory database can't be pooled across connections
+        options = {k: v for k, v in options.items() if not k.startswith("pool") and k != "max_overflow"}
+    return options
+
+
+def install(engine, name):
+    """Apply the profile's per-connection pragmas to every new DBAPI connection."""
+    pragmas = PROFILES[name]["pragmas"]
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
@@ -0,0 +1,92 @@
+"""
+Ayurvedic diet planner web app.
+
+create_app() builds a configured app. Importing the package does no I/O and
+builds no lookup tables:
+
+- the schema is created/upgraded by versioned migrations on first use
+  (first request or `flask` command), or explicitly with `flask migrate`
+  when AUTO_CREATE_SCHEMA is off; index builds and row backfills run
+  after startup on a background thread, backfills in throttled batches
+  (schema.py);
+- NumPy-backed helpers (nutrient table, prakriti scoring, optimizer,
+  recommender) and FPDF are imported by the code that needs them;
+- the diet rule pack (RULE_PACK, default rules/default.json) is read on
+  first use and reloaded when the file changes;
+- an imported food catalogue (FOOD_CATALOGUE, default instance/foods.fcat
+  when present) is memory-mapped, not read: workers share its pages;
+- archived meal history (ARCHIVE_DIR, default instance/archive) is only
+  opened by the reads that reach back past ARCHIVE_AFTER_DAYS.
+
+    flask --app app run                 # app.py is the WSGI entry point
+    gunicorn 'dietitian:create_app()'
+
+Live dashboard streams (LIVE_STREAMS, default 0: off) each hold a worker
+thread, so they need threaded or gevent workers; see live.py.
+
+benchmarks/startup.py tracks what worker boot costs.
+"""
+import os
+
+import db_profiles
+import migrations
+from export_jobs import EXPORT_JOB_TIMEOUT, EXPORT_WORKERS, ExportJobs
+from flask import Flask
+from meal_archive import MealArchive
+
+from . import catalog, cli, history, instrumentation, live, plans, practitioner, rules, schema, views
+from .models import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_app(config=None):
+    """New app; `config` overrides the defaults and the environment (DATABASE_URL, DB_PROFILE, ...)."""
+    app = Flask(__name__, template_folder=os.path.join(ROOT, "templates"),
+                static_folder=os.path.join(ROOT, "static"))
+    app.secret_key = "change_this_in_production"
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_profiles.database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = os.environ.get("TESTING", "0") not in ("0", "false", "no")
+    app.config['AUTO_CREATE_SCHEMA'] = os.environ.get("AUTO_CREATE_SCHEMA", "1") not in ("0", "false", "no")
+    app.config['BACKGROUND_BACKFILLS'] = os.environ.get("BACKGROUND_BACKFILLS", "1") not in ("0", "false", "no")
+    app.config['MIGRATION_BATCH_SIZE'] = int(os.environ.get("MIGRATION_BATCH_SIZE", migrations.BATCH_SIZE))
+    app.config['MIGRATION_PAUSE'] = float(os.environ.get("MIGRATION_PAUSE", 0.05))        # s between batches
+    app.config['MIGRATION_MAX_LOAD'] = float(os.environ.get("MIGRATION_MAX_LOAD", 0.5))   # busy share of the time
+    app.config['SLOW_REQUEST_MS'] = float(os.environ["SLOW_REQUEST_MS"]) if os.environ.get("SLOW_REQUEST_MS") else None
+    app.config['RULE_PACK'] = os.environ.get("RULE_PACK", rules.DEFAULT_RULE_PACK)
+    app.config['FOOD_CATALOGUE'] = os.environ.get("FOOD_CATALOGUE") or None
+    app.config['ARCHIVE_DIR'] = os.environ.get("ARCHIVE_DIR") or None
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get("ARCHIVE_AFTER_DAYS", history.ARCHIVE_AFTER_DAYS))
+    app.config['LIVE_STREAMS'] = int(os.environ.get("LIVE_STREAMS", 0))      # open SSE streams per process
+    app.config['EXPORT_WORKERS'] = int(os.environ.get("EXPORT_WORKERS", EXPORT_WORKERS))
+    app.config['EXPORT_JOB_TIMEOUT'] = int(os.environ.get("EXPORT_JOB_TIMEOUT", EXPORT_JOB_TIMEOUT))
+    app.config.update(config or {})
+    app.config.setdefault('DB_PROFILE', db_profiles.profile_name(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', db_profiles.engine_options(
+        app.config['DB_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI']))
+
+    db.init_app(app)
+    with app.app_context():
+        db_profiles.install(db.engine, app.config['DB_PROFILE'])
+
+    app.extensions["dietitian"] = {
+        "schema_ready": False,
+        "export_jobs": ExportJobs(os.path.join(app.instance_path, "exports"), app.config['EXPORT_WORKERS'],
+                                  app.config['EXPORT_JOB_TIMEOUT'], on_render=instrumentation.pdf_render_seconds.observe),
+        "meal_archive": MealArchive(app.config['ARCHIVE_DIR'] or os.path.join(app.instance_path, "archive")),
+        "live_streams": live.stream_slots(app.config['LIVE_STREAMS']),
+    }
+    if app.config['AUTO_CREATE_SCHEMA']:
+        app.before_request(schema.ensure_schema)
+    if app.config['FOOD_CATALOGUE'] is None and os.path.exists(os.path.join(app.instance_path, "foods.fcat")):
+        app.config['FOOD_CATALOGUE'] = os.path.join(app.instance_path, "foods.fcat")
+    catalog.use_store(app.config['FOOD_CATALOGUE'])
+    plans.invalidate_plans()
+    rules.configure(app.config['RULE_PACK'], on_swap=plans.invalidate_plans)
+    app.before_request(rules.refresh)
+    instrumentation.init_app(app)
+    app.register_blueprint(views.bp)
+    app.register_blueprint(practitioner.bp)
+    app.register_blueprint(cli.bp)
+    return app
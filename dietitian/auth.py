@@ -0,0 +1,90 @@
+"""Request-scoped patient (g.patient) / practitioner (g.practitioner) and the decorators that load them."""
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import g, jsonify, redirect, session, url_for
+
+from .models import Patient, Practitioner, db
+
+# Routes only need a few patient fields, never the password hash. The slim
+# projection is loaded once per request into g.patient and kept in a short
+# TTL process cache keyed by Patient.profile_seq, which every profile change
+# moves (sync.profile_bump) whatever session or worker made it; checking it
+# is a single-column primary key read.
+PATIENT_CACHE_TTL = 30        # seconds
+PATIENT_CACHE_SIZE = 10000
+
+PatientView = namedtuple("PatientView", ["id", "name", "age", "email", "prakriti", "agni", "ama", "allergy"])
+_patient_cache = {}
+_patient_lock = threading.Lock()
+patient_cache_stats = {"hits": 0, "misses": 0}
+
+
+def load_patient(patient_id):
+    version = db.session.scalar(db.select(Patient.profile_seq).where(Patient.id == patient_id))
+    if version is None:
+        invalidate_patient(patient_id)
+        return None
+    now = time.monotonic()
+    hit = _patient_cache.get(patient_id)
+    if hit and hit[0] == version and hit[1] > now:
+        patient_cache_stats["hits"] += 1
+        return hit[2]
+    patient_cache_stats["misses"] += 1
+    columns = [getattr(Patient, f) for f in PatientView._fields]
+    row = db.session.execute(db.select(Patient.profile_seq, *columns).where(Patient.id == patient_id)).first()
+    if row is None:
+        invalidate_patient(patient_id)
+        return None
+    view = PatientView(*row[1:])
+    with _patient_lock:
+        if patient_id not in _patient_cache and len(_patient_cache) >= PATIENT_CACHE_SIZE:
+            _patient_cache.pop(next(iter(_patient_cache)), None)
+        _patient_cache[patient_id] = (row[0], now + PATIENT_CACHE_TTL, view)
+    return view
+
+
+def invalidate_patient(patient_id):
+    """Forget this process's cached projection (other processes notice the new profile_seq)."""
+    with _patient_lock:
+        _patient_cache.pop(patient_id, None)
+
+
+def login_required(view=None, *, api=False):
+    """Require a logged-in patient and load it into g.patient (401 JSON for api routes)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            patient = None
+            if 'user_id' in session:
+                patient = load_patient(session['user_id'])
+            if patient is None:
+                session.pop('user_id', None)
+                if api:
+                    return jsonify({"error": "login required"}), 401
+                return redirect(url_for('main.login'))
+            g.patient = patient
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator(view) if view else decorator
+
+
+def practitioner_required(view=None, *, api=False):
+    """Require a logged-in practitioner and load it into g.practitioner (401 JSON for api routes)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            practitioner = None
+            if 'practitioner_id' in session:
+                practitioner = db.session.get(Practitioner, session['practitioner_id'])
+            if practitioner is None:
+                session.pop('practitioner_id', None)
+                if api:
+                    return jsonify({"error": "practitioner login required"}), 401
+                return redirect(url_for('practitioner.login'))
+            g.practitioner = practitioner
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator(view) if view else decorator
@@ -0,0 +1,190 @@
+"""
+The food catalogue: nutrient data, the meal lists the plans draw from, and
+the lookups built over them. The NumPy-backed nutrient table and the
+meal-name resolver are built on first use, not at import. Diet rules, dosha
+meal plans and seasonal tips come from the rule pack (rules.py).
+
+The builtin foods below can be replaced by an imported food-composition
+catalogue (food_store.py, `flask import-foods`): use_store() points
+nutrition_db, the nutrient table and the resolver at the memory-mapped file.
+"""
+import datetime
+from collections.abc import Mapping
+from functools import lru_cache
+
+import food_rules
+
+from . import rules
+
+# ---- Nutrition DB (simplified) ----
+# (You can expand to many more items or move to a separate JSON / DB table)
+# ---- Nutrition DB (30+ items) ----
+builtin_foods = {
+    "Idli": {"calories": 58, "protein": 2, "carbs": 12, "fat": 0.2},
+    "Dosa": {"calories": 133, "protein": 3, "carbs": 19, "fat": 4},
+    "Khichdi": {"calories": 280, "protein": 10, "carbs": 45, "fat": 4},
+    "Rice with dal": {"calories": 350, "protein": 10, "carbs": 60, "fat": 4},
+    "Chapati": {"calories": 120, "protein": 4, "carbs": 20, "fat": 1},
+    "Paratha": {"calories": 200, "protein": 5, "carbs": 30, "fat": 8},
+    "Upma": {"calories": 140, "protein": 4, "carbs": 25, "fat": 3},
+    "Poha": {"calories": 130, "protein": 3, "carbs": 23, "fat": 2},
+    "Pongal": {"calories": 220, "protein": 7, "carbs": 40, "fat": 5},
+    "Sambar": {"calories": 90, "protein": 3, "carbs": 15, "fat": 2},
+    "Rasam": {"calories": 30, "protein": 1, "carbs": 5, "fat": 0.1},
+    "Vegetable curry": {"calories": 150, "protein": 4, "carbs": 12, "fat": 7},
+    "Paneer curry": {"calories": 320, "protein": 14, "carbs": 8, "fat": 22},
+    "Cucumber salad": {"calories": 16, "protein": 0.7, "carbs": 3.6, "fat": 0.1},
+    "Curd rice": {"calories": 320, "protein": 9, "carbs": 55, "fat": 6},
+    "Moong dal khichdi": {"calories": 220, "protein": 10, "carbs": 36, "fat": 2},
+    "Grilled fish": {"calories": 200, "protein": 22, "carbs": 0, "fat": 12},
+    "Chicken curry": {"calories": 350, "protein": 25, "carbs": 6, "fat": 22},
+    "Pumpkin soup": {"calories": 90, "protein": 2, "carbs": 15, "fat": 1},
+    "Ginger tea": {"calories": 10, "protein": 0, "carbs": 2, "fat": 0},
+    "Coconut water": {"calories": 19, "protein": 0.7, "carbs": 3.7, "fat": 0.2},
+    "Buttermilk": {"calories": 40, "protein": 3, "carbs": 4, "fat": 1},
+    "Quinoa salad": {"calories": 120, "protein": 4, "carbs": 21, "fat": 2},
+    "Boiled eggs": {"calories": 155, "protein": 13, "carbs": 1, "fat": 11},
+    "Masala omelette": {"calories": 180, "protein": 12, "carbs": 3, "fat": 14},
+    "Chana masala": {"calories": 250, "protein": 12, "carbs": 35, "fat": 6},
+    "Tofu stir fry": {"calories": 200, "protein": 15, "carbs": 10, "fat": 12},
+    "Steamed vegetables": {"calories": 50, "protein": 2, "carbs": 10, "fat": 0.5},
+    "Fruit salad": {"calories": 90, "protein": 1, "carbs": 22, "fat": 0.2},
+    "Smoothie": {"calories": 150, "protein": 3, "carbs": 30, "fat": 2},
+}
+
+
+class FoodCatalogue(Mapping):
+    """
+    {food: {nutrient: value}} over the builtin foods or an imported FoodStore
+    (opened on first use, so configuring one costs nothing at import).
+    """
+
+    def __init__(self, foods):
+        self.builtin = foods
+        self.path = None
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None and self.path is not None:
+            from food_store import FoodStore
+            self._store = FoodStore(self.path)
+        return self._store
+
+    @property
+    def foods(self):
+        return self.store if self.path is not None else self.builtin
+
+    def __getitem__(self, name):
+        return self.foods[name]
+
+    def __contains__(self, name):
+        return name in self.foods
+
+    def __iter__(self):
+        return iter(self.foods)
+
+    def __len__(self):
+        return len(self.foods)
+
+    def get(self, name, default=None):
+        return self.foods.get(name, default)
+
+
+nutrition_db = FoodCatalogue(builtin_foods)
+
+
+def use_store(path):
+    """
+    Serve nutrient data from the catalogue file at path (None: the builtin
+    foods). Lookups built over the old catalogue are dropped; the caller
+    invalidates cached plans.
+    """
+    nutrition_db.path, nutrition_db._store = path, None
+    nutrient_table.cache_clear()
+    meal_resolver.cache_clear()
+
+
+# Meal groups
+# ---- Breakfast, Lunch, Dinner Lists (30+ items) ----
+
+breakfast_list = [
+    "Idli", "Dosa", "Upma", "Poha", "Pongal",
+    "Oats porridge", "Masala omelette", "Boiled eggs",
+    "Fruit salad", "Smoothie", "Chia pudding", "Paratha",
+    "Nut butter toast", "Vegetable sandwich", "Methi thepla"
+]
+
+lunch_list = [
+    "Khichdi", "Rice with dal", "Chapati", "Paratha",
+    "Sambar", "Vegetable curry", "Paneer curry",
+    "Moong dal khichdi", "Chana masala", "Quinoa salad",
+    "Grilled chicken", "Grilled fish", "Tofu stir fry",
+    "Rajma curry", "Mixed vegetable pulao"
+]
+
+dinner_list = [
+    "Pumpkin soup", "Vegetable soup", "Steamed vegetables",
+    "Cucumber salad", "Curd rice", "Buttermilk",
+    "Ginger tea", "Coconut water", "Light dal curry",
+    "Stir-fried tofu", "Steamed fish", "Spinach soup",
+    "Broccoli stir fry", "Vegetable khichdi", "Tomato soup"
+]
+
+
+# ---- Analysis helpers: prakriti, agni, ama, diet rules ----
+def evaluate_food(food_name, prakriti, agni, ama, allergy_list=None):
+    """
+    Return (ok_boolean, message). Uses simple keyword matching to propose suitability.
+    Rules come from the rule pack; verdicts are memoized per (profile, food).
+    """
+    return rules.current().foods.evaluate(food_name, food_rules.make_profile(prakriti, agni, ama, allergy_list))
+
+
+def generate_meal_plan(prakriti, agni, ama, pack=None):
+    """Return a dictionary with Breakfast/Lunch/Dinner lists (3-5 items each)."""
+    pack = pack or rules.current()
+    template = pack.plan_for(prakriti, nutrition_db)
+    plan = {}
+    # remove items not present in nutrition_db
+    for k in template:
+        plan[k] = [it for it in template[k] if it in nutrition_db]
+        # if agni weak or ama present, prefer soups/khichdi
+        if pack.wants_light_meal(agni, ama):
+            light = pack.light_meal[0]
+            # make sure khichdi/soup present
+            if light in nutrition_db and light not in plan[k] and len(plan[k])>0:
+                plan[k][0] = light
+    return plan
+
+
+@lru_cache(maxsize=None)
+def nutrient_table():
+    """NumPy nutrient matrix over nutrition_db (numpy is imported on first use)."""
+    if nutrition_db.store is not None:
+        return nutrition_db.store.nutrient_table()
+    import nutrients
+    return nutrients.NutrientTable(builtin_foods)
+
+
+@lru_cache(maxsize=None)
+def meal_resolver():
+    """Free-text meal name -> catalogue name matcher over nutrition_db."""
+    if nutrition_db.store is not None:
+        return nutrition_db.store.resolver()
+    from meal_resolver import MealResolver
+    return MealResolver(builtin_foods)
+
+
+def meal_food(m):
+    """Catalogue name for a MealLog row (rows logged before `food` existed are resolved on read)."""
+    return m.food or meal_resolver().resolve(m.meal)
+
+
+def nutrition_summary(selected_items, quantities=None):
+    """Return (total, details) for the selected items (see nutrients.NutrientTable)."""
+    return nutrient_table().summary(selected_items, quantities)
+
+
+def seasonal_recommendations():
+    return rules.current().seasonal_for(datetime.date.today().month)
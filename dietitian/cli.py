@@ -0,0 +1,387 @@
+"""
+`flask` commands. Each runs against an up-to-date schema; `flask migrate`
+only creates/upgrades it and runs the index builds and row backfills (for
+deployments that start workers with BACKGROUND_BACKFILLS off).
+"""
+import csv
+import datetime
+import json
+import os
+import time
+from functools import wraps
+from itertools import islice
+
+import click
+import rule_pack
+from migrations import LEASE_SECONDS
+from flask import Blueprint, current_app
+from werkzeug.security import generate_password_hash
+
+from . import catalog, rules
+from .auth import PatientView, invalidate_patient
+from .exports import EXPORT_FORMATS, EXPORT_PAGE_SIZE, collect_reports, export_jobs, stream_meal_history
+from .history import archive_horizon, archive_meals, hot_page, meal_archive
+from .models import DailyNutrition, MealLog, MealLogDeletion, Patient, Practitioner, db
+from .plans import DEFAULT_TARGETS, optimized_meal_plan
+from .practitioner import roster_page
+from .queries import daily_nutrition_between, mark_eaten, meals_between, meals_on, meals_since
+from .recommendations import build_recommender, recommender_snapshot
+from .rollup import MACROS, rebuild_daily_nutrition
+from .schema import ensure_schema, init_schema, migrator, run_deferred
+from .sync import SYNC_PAGE_SIZE, feed_deletions, feed_meals, feed_page_end, profile_bump
+
+bp = Blueprint("cli", __name__, cli_group=None)
+
+
+def command(name, **kwargs):
+    """Register a top-level command that first makes sure the schema exists."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kw):
+            ensure_schema()
+            return f(*args, **kw)
+        return bp.cli.command(name, **kwargs)(wrapper)
+    return decorator
+
+
+@bp.cli.command("init-db")
+def init_db_command():
+    """Create missing tables and columns (index builds and backfills are left to `flask migrate` or the app)."""
+    if init_schema(wait=LEASE_SECONDS) is None:
+        raise click.ClickException("Another process is upgrading the schema; see `flask migrate --status`")
+    click.echo(f"Schema ready at {db.engine.url.render_as_string(hide_password=True)}")
+    pending = migrator().unfinished()
+    if pending:
+        click.echo(f"Index builds and backfills pending: {', '.join(f'{m.version} {m.name}' for m in pending)}")
+
+
+@bp.cli.command("migrate")
+@click.option("--status", is_flag=True, help="List migrations and backfill progress; change nothing")
+@click.option("--batch-size", type=int, help="Rows per backfill transaction (default: MIGRATION_BATCH_SIZE)")
+@click.option("--pause", type=float, help="Seconds between batches (default: MIGRATION_PAUSE)")
+@click.option("--max-load", type=float,
+              help="Largest share of the time spent in batches, 0-1 (default: MIGRATION_MAX_LOAD)")
+def migrate_command(status, batch_size, pause, max_load):
+    """Apply pending migrations and run their index builds and backfills while the app keeps serving (Ctrl-C resumes later)."""
+    if status:
+        for m, row in migrator().status():
+            if row is None:
+                state = "pending"
+            elif row.completed_at is not None:
+                state = f"applied {row.applied_at:%Y-%m-%d %H:%M}"
+                if m.backfill:
+                    state += f", backfilled {row.backfill_rows} rows"
+            elif row.backfill_cursor is None:
+                state = "applied, index builds and backfill not started"
+            else:
+                state = (f"applied, backfill at {row.backfill_cursor}/{row.backfill_stop} "
+                         f"({row.backfill_rows} rows)")
+            click.echo(f"{m.version:>4}  {m.name:<28} {state}")
+        return
+    applied = init_schema(wait=LEASE_SECONDS)
+    if applied is None:
+        raise click.ClickException("Another process is upgrading the schema; see `flask migrate --status`")
+    for m in applied:
+        click.echo(f"Applied {m.version} {m.name}")
+    unfinished = migrator().unfinished()
+    if unfinished:
+        click.echo(f"Finishing {', '.join(f'{m.version} {m.name}' for m in unfinished)}")
+    last = [0.0]
+
+    def progress(m, cursor, stop, rows):
+        now = time.monotonic()
+        if now - last[0] >= 2 or cursor >= stop:
+            last[0] = now
+            click.echo(f"  {m.version} {m.name}: {cursor}/{stop}, {rows} rows")
+
+    done = run_deferred(progress, batch_size=batch_size, pause=pause, max_load=max_load)
+    if done is None:
+        raise click.ClickException("Another process is running the index builds and backfills; "
+                                   "see `flask migrate --status`")
+    click.echo(f"Schema up to date at {db.engine.url.render_as_string(hide_password=True)}")
+
+
+@bp.cli.command("check-rules")
+@click.argument("path", required=False)
+def check_rules_command(path):
+    """Validate a rule pack (default: the configured RULE_PACK) before deploying it."""
+    path = path or current_app.config['RULE_PACK']
+    try:
+        pack = rule_pack.load(path)
+    except (OSError, rule_pack.RulePackError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{path}: version {pack.version}, {len(pack.foods.prakriti_rules)} prakriti rules, "
+               f"{len(pack.foods.digestion_rules)} digestion rules, {len(pack.plans)} meal plans")
+
+
+@bp.cli.command("import-foods")
+@click.argument("csv_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--out", help="Catalogue file to write (default: the configured FOOD_CATALOGUE)")
+@click.option("--name-column", default="name", show_default=True)
+@click.option("--map", "mappings", multiple=True, metavar="COLUMN=NUTRIENT",
+              help="Read a CSV column as a nutrient (repeatable), e.g. --map 'Energy (kcal)=calories'")
+@click.option("--no-builtin", is_flag=True, help="Leave out the builtin foods")
+def import_foods_command(csv_files, out, name_column, mappings, no_builtin):
+    """Import food-composition CSVs into the memory-mapped food catalogue (read by workers at startup)."""
+    import food_store
+
+    out = out or current_app.config['FOOD_CATALOGUE'] or os.path.join(current_app.instance_path, "foods.fcat")
+    column_map = {}
+    for m in mappings:
+        column, sep, nutrient = m.rpartition("=")
+        if not sep or not column or not nutrient:
+            raise click.BadParameter(f"{m!r} is not COLUMN=NUTRIENT", param_hint="--map")
+        column_map[column] = nutrient
+    try:
+        nutrients, rows = food_store.read_csv_foods(csv_files, name_column, column_map)
+    except (OSError, food_store.FoodStoreError) as e:
+        raise click.ClickException(str(e))
+    missing = [n for n in MACROS if n not in nutrients]
+    if missing:
+        raise click.ClickException(f"no {', '.join(missing)} column (use --map COLUMN=NUTRIENT)")
+
+    def foods():
+        if not no_builtin:
+            for name, info in catalog.builtin_foods.items():
+                yield name, [info.get(n, float("nan")) for n in nutrients]
+        yield from rows
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    count = food_store.write_store(out, nutrients, foods(), sources=csv_files)
+    store = food_store.FoodStore(out)
+    click.echo(f"Wrote {out}: {count} foods, {len(store.nutrients)} nutrients, "
+               f"{os.path.getsize(out) / 1e6:.1f} MB")
+    pack = rules.current()
+    planned = catalog.breakfast_list + catalog.lunch_list + catalog.dinner_list
+    planned += pack.planned_foods()
+    unknown = [f for f in dict.fromkeys(planned) if f not in store]
+    if unknown:
+        click.echo(f"No nutrient data for {len(unknown)} meal-list/plan foods: {', '.join(unknown)}")
+    click.echo("Restart the workers to serve the new catalogue.")
+
+
+@command("create-practitioner")
+@click.argument("email")
+@click.option("--name", prompt=True)
+@click.password_option()
+def create_practitioner_command(email, name, password):
+    """Create a practitioner account that can log in at /practitioner/login."""
+    if Practitioner.query.filter_by(email=email).first():
+        raise click.ClickException(f"{email} is already registered")
+    db.session.add(Practitioner(name=name, email=email, password=generate_password_hash(password)))
+    db.session.commit()
+    click.echo(f"Created practitioner {email}")
+
+
+def import_questionnaires(stream, chunk_size=5000):
+    """
+    Score questionnaire rows from a CSV stream and store prakriti/agni/ama.
+
+    Each row needs a `patient_id` or `email` column plus the questionnaire
+    fields used by analyze_prakriti_and_agni_ama. Rows are read and scored
+    chunk by chunk and written with one executemany UPDATE per chunk. Rows
+    whose patient_id is not a number or names no patient, or whose email is
+    unknown, are skipped. Returns (updated, skipped).
+    """
+    from prakriti import score_features
+
+    reader = csv.DictReader(stream, restval="")
+    stmt = (db.update(Patient).where(Patient.id == db.bindparam("pid"))
+            .values(prakriti=db.bindparam("p_prakriti"), agni=db.bindparam("p_agni"), ama=db.bindparam("p_ama"),
+                    **profile_bump()))
+    updated = skipped = 0
+    while True:
+        rows = list(islice(reader, chunk_size))
+        if not rows:
+            break
+        raw_ids = [(r.get("patient_id") or "").strip() for r in rows]
+        by_id = {int(pid) for pid in raw_ids if pid.isdigit()}
+        by_email = [r["email"].strip() for r, pid in zip(rows, raw_ids) if not pid and r.get("email")]
+        known, ids = set(), {}
+        if by_id:
+            known = set(db.session.scalars(db.select(Patient.id).where(Patient.id.in_(by_id))))
+        if by_email:
+            found = db.session.execute(
+                db.select(Patient.id, Patient.email).where(Patient.email.in_(by_email)))
+            ids = {email: pid for pid, email in found}
+        params = []
+        for r, raw, (prakriti, agni, ama) in zip(rows, raw_ids, score_features(rows)):
+            if raw:
+                pid = int(raw) if raw.isdigit() and int(raw) in known else None
+            else:
+                pid = ids.get((r.get("email") or "").strip())
+            if pid is None:
+                skipped += 1
+                continue
+            params.append({"pid": pid, "p_prakriti": prakriti, "p_agni": agni, "p_ama": ama})
+        if params:
+            result = db.session.connection().execute(stmt, params)
+            db.session.commit()
+            for row in params:
+                invalidate_patient(row["pid"])
+            # a patient deleted since the lookup matches nothing
+            updated += result.rowcount if db.engine.dialect.supports_sane_multi_rowcount else len(params)
+    return updated, skipped
+
+
+@command("import-questionnaires")
+@click.argument("csv_file", type=click.File("r", encoding="utf-8"))
+@click.option("--chunk-size", default=5000, show_default=True)
+def import_questionnaires_command(csv_file, chunk_size):
+    """Bulk-score digitized questionnaires from CSV_FILE."""
+    updated, skipped = import_questionnaires(csv_file, chunk_size)
+    click.echo(f"Updated {updated} patients, skipped {skipped} rows without a valid, known patient")
+
+
+@command("export-roster")
+@click.option("--start", required=True, help="First day (YYYY-MM-DD)")
+@click.option("--end", help="Last day (YYYY-MM-DD), defaults to --start")
+@click.argument("out", type=click.File("wb"))
+def export_roster_command(start, end, out):
+    """Render diet PDFs for every patient with meals in the period into a ZIP at OUT."""
+    start = datetime.date.fromisoformat(start)
+    end = datetime.date.fromisoformat(end) if end else start
+    reports = collect_reports(start, end)
+    job_id = export_jobs().submit(None, "roster", reports)
+    with click.progressbar(length=len(reports), label="Rendering") as bar:
+        done = 0
+        while True:
+            status = export_jobs().status(job_id)
+            bar.update(status["done"] - done)
+            done = status["done"]
+            if status["state"] != "running":
+                break
+            time.sleep(0.2)
+    if status["state"] == "failed":
+        raise click.ClickException(status["error"])
+    for chunk in export_jobs().stream_zip(job_id):
+        out.write(chunk)
+    click.echo(f"Wrote {len(reports)} reports")
+
+
+@command("export-meals")
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("--patient", "patient_ids", type=int, multiple=True, help="Only these patients (repeatable)")
+@click.option("--start", help="First day (YYYY-MM-DD)")
+@click.option("--end", help="Last day (YYYY-MM-DD)")
+@click.argument("out", type=click.File("w"))
+def export_meals_command(fmt, patient_ids, start, end, out):
+    """Stream the clinic's meal history, with nutrients, to OUT as CSV or NDJSON."""
+    start = datetime.date.fromisoformat(start) if start else None
+    end = datetime.date.fromisoformat(end) if end else None
+    for chunk in stream_meal_history(fmt, list(patient_ids) or None, start, end):
+        out.write(chunk)
+
+
+@command("archive-meals")
+@click.option("--before", help="Archive months before this day's month (default: ARCHIVE_AFTER_DAYS ago)")
+@click.option("--status", is_flag=True, help="Only list the archived months")
+def archive_meals_command(before, status):
+    """Move old MealLog months into compressed archive segments (history reads stay transparent)."""
+    if not status:
+        before = datetime.date.fromisoformat(before) if before else archive_horizon()
+        moved = archive_meals(before, progress=lambda month, n: click.echo(f"{month:%Y-%m}: {n} meals archived"))
+        click.echo(f"Archived {sum(moved.values())} meals from {len(moved)} months before {before:%Y-%m}")
+    for month, rows, patients, size in meal_archive().stats():
+        click.echo(f"  {month:%Y-%m}  {rows:>9} meals  {patients:>7} patients  {size / 1e6:8.2f} MB")
+
+
+@command("rebuild-daily-nutrition")
+@click.option("--start", help="First day to rebuild (YYYY-MM-DD)")
+@click.option("--end", help="Last day to rebuild (YYYY-MM-DD)")
+def rebuild_daily_nutrition_command(start, end):
+    """Recompute the DailyNutrition rollup from MealLog (backfill)."""
+    start = datetime.date.fromisoformat(start) if start else None
+    end = datetime.date.fromisoformat(end) if end else None
+    click.echo(f"Rebuilt {rebuild_daily_nutrition(start, end)} patient-days")
+
+
+def hot_queries(patient_id, today):
+    """The MealLog/DailyNutrition statements the routes issue, built by the helpers they call, for plan checks."""
+    week_ago = today - datetime.timedelta(days=7)
+    return {
+        "dashboard/nutrition_analysis (patient, day)": meals_on(patient_id, today),
+        "meal_log (patient, last 7 days)": meals_since(patient_id, week_ago),
+        "api meals (patient, range)": meals_between(patient_id, week_ago, today),
+        "update_meal_log (ids, owner)": mark_eaten(patient_id, [1, 2, 3], 1),
+        "export_diet (patient, range)": hot_page([patient_id], week_ago, today),
+        "export-roster / rebuild (range)": hot_page(None, week_ago, today),
+        "export meals (keyset page)": hot_page(None, None, None, EXPORT_PAGE_SIZE, after=(patient_id, week_ago, 0)),
+        "roster page (by name)": roster_page("name", after=["P", patient_id], today=today, query=True),
+        "roster page (one dosha, by name)":
+            roster_page("name", "Vata", ["P", patient_id], today=today, query=True),
+        "roster page (by dosha)": roster_page("dosha", after=["Vata", "P", patient_id], today=today, query=True),
+        "sync page end (patient, after cursor)": feed_page_end(MealLog, patient_id, 100, 600, SYNC_PAGE_SIZE),
+        "sync feed (patient, after cursor)": feed_meals(patient_id, 100, 600),
+        "sync deletions page end (patient, after cursor)":
+            feed_page_end(MealLogDeletion, patient_id, 100, 600, SYNC_PAGE_SIZE),
+        "sync deletions (patient, after cursor)": feed_deletions(patient_id, 100, 600),
+        "nutrition_trend (patient, range)": daily_nutrition_between(patient_id, week_ago, today),
+    }
+
+
+def seeded_query_plans(patients=200, days=60):
+    """Seed a scratch SQLite database and return query_plans.check() over hot_queries()."""
+    from sqlalchemy import create_engine
+
+    import query_plans
+
+    engine = create_engine("sqlite://")
+    db.metadata.create_all(engine)
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        conn.execute(db.insert(Patient), [
+            {"id": i, "name": f"P{i}", "email": f"p{i}@example.com", "password": "x",
+             "prakriti": ("Vata", "Pitta", "Kapha", "Vata-Pitta", None)[i % 5]}
+            for i in range(1, patients + 1)])
+        conn.execute(db.insert(MealLog), [
+            {"patient_id": pid, "date": today - datetime.timedelta(days=d), "meal": meal, "meal_type": meal_type}
+            for pid in range(1, patients + 1) for d in range(days)
+            for meal, meal_type in (("Idli", "Breakfast"), ("Khichdi", "Lunch"), ("Pumpkin soup", "Dinner"))])
+        conn.execute(db.insert(DailyNutrition), [
+            {"patient_id": pid, "date": today - datetime.timedelta(days=d)}
+            for pid in range(1, patients + 1) for d in range(days)])
+        conn.exec_driver_sql("ANALYZE")
+        return query_plans.check(conn, hot_queries(patients // 2, today))
+
+
+@command("check-query-plans")
+@click.option("--patients", default=200, show_default=True)
+@click.option("--days", default=60, show_default=True)
+def check_query_plans_command(patients, days):
+    """Seed a scratch SQLite database and fail if any hot query does a full table scan."""
+    failed = False
+    for name, (plan, bad) in seeded_query_plans(patients, days).items():
+        click.echo(f"{'FAIL' if bad else 'ok  '} {name}")
+        for line in plan:
+            click.echo(f"       {line}")
+        failed = failed or bool(bad)
+    if failed:
+        raise click.ClickException("hot queries regressed to full table scans")
+
+
+@command("rebuild-recommender")
+def rebuild_recommender_command():
+    """Rebuild the recommendation model from MealLog and write the worker snapshot."""
+    model = build_recommender()
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    model.save(recommender_snapshot())
+    click.echo(f"Built model over {len(model)} foods, {len(model.data)} co-occurrence pairs")
+
+
+@command("optimize-plans")
+@click.option("--calories", default=DEFAULT_TARGETS["calories"], show_default=True)
+@click.option("--protein", default=DEFAULT_TARGETS["protein"], show_default=True)
+@click.option("--days", default=7, show_default=True)
+@click.argument("out", type=click.File("w"))
+def optimize_plans_command(calories, protein, days, out):
+    """Write optimized week plans for every assessed patient to OUT (JSON lines)."""
+    q = (db.select(*[getattr(Patient, f) for f in PatientView._fields])
+         .where(Patient.prakriti.is_not(None)).execution_options(yield_per=1000))
+    count = 0
+    for row in db.session.execute(q):
+        p = PatientView(*row)
+        plans = optimized_meal_plan(p, calories, protein, days)
+        out.write(json.dumps({"patient_id": p.id, "days": plans}) + "\n")
+        count += 1
+    click.echo(f"Planned {days} days for {count} patients")
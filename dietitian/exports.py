@@ -0,0 +1,99 @@
+"""
+Exports of MealLog history.
+
+- PDF diet reports are collected here and rendered by the app's ExportJobs
+  pool (see export_jobs.py).
+- CSV / NDJSON meal history is streamed: rows are read in keyset-paginated
+  pages of EXPORT_PAGE_SIZE and written out page by page, so memory stays
+  flat however long the history is.
+
+Both read archived months as well as MealLog (history.py).
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from flask import current_app
+
+from .catalog import meal_food, meal_resolver, nutrition_db
+from .history import meal_records
+from .models import Patient, db
+from .rollup import MACROS
+
+EXPORT_PAGE_SIZE = 2000
+EXPORT_FIELDS = ("id", "patient_id", "date", "meal_type", "meal", "food", "eaten", *MACROS)
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_jobs():
+    """The current app's ExportJobs."""
+    return current_app.extensions["dietitian"]["export_jobs"]
+
+
+def collect_reports(start, end, patient_ids=None):
+    """
+    Gather meals between start and end (inclusive, archived ones included) into
+    export_jobs reports. patient_ids=None collects the whole roster.
+    Returns [(filename, name, days)].
+    """
+    names = db.select(Patient.id, Patient.name)
+    if patient_ids is not None:
+        names = names.where(Patient.id.in_(patient_ids))
+    names = dict(db.session.execute(names).all())
+    zero = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
+    reports = {}
+    for m in meal_records(patient_ids, start, end):
+        _, _, days = reports.setdefault(m.patient_id, (m.patient_id, names.get(m.patient_id), {}))
+        info = nutrition_db.get(meal_food(m), zero)
+        days.setdefault(m.date.isoformat(), []).append(
+            {"meal": m.meal, "meal_type": m.meal_type, **{k: info.get(k, 0) for k in zero}})
+    single = patient_ids is not None and len(patient_ids) == 1
+    span = start.isoformat() if start == end else f"{start.isoformat()}_{end.isoformat()}"
+    out = []
+    for pid, name, days in reports.values():
+        filename = f"diet_{span}.pdf" if single else f"diet_{pid}_{span}.pdf"
+        out.append((filename, name, [{"date": d, "meals": meals} for d, meals in days.items()]))
+    return out
+
+
+def meal_history(patient_ids=None, start=None, end=None, page_size=EXPORT_PAGE_SIZE):
+    """
+    Yield pages of export rows (EXPORT_FIELDS tuples) from both history tiers,
+    ordered by patient, date and id (see history.meal_records: MealLog is read
+    in keyset pages with the session released in between, so a slow client
+    never holds a transaction open).
+    """
+    resolve = meal_resolver().resolve
+    zero = dict.fromkeys(MACROS, 0)
+    records = meal_records(patient_ids, start, end, page_size)
+    while True:
+        page = []
+        for meal_id, pid, day, meal_type, meal, food, eaten in islice(records, page_size):
+            food = food or resolve(meal)
+            info = nutrition_db.get(food, zero)
+            page.append((meal_id, pid, day.isoformat(), meal_type, meal, food, bool(eaten),
+                         *(info.get(k, 0) for k in MACROS)))
+        if not page:
+            return
+        yield page
+
+
+def stream_meal_history(fmt, patient_ids=None, start=None, end=None, page_size=EXPORT_PAGE_SIZE):
+    """meal_history() encoded as `fmt` ("csv" with a header row, or "ndjson"): one str per page."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_FIELDS)
+        for page in meal_history(patient_ids, start, end, page_size):
+            writer.writerows(page)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    elif fmt == "ndjson":
+        for page in meal_history(patient_ids, start, end, page_size):
+            yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in page)
+    else:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
@@ -0,0 +1,184 @@
+"""
+Meal history across the hot MealLog table and the cold archive.
+
+Rows older than the archive horizon (ARCHIVE_AFTER_DAYS, default a year)
+are moved, a whole month at a time, from MealLog into compressed month
+segments under ARCHIVE_DIR (meal_archive.py) by `flask archive-meals`, so
+the table the daily queries run against only holds recent months.
+meal_records() reads both tiers as one ordered stream; exports and rollup
+rebuilds go through it. Day-to-day views (today, the last week) and the sync
+feed read MealLog only, and archived rows are read-only.
+"""
+import datetime
+import heapq
+from array import array
+
+from flask import current_app
+from meal_archive import MealRecord, month_of, next_month, record_key
+
+from .models import MealLog, MealLogDeletion, db
+
+ARCHIVE_AFTER_DAYS = 365
+HISTORY_PAGE_SIZE = 2000
+ARCHIVE_DELETE_CHUNK = 5000
+
+_COLUMNS = (MealLog.id, MealLog.patient_id, MealLog.date, MealLog.meal_type,
+            MealLog.meal, MealLog.food, MealLog.eaten)
+
+
+def meal_archive():
+    """The current app's MealArchive."""
+    return current_app.extensions["dietitian"]["meal_archive"]
+
+
+def archive_horizon(today=None):
+    """First day of the oldest month kept in MealLog."""
+    today = today or datetime.date.today()
+    return month_of(today - datetime.timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS']))
+
+
+def reaches_archive(start):
+    """Could rows from start onwards be in the archive?"""
+    months = meal_archive().months()
+    return bool(months) and (start is None or start < next_month(months[-1]))
+
+
+def hot_page(patient_ids=None, start=None, end=None, page_size=HISTORY_PAGE_SIZE, after=None):
+    """One page of hot_records(): the rows after the (patient_id, date, id) key after."""
+    q = db.select(*_COLUMNS).order_by(MealLog.patient_id, MealLog.date, MealLog.id).limit(page_size)
+    if patient_ids is not None:
+        q = q.where(MealLog.patient_id.in_(patient_ids))
+    if start:
+        q = q.where(MealLog.date >= start)
+    if end:
+        q = q.where(MealLog.date <= end)
+    if after is not None:
+        q = q.where(db.tuple_(MealLog.patient_id, MealLog.date, MealLog.id) > after)
+    return q
+
+
+def hot_records(patient_ids=None, start=None, end=None, page_size=HISTORY_PAGE_SIZE, conn=None):
+    """
+    MealLog rows as MealRecords ordered by (patient_id, date, id). Each page
+    is one short indexed query resuming after the previous page, and the
+    session is released between pages, so a slow consumer never holds a
+    transaction open. Given conn, the pages are read in conn's transaction instead.
+    """
+    after = None
+    while True:
+        if conn is not None:
+            rows = conn.execute(hot_page(patient_ids, start, end, page_size, after)).all()
+        else:
+            rows = db.session.execute(hot_page(patient_ids, start, end, page_size, after)).all()
+            db.session.close()
+        yield from map(MealRecord._make, rows)
+        if len(rows) < page_size:
+            return
+        after = (rows[-1].patient_id, rows[-1].date, rows[-1].id)
+
+
+def meal_records(patient_ids=None, start=None, end=None, page_size=HISTORY_PAGE_SIZE, conn=None):
+    """
+    Every meal between start and end (inclusive, None: unbounded) for
+    patient_ids (None: everyone), hot and archived, as MealRecords ordered by
+    (patient_id, date, id). The archive is only opened when the range reaches
+    back into it. A row present in both tiers (an archive run interrupted
+    before its delete) is returned once, from MealLog. conn: see hot_records().
+    """
+    hot = hot_records(patient_ids, start, end, page_size, conn)
+    if not reaches_archive(start):
+        yield from hot
+        return
+    pending = None
+    for r in heapq.merge(meal_archive().records(patient_ids, start, end), hot, key=record_key):
+        if pending is not None and pending.id != r.id:
+            yield pending
+        pending = r
+    if pending is not None:
+        yield pending
+
+
+def _reuses_ids():
+    """SQLite MealLog tables created before AUTOINCREMENT hand out max(id) + 1."""
+    if db.engine.dialect.name != "sqlite":
+        return False
+    ddl = db.session.scalar(db.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'meal_log'"))
+    return "AUTOINCREMENT" not in (ddl or "").upper()
+
+
+def _not_moved(ids, seqs):
+    """
+    Of rows just deleted by (id, change_seq), the ids that weren't: still in
+    MealLog, or deleted by someone else after they were read (a tombstone
+    newer than the row; an older one is from a reused id).
+    """
+    seq_of = dict(zip(ids, seqs))
+    kept = set(db.session.scalars(db.select(MealLog.id).where(MealLog.id.in_(seq_of))))
+    gone = db.session.execute(db.select(MealLogDeletion.meal_id, MealLogDeletion.change_seq)
+                              .where(MealLogDeletion.meal_id.in_(seq_of)))
+    kept.update(mid for mid, seq in gone if seq > seq_of[mid])
+    return kept
+
+
+def archive_month(month, chunk_size=ARCHIVE_DELETE_CHUNK):
+    """
+    Move MealLog rows dated in month into its archive segment. Rows are
+    removed from MealLog only if they are unchanged since they were read
+    (same change_seq); a row edited (or re-dated, or deleted) meanwhile is
+    dropped from the segment again, stays hot and is archived with its month
+    on a later run, so no meal is read from both tiers. Returns the number
+    of rows moved.
+    """
+    end = next_month(month) - datetime.timedelta(days=1)
+    if db.session.scalar(db.select(MealLog.id).where(MealLog.date >= month, MealLog.date <= end).limit(1)) is None:
+        return 0
+    ids, seqs = array("q"), array("q")
+
+    def rows():
+        q = (db.select(*_COLUMNS, MealLog.change_seq)
+             .where(MealLog.date >= month, MealLog.date <= end)
+             .order_by(MealLog.patient_id, MealLog.date, MealLog.id)
+             .execution_options(yield_per=chunk_size))
+        for r in db.session.execute(q):
+            ids.append(r.id)
+            seqs.append(r.change_seq)
+            yield MealRecord(*r[:-1])
+
+    meal_archive().merge(month, rows())
+    db.session.commit()
+    if _reuses_ids():
+        # deleting the newest row would let its id be handed out again; keep it hot
+        newest = db.session.scalar(db.select(db.func.max(MealLog.id)))
+        seqs = array("q", (-1 if m == newest else s for m, s in zip(ids, seqs)))
+    stmt = db.delete(MealLog).where(MealLog.id == db.bindparam("mid"), MealLog.change_seq == db.bindparam("seq"))
+    stale = set()
+    for i in range(0, len(ids), chunk_size):
+        chunk_ids, chunk_seqs = ids[i:i + chunk_size], seqs[i:i + chunk_size]
+        deleted = db.session.connection().execute(
+            stmt, [{"mid": m, "seq": s} for m, s in zip(chunk_ids, chunk_seqs)]).rowcount
+        if deleted < len(chunk_ids) or not db.engine.dialect.supports_sane_multi_rowcount:
+            stale |= _not_moved(chunk_ids, chunk_seqs)
+        db.session.commit()
+    if stale:
+        meal_archive().drop(month, stale)
+    return len(ids) - len(stale)
+
+
+def archive_meals(before=None, progress=None):
+    """
+    Archive every month of MealLog older than before (default: the
+    archive_horizon()), oldest first. Returns {month: rows moved} for the
+    months that had rows.
+    """
+    before = month_of(before or archive_horizon())
+    oldest = db.session.scalar(db.select(db.func.min(MealLog.date)).where(MealLog.date < before))
+    moved = {}
+    month = month_of(oldest) if oldest else before
+    while month < before:
+        n = archive_month(month)
+        if n:
+            moved[month] = n
+            if progress:
+                progress(month, n)
+        month = next_month(month)
+    return moved
@@ -0,0 +1,100 @@
+"""
+Per-route latency, SQL statements and SQL time per request, PDF render time
+and cache hit/miss counts, served in Prometheus text format at /metrics.
+Set SLOW_REQUEST_MS to log slower requests together with their queries.
+"""
+import time
+
+import metrics
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event as sa_event
+
+from . import catalog, plans, recommendations, rules
+from .auth import patient_cache_stats
+from .models import db
+
+SLOW_LOG_QUERIES = 20
+
+registry = metrics.Registry()
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"))
+request_queries = registry.histogram(
+    "http_request_sql_queries", "SQL statements issued per request.", ("route",), metrics.COUNT_BUCKETS)
+request_sql_seconds = registry.histogram(
+    "http_request_sql_seconds", "Time spent in SQL per request.", ("route",))
+pdf_render_seconds = registry.histogram(
+    "pdf_render_seconds", "Time to render one diet PDF in the export pool.")
+registry.collected(
+    "cache_lookups_total", "Lookups per in-process cache.", ("cache", "result"),
+    metrics.cache_stats({
+        "food_verdict": lambda: rules.current().foods.cache_info()[:2],
+        "meal_resolver": lambda: catalog.meal_resolver().resolve.cache_info()[:2],
+        "plan_bundle": plans._plan_bundle,
+        "meal_optimizer": plans._optimizer,
+        "suitable_mask": recommendations._suitable_mask,
+        "patient": lambda: (patient_cache_stats["hits"], patient_cache_stats["misses"]),
+    }), kind="counter")
+registry.collected(
+    "rule_pack_info", "The rule pack in use (value 1).", ("version", "checksum"),
+    lambda: [((pack.version, pack.checksum[:12]), 1) for pack in [rules.current()]])
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    # kept on the statement's own context, so a failed statement leaves nothing behind
+    context._query_started = time.perf_counter()
+
+
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    if has_request_context() and "sql" in g:
+        g.sql.append((elapsed, statement))
+
+
+def _start_timer():
+    g.started = time.perf_counter()
+    g.sql = []
+
+
+def _record_request(response):
+    # recorded when the server closes the response, so streamed bodies (SSE,
+    # PDF downloads) count in full; the request context is gone by then
+    if "started" not in g:
+        return response
+    started, sql = g.started, g.sql
+    method, route, path = request.method, _route_label(), request.full_path.rstrip("?")
+    status = str(response.status_code)
+    slow_ms, logger = current_app.config['SLOW_REQUEST_MS'], current_app.logger
+
+    def record():
+        elapsed = time.perf_counter() - started
+        sql_time = sum(t for t, _ in sql)
+        request_seconds.observe(elapsed, method, route, status)
+        request_queries.observe(len(sql), route)
+        request_sql_seconds.observe(sql_time, route)
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            worst = sorted(sql, key=lambda q: q[0], reverse=True)[:SLOW_LOG_QUERIES]
+            logger.warning(
+                "slow request %s %s: %.1f ms, %d queries, %.1f ms in SQL\n%s",
+                method, path, elapsed * 1000, len(sql), sql_time * 1000,
+                "\n".join(f"  {t * 1000:8.2f} ms  {' '.join(stmt.split())}" for t, stmt in worst))
+
+    response.call_on_close(record)
+    return response
+
+
+def metrics_endpoint():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Hook the timers into app and its engine and serve /metrics."""
+    with app.app_context():
+        sa_event.listen(db.engine, "before_cursor_execute", _sql_started)
+        sa_event.listen(db.engine, "after_cursor_execute", _sql_finished)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics_endpoint', metrics_endpoint)
@@ -0,0 +1,185 @@
+"""
+Live dashboard updates.
+
+The dashboard and meal log pages post their forms in the background (with
+an X-Fragment: <view> header) and get back only the rows that changed plus
+today's totals, rendered from the partials the full page is built from
+(templates/fragments/). They also keep an EventSource open on /live/<view>,
+which pushes the rows changed anywhere else (another tab, the mobile API,
+sync) as they commit.
+
+A stream follows the patient's change feed (sync.changes_since), so it sees
+writes from every process: it checks Patient.change_seq every
+LIVE_POLL_SECONDS (one primary-key read while nothing changed), and a write
+committed in this process wakes it at once. Event ids are feed cursors, so a
+reconnecting EventSource (Last-Event-ID) resumes where it stopped.
+
+Each open stream occupies a worker thread until it ends (after
+LIVE_STREAM_SECONDS; the browser reconnects), so streams are off unless
+LIVE_STREAMS sets how many one process may hold. That needs a worker that
+serves requests concurrently, with LIVE_STREAMS a small share of its
+threads:
+
+    gunicorn -k gthread --threads 16 -e LIVE_STREAMS=4 'dietitian:create_app()'
+    gunicorn -k gevent -e LIVE_STREAMS=200 'dietitian:create_app()'
+
+Never enable them on sync workers (one thread each). With streams off, or
+all of a process's streams taken (503), the pages still update from their
+own requests' fragments.
+"""
+import datetime
+import json
+import threading
+import time
+
+from flask import current_app, render_template, url_for
+from meal_archive import MealRecord
+from sqlalchemy import event
+
+from .models import DailyNutrition, Patient, db
+from .sync import CursorAhead, changes_since
+
+LIVE_POLL_SECONDS = 2.0
+LIVE_HEARTBEAT_SECONDS = 15.0
+LIVE_STREAM_SECONDS = 300.0
+LIVE_RETRY_MS = 2000
+LIVE_PAGE_SIZE = 200
+
+# view: (row partial, days back from today that the page lists)
+VIEWS = {
+    "dashboard": ("fragments/meal_item.html", 0),
+    "meal_log": ("fragments/meal_row.html", 7),
+}
+
+
+class _Wakeups:
+    """Per-patient counters bumped on commit; streams wait for theirs to move."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._counts = {}
+
+    def count(self, patient_id):
+        return self._counts.get(patient_id, 0)
+
+    def bump(self, patient_ids):
+        with self._cond:
+            for pid in patient_ids:
+                self._counts[pid] = self._counts.get(pid, 0) + 1
+            self._cond.notify_all()
+
+    def wait(self, patient_id, seen, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._counts.get(patient_id, 0) != seen, timeout)
+
+
+_wakeups = _Wakeups()
+
+
+def stream_slots(limit):
+    """The per-app semaphore bounding open streams (app.extensions), or None when LIVE_STREAMS is 0."""
+    return threading.BoundedSemaphore(limit) if limit > 0 else None
+
+
+def _slots():
+    return current_app.extensions["dietitian"]["live_streams"]
+
+
+@event.listens_for(db.session, "after_commit")
+def _wake_streams(session):
+    # sync.reserve() records the patients a transaction wrote to
+    changed = session.info.pop("changed_patients", None)
+    if changed:
+        _wakeups.bump(changed)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("changed_patients", None)
+
+
+def current_cursor(patient_id):
+    """The patient's feed position."""
+    return db.session.scalar(db.select(Patient.change_seq).where(Patient.id == patient_id)) or 0
+
+
+def stream_url(view, patient_id):
+    """
+    The page's /live URL, starting at the current cursor (call it before the
+    page's queries so the stream misses nothing); None when streams are off.
+    """
+    if _slots() is None:
+        return None
+    return url_for('main.live', view=view, cursor=current_cursor(patient_id))
+
+
+def day_totals(patient_id, day=None):
+    """The patient's DailyNutrition row for day (default today), or None."""
+    return db.session.get(DailyNutrition, (patient_id, day or datetime.date.today()))
+
+
+def fragments(view, patient_id, meals, removed=()):
+    """
+    {"meals": [{"id", "html"}], "removed": [id], "totals": html} for rows
+    (MealLog rows or MealRecords) that changed. A row that no longer
+    belongs on the view's page (re-dated) comes back with html None.
+    """
+    template, days = VIEWS[view]
+    today = datetime.date.today()
+    since = today - datetime.timedelta(days=days)
+    out = [{"id": m.id, "html": render_template(template, m=m) if since <= m.date <= today else None}
+           for m in meals]
+    return {"meals": out, "removed": list(removed),
+            "totals": render_template("fragments/day_totals.html", totals=day_totals(patient_id))}
+
+
+def _records(patient_id, feed):
+    fields = {f: i for i, f in enumerate(feed["fields"])}
+    return [MealRecord(m[fields["id"]], patient_id, datetime.date.fromisoformat(m[fields["date"]]),
+                       m[fields["meal_type"]], m[fields["meal"]], m[fields["food"]], m[fields["eaten"]])
+            for m in feed["meals"]]
+
+
+def streams_enabled():
+    return _slots() is not None
+
+
+def open_stream(view, patient_id, cursor):
+    """The SSE body for one page, or None when this process already holds LIVE_STREAMS streams."""
+    slots = _slots()
+    if not slots.acquire(blocking=False):
+        return None
+    return _stream(view, patient_id, cursor, slots)
+
+
+def _stream(view, patient_id, cursor, slots):
+    try:
+        started = beat = time.monotonic()
+        yield f"retry: {LIVE_RETRY_MS}\n\n"
+        while time.monotonic() - started < LIVE_STREAM_SECONDS:
+            seen = _wakeups.count(patient_id)
+            head = current_cursor(patient_id)
+            more = head != cursor
+            while more:
+                try:
+                    feed = changes_since(patient_id, cursor, LIVE_PAGE_SIZE)
+                except CursorAhead:
+                    yield "event: reset\ndata: {}\n\n"     # the page is newer than the database: reload it
+                    return
+                more = feed["more"]
+                if feed["cursor"] == cursor:
+                    break
+                cursor = feed["cursor"]
+                if feed["meals"] or feed["deleted"]:
+                    data = fragments(view, patient_id, _records(patient_id, feed), feed["deleted"])
+                    yield f"id: {cursor}\nevent: changes\ndata: {json.dumps(data)}\n\n"
+                else:
+                    yield f"id: {cursor}\n\n"
+                beat = time.monotonic()
+            db.session.close()      # hold no connection while waiting
+            if time.monotonic() - beat >= LIVE_HEARTBEAT_SECONDS:
+                yield ":\n\n"       # also how a closed connection is noticed
+                beat = time.monotonic()
+            _wakeups.wait(patient_id, seen, LIVE_POLL_SECONDS)
+    finally:
+        slots.release()
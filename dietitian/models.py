@@ -0,0 +1,91 @@
+"""
+The schema: one SQLAlchemy instance and every table the app, the async API
+and the CLI share.
+"""
+import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+class Patient(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    age = db.Column(db.Integer)
+    email = db.Column(db.String(150), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    prakriti = db.Column(db.String(100))      # Vata/Pitta/Kapha/combination/Balanced
+    agni = db.Column(db.String(50))           # weak/normal/hyper
+    ama = db.Column(db.String(50))            # present/absent/mild
+    allergy = db.Column(db.String(250))       # comma-separated
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # change feed (sync.py): the patient's last used sequence number, and the
+    # one at which name/age/allergy/prakriti/agni/ama last changed
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    profile_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    meals = db.relationship('MealLog', backref='patient', lazy=True)
+
+    __table_args__ = (
+        # practitioner roster pages are keyset-paginated by name
+        db.Index('ix_patient_name', 'name'),
+    )
+
+
+# roster sort/filter key: the prakriti label, with unassessed patients as ""
+DOSHA_KEY = db.func.coalesce(Patient.prakriti, db.literal_column("''"))
+db.Index('ix_patient_dosha_name', DOSHA_KEY, Patient.name)
+
+
+class Practitioner(db.Model):
+    """A dietitian who can see the whole patient roster."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    email = db.Column(db.String(150), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+class MealLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, default=datetime.date.today)
+    meal = db.Column(db.String(250), nullable=False)
+    meal_type = db.Column(db.String(50), nullable=True)  # Breakfast/Lunch/Dinner/Snack
+    food = db.Column(db.String(250), nullable=True)       # nutrition_db key resolved from `meal` at write time
+    eaten = db.Column(db.Boolean, default=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # patient's sequence at last write
+
+    __table_args__ = (
+        # every hot query filters by patient and a day (or a range of days)
+        db.Index('ix_meal_log_patient_date', 'patient_id', 'date'),
+        # roster exports and rollup rebuilds filter on date alone
+        db.Index('ix_meal_log_date', 'date'),
+        # sync feed: a patient's rows changed after a sequence number
+        db.Index('ix_meal_log_patient_seq', 'patient_id', 'change_seq'),
+        # ids must never be reused once rows are deleted (tombstones) or archived
+        {"sqlite_autoincrement": True},
+    )
+
+
+class MealLogDeletion(db.Model):
+    """Tombstone for a deleted MealLog row, so sync clients learn about the delete."""
+    meal_id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_meal_log_deletion_patient_seq', 'patient_id', 'change_seq'),
+    )
+
+
+class DailyNutrition(db.Model):
+    """Per-patient, per-day rollup of MealLog kept current by log_meal/update_meal_log."""
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Float, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    carbs = db.Column(db.Float, nullable=False, default=0)
+    fat = db.Column(db.Float, nullable=False, default=0)
+    eaten_count = db.Column(db.Integer, nullable=False, default=0)
+    logged_count = db.Column(db.Integer, nullable=False, default=0)
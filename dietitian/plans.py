@@ -0,0 +1,96 @@
+"""
+Diet plans per patient profile: the cached plan/nutrition/evaluation bundle
+shown on the plan page, and the macro-target optimizer.
+"""
+import hashlib
+from functools import lru_cache
+
+import food_rules
+
+from . import rules
+from .catalog import breakfast_list, dinner_list, generate_meal_plan, lunch_list, nutrition_db, nutrition_summary
+
+# ---- Plan cache ----
+# A plan depends only on (prakriti, agni, ama, allergy) and the food catalogue, so
+# the plan + nutrition + evaluation bundle is built once per profile. Questionnaire
+# updates move a patient to a different key; catalogue changes must call
+# invalidate_plans(), which also runs when a new rule pack is swapped in.
+plan_cache_version = 0
+
+
+@lru_cache(maxsize=1024)
+def _plan_bundle(prakriti, agni, ama, allergy, version):
+    pack = rules.current()
+    plan = generate_meal_plan(prakriti, agni, ama, pack)
+    selected = [i for sub in plan.values() for i in sub]
+    total, details = nutrition_summary(selected)
+    allergy_list = [a.strip() for a in allergy.split(",") if a.strip()]
+    profile = food_rules.make_profile(prakriti, agni, ama, allergy_list)
+    evaluation = {k: {"ok": ok, "msg": msg} for k, (ok, msg) in pack.foods.evaluate_foods(selected, profile).items()}
+    key = repr((prakriti, agni, ama, allergy, version, pack.checksum)).encode()
+    return {
+        "plan": plan,
+        "nutrition": {"total": total, "details": details},
+        "evaluation": evaluation,
+        "etag": hashlib.sha1(key).hexdigest(),
+    }
+
+
+def plan_bundle(p):
+    """Cached plan/nutrition/evaluation for a patient's profile."""
+    return _plan_bundle(p.prakriti, p.agni, p.ama, p.allergy or "", plan_cache_version)
+
+
+def invalidate_plans(*_):
+    """Drop cached plans; call after nutrition_db changes (runs on rule pack swaps)."""
+    global plan_cache_version
+    plan_cache_version += 1
+    _plan_bundle.cache_clear()
+    _optimizer.cache_clear()
+
+
+# ---- Macro-target optimizer ----
+MEAL_SLOTS = {"Breakfast": breakfast_list, "Lunch": lunch_list, "Dinner": dinner_list}
+DEFAULT_TARGETS = {"calories": 1800, "protein": 60}
+
+
+@lru_cache(maxsize=256)
+def _optimizer(prakriti, agni, ama, allergy, version):
+    """
+    Candidate pools for a profile: suitable foods with nutrient data, never
+    allergens. A slot with only one or two suitable foods gets smaller meals;
+    one with none falls back to the non-allergens, and those foods' verdicts
+    are returned as cautions {food: message} to show with any plan using them.
+    """
+    from meal_optimizer import MealOptimizer
+
+    foods = rules.current().foods
+    allergy_list = [a.strip() for a in allergy.split(",") if a.strip()]
+    profile = food_rules.make_profile(prakriti, agni, ama, allergy_list)
+    allergens_only = food_rules.make_profile(None, None, None, allergy_list)
+    pools, cautions = {}, {}
+    for slot, names in MEAL_SLOTS.items():
+        candidates = [n for n in dict.fromkeys(names) if n in nutrition_db]
+        verdicts = foods.evaluate_foods(candidates, profile)
+        suitable = [n for n in candidates if verdicts[n][0]]
+        if not suitable:
+            safe = foods.evaluate_foods(candidates, allergens_only)
+            suitable = [n for n in candidates if safe[n][0]]
+            cautions.update((n, verdicts[n][1]) for n in suitable)
+        pools[slot] = suitable
+    return MealOptimizer(pools, nutrition_db), cautions
+
+
+def optimized_meal_plan(p, calories=None, protein=None, days=1):
+    """
+    Plans (with portions) hitting daily calorie/protein targets, one per day.
+    Each day's "cautions" lists {food: message} for foods in it that don't
+    suit the profile (only used when a slot has no suitable food at all).
+    """
+    optimizer, cautions = _optimizer(p.prakriti, p.agni, p.ama, p.allergy or "", plan_cache_version)
+    plans = optimizer.plan_days(calories or DEFAULT_TARGETS["calories"],
+                                protein or DEFAULT_TARGETS["protein"], days=days)
+    for day in plans:
+        used = {it["item"] for items in day["plan"].values() for it in items}
+        day["cautions"] = {f: msg for f, msg in cautions.items() if f in used}
+    return plans
@@ -0,0 +1,159 @@
+"""
+Practitioner views, registered as the `practitioner` blueprint: a login and
+the patient roster with dosha, last logged day, 7-day adherence and average
+calories.
+
+Practitioner accounts are created with `flask create-practitioner`.
+"""
+import base64
+import datetime
+import json
+
+from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash
+
+from .auth import practitioner_required
+from .models import DOSHA_KEY, DailyNutrition, Patient, Practitioner, db
+
+bp = Blueprint("practitioner", __name__, url_prefix="/practitioner")
+
+ROSTER_PAGE_SIZE = 50
+ROSTER_MAX_PAGE_SIZE = 200
+ADHERENCE_DAYS = 7
+ROSTER_SORTS = ("name", "dosha")
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token, length):
+    """The key list of a next-page cursor: length - 1 strings, then the patient id; None if it isn't one."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    *keys, pid = values
+    if not all(isinstance(k, str) for k in keys) or not isinstance(pid, int) or isinstance(pid, bool):
+        return None
+    return values
+
+
+def roster_page(sort="name", dosha=None, after=None, limit=ROSTER_PAGE_SIZE, today=None, query=False):
+    """
+    One roster page as (rows, next_after). A single statement: the page of
+    patients is cut by keyset on the sort key (ix_patient_name or
+    ix_patient_dosha_name), then joined to the last ADHERENCE_DAYS of the
+    DailyNutrition rollup aggregated with one GROUP BY. `after` is the
+    previous page's next_after; next_after is None on the last page.
+    query=True returns the statement instead (for check-query-plans).
+    """
+    today = today or datetime.date.today()
+    since = today - datetime.timedelta(days=ADHERENCE_DAYS - 1)
+    keys = [DOSHA_KEY, Patient.name, Patient.id] if sort == "dosha" else [Patient.name, Patient.id]
+
+    page = db.select(Patient.id, Patient.name, Patient.email, Patient.prakriti, DOSHA_KEY.label("dosha"))
+    if dosha is not None:
+        page = page.where(DOSHA_KEY == dosha)
+    if after is not None and sort == "dosha":
+        # SQLite can't seek an expression index on a row value, so split the
+        # keyset: the rest of the current dosha, then the doshas after it
+        same = (page.where(DOSHA_KEY == after[0], db.tuple_(Patient.name, Patient.id) > tuple(after[1:]))
+                .order_by(Patient.name, Patient.id))
+        rest = page.where(DOSHA_KEY > after[0]).order_by(*keys)
+        parts = [db.select(*q.limit(limit).subquery().c) for q in (same, rest)]
+        both = db.union_all(*parts).subquery()
+        page = (db.select(*both.c).order_by(both.c.dosha, both.c.name, both.c.id)
+                .limit(limit).subquery())
+    else:
+        if after is not None:
+            page = page.where(db.tuple_(*keys) > tuple(after))
+        page = page.order_by(*keys).limit(limit).subquery()
+
+    week = (db.select(DailyNutrition.patient_id,
+                      db.func.sum(DailyNutrition.logged_count).label("logged"),
+                      db.func.sum(DailyNutrition.eaten_count).label("eaten"),
+                      db.func.avg(DailyNutrition.calories).label("avg_calories"))
+            .where(DailyNutrition.patient_id.in_(db.select(page.c.id)),
+                   DailyNutrition.date >= since, DailyNutrition.date <= today)
+            .group_by(DailyNutrition.patient_id)
+            .subquery())
+    last_logged = (db.select(db.func.max(DailyNutrition.date))
+                   .where(DailyNutrition.patient_id == page.c.id)
+                   .scalar_subquery())
+    outer_keys = [page.c.dosha, page.c.name, page.c.id] if sort == "dosha" else [page.c.name, page.c.id]
+    q = (db.select(page, last_logged.label("last_logged"), week.c.logged, week.c.eaten, week.c.avg_calories)
+         .outerjoin(week, week.c.patient_id == page.c.id)
+         .order_by(*outer_keys))
+    if query:
+        return q
+
+    rows = []
+    for r in db.session.execute(q):
+        logged, eaten = r.logged or 0, r.eaten or 0
+        rows.append({
+            "id": r.id, "name": r.name, "email": r.email, "prakriti": r.prakriti,
+            "last_logged": r.last_logged.isoformat() if r.last_logged else None,
+            "logged_7d": logged, "eaten_7d": eaten,
+            "adherence": round(eaten / logged, 3) if logged else None,
+            "avg_calories": round(r.avg_calories, 1) if r.avg_calories is not None else None,
+        })
+    next_after = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_after = [last["name"], last["id"]]
+        if sort == "dosha":
+            next_after.insert(0, last["prakriti"] or "")
+    return rows, next_after
+
+
+def dosha_labels():
+    """Prakriti labels present in the roster (read from ix_patient_dosha_name)."""
+    return db.session.scalars(db.select(DOSHA_KEY).distinct().order_by(DOSHA_KEY)).all()
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == "POST":
+        email = request.form.get('email')
+        password = request.form.get('password')
+        pr = Practitioner.query.filter_by(email=email).first()
+        if not pr or not check_password_hash(pr.password, password):
+            flash("Invalid credentials", "danger")
+            return redirect(url_for('practitioner.login'))
+        session['practitioner_id'] = pr.id
+        flash(f"Welcome, {pr.name}", "success")
+        return redirect(url_for('practitioner.roster'))
+    return render_template('practitioner_login.html')
+
+
+@bp.route('/logout')
+def logout():
+    session.pop('practitioner_id', None)
+    flash("Logged out", "info")
+    return redirect(url_for('practitioner.login'))
+
+
+@bp.route('/patients')
+@practitioner_required
+def roster():
+    """?sort=name|dosha, ?dosha=<prakriti label> (or "none": not assessed), ?after=<cursor>, ?per_page=N."""
+    sort = request.args.get('sort', 'name')
+    if sort not in ROSTER_SORTS:
+        sort = 'name'
+    dosha = request.args.get('dosha') or None
+    limit = min(max(request.args.get('per_page', ROSTER_PAGE_SIZE, type=int), 1), ROSTER_MAX_PAGE_SIZE)
+    after = None
+    if request.args.get('after'):
+        after = _decode_cursor(request.args['after'], 3 if sort == "dosha" else 2)
+        if after is None:
+            abort(400)
+    rows, next_after = roster_page(sort, "" if dosha == "none" else dosha, after, limit)
+    next_cursor = _encode_cursor(next_after) if next_after else None
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify({"patients": rows, "next": next_cursor})
+    return render_template('practitioner_roster.html', patients=rows, sort=sort, dosha=dosha,
+                           per_page=limit, next_cursor=next_cursor, doshas=dosha_labels(),
+                           adherence_days=ADHERENCE_DAYS)
@@ -0,0 +1,44 @@
+"""
+The MealLog/DailyNutrition statements behind the per-patient routes, built
+in one place so the Flask views, the async API and `flask check-query-plans`
+(cli.hot_queries) all run the same SQL. The history and sync feed queries
+are built the same way in history.py and sync.py.
+"""
+from .models import DailyNutrition, MealLog, db
+
+
+def meals_on(patient_id, day):
+    """A patient's meals logged for day (dashboard, nutrition analysis)."""
+    return db.select(MealLog).where(MealLog.patient_id == patient_id, MealLog.date == day)
+
+
+def meals_since(patient_id, since):
+    """A patient's meals from since on, newest day first (meal log page)."""
+    return (db.select(MealLog).where(MealLog.patient_id == patient_id, MealLog.date >= since)
+            .order_by(MealLog.date.desc()))
+
+
+def meals_between(patient_id, start, end):
+    """A patient's meals between start and end (inclusive), newest day first (API meal list)."""
+    return (db.select(MealLog)
+            .where(MealLog.patient_id == patient_id, MealLog.date >= start, MealLog.date <= end)
+            .order_by(MealLog.date.desc(), MealLog.id))
+
+
+def mark_eaten(patient_id, ids, seq):
+    """UPDATE marking the patient's meals among ids eaten, returning the rows it changed as MealRecord fields."""
+    return (db.update(MealLog)
+            .where(MealLog.id.in_(ids), MealLog.patient_id == patient_id,
+                   db.or_(MealLog.eaten.is_(None), MealLog.eaten.is_(False)))
+            .values(eaten=True, change_seq=seq)
+            .returning(MealLog.id, MealLog.patient_id, MealLog.date, MealLog.meal_type, MealLog.meal,
+                       MealLog.food, MealLog.eaten)
+            .execution_options(synchronize_session=False))
+
+
+def daily_nutrition_between(patient_id, start, end):
+    """A patient's DailyNutrition rows between start and end (inclusive), oldest first (nutrition trend)."""
+    return (db.select(DailyNutrition)
+            .where(DailyNutrition.patient_id == patient_id,
+                   DailyNutrition.date >= start, DailyNutrition.date <= end)
+            .order_by(DailyNutrition.date))
@@ -0,0 +1,189 @@
+"""
+Recommendations from the co-occurrence model (recommender.py).
+
+The model lives in each worker process. It is loaded from the snapshot
+written by `flask rebuild-recommender` (or built from MealLog in the
+background, serving the cold-start popularity list until then), updated
+incrementally by this worker's log/eaten events, compacted once the pending
+increments grow, and rebuilt in the background when it gets old.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from itertools import groupby
+
+import food_rules
+from flask import current_app
+
+from . import plans, rules
+from .catalog import breakfast_list, dinner_list, lunch_list, meal_resolver, nutrition_db
+from .models import MealLog, db
+
+RECOMMENDER_MAX_AGE = 15 * 60          # seconds before a background rebuild
+RECOMMENDER_COMPACT_AT = 20000         # pending co-occurrence increments
+RECOMMENDER_HISTORY_DAYS = 30
+RECOMMENDER_MAX_ITEMS = 5000           # larger catalogues: only foods that are logged or planned
+
+_recommender = None
+_recommender_lock = threading.Lock()
+_recommender_rebuilding = False
+
+
+def recommender_snapshot():
+    return os.path.join(current_app.instance_path, "recommender.npz")
+
+
+def recommender_items():
+    """
+    Foods the model scores. An imported catalogue can hold tens of thousands of
+    foods nobody logs; those are left out rather than evaluated against the
+    diet rules for every profile.
+    """
+    if len(nutrition_db) <= RECOMMENDER_MAX_ITEMS:
+        return list(nutrition_db)
+    logged = db.session.scalars(db.select(MealLog.food).where(MealLog.food.is_not(None)).distinct())
+    planned = breakfast_list + lunch_list + dinner_list
+    planned += rules.current().planned_foods()
+    return [f for f in dict.fromkeys([*planned, *logged]) if f in nutrition_db]
+
+
+def build_recommender(chunk_size=10000):
+    """Build the model from every MealLog row, one basket per patient-day."""
+    from recommender import CooccurrenceModel
+
+    q = (db.select(MealLog.patient_id, MealLog.date, MealLog.meal, MealLog.food, MealLog.eaten)
+         .order_by(MealLog.patient_id, MealLog.date)
+         .execution_options(yield_per=chunk_size))
+    resolver = meal_resolver()
+
+    def baskets():
+        for _, rows in groupby(db.session.execute(q), key=lambda r: (r.patient_id, r.date)):
+            rows = list(rows)
+            yield [r.food or resolver.resolve(r.meal) for r in rows], [bool(r.eaten) for r in rows]
+    return CooccurrenceModel.build(recommender_items(), baskets())
+
+
+def popularity_recommender():
+    """
+    A model with per-food logged/eaten counts and no co-occurrences, from one
+    aggregate query: it answers with the cold-start popularity list while the
+    full model is built.
+    """
+    from recommender import CooccurrenceModel
+
+    model = CooccurrenceModel(recommender_items())
+    q = (db.select(MealLog.food, db.func.count(), db.func.sum(db.case((MealLog.eaten, 1), else_=0)))
+         .where(MealLog.food.is_not(None)).group_by(MealLog.food))
+    for food, logged, eaten in db.session.execute(q):
+        i = model.index.get(food)
+        if i is not None:
+            model.logged[i], model.eaten[i] = logged, eaten or 0
+    return model
+
+
+def _rebuild_recommender_in_background(app):
+    global _recommender, _recommender_rebuilding
+    try:
+        with app.app_context():
+            model = build_recommender()
+        _recommender = model
+    finally:
+        _recommender_rebuilding = False
+
+
+def get_recommender():
+    global _recommender, _recommender_rebuilding
+    from recommender import CooccurrenceModel
+
+    with _recommender_lock:
+        if _recommender is None:
+            snapshot = recommender_snapshot()
+            if os.path.exists(snapshot):
+                _recommender = CooccurrenceModel.load(snapshot)
+            else:
+                _recommender = popularity_recommender()
+                _recommender.built_at = 0     # rebuilt below
+        model = _recommender
+        if time.time() - model.built_at > RECOMMENDER_MAX_AGE and not _recommender_rebuilding:
+            _recommender_rebuilding = True
+            threading.Thread(target=_rebuild_recommender_in_background,
+                             args=(current_app._get_current_object(),), daemon=True).start()
+    if model.delta_size > RECOMMENDER_COMPACT_AT:
+        model.compact()
+    return model
+
+
+def loaded_recommender():
+    """This worker's model if it has been loaded, else None (nothing to update yet)."""
+    return _recommender
+
+
+def recommender_existing(rows):
+    """
+    (date, food) pairs already logged on the days of rows (insert dicts for
+    one patient), for recommender_observe; query them before inserting rows.
+    Empty until the model is first loaded.
+    """
+    if _recommender is None or not rows:
+        return []
+    return db.session.execute(
+        db.select(MealLog.date, MealLog.food)
+        .where(MealLog.patient_id == rows[0]["patient_id"],
+               MealLog.date.in_({r["date"] for r in rows}))).all()
+
+
+def recommender_observe(rows, existing=(), eaten_foods=()):
+    """
+    Feed new MealLog rows (insert dicts for one patient) and newly eaten foods
+    into this worker's model. Call after the commit, so a rolled-back write is
+    never counted. existing: (date, food) pairs logged on those days before
+    rows were inserted (recommender_existing).
+    Skipped until the model is first loaded; the build reads the rows from MealLog.
+    """
+    model = _recommender
+    if model is None:
+        return
+    before = defaultdict(list)
+    for day, food in existing:
+        if food:
+            before[day].append(food)
+    by_day = defaultdict(list)
+    for r in rows:
+        if r["food"]:
+            by_day[r["date"]].append(r["food"])
+    for day, foods in by_day.items():
+        model.record_meals(before[day], foods)
+    model.record_eaten([r["food"] for r in rows if r["eaten"] and r["food"]] + [f for f in eaten_foods if f])
+
+
+@lru_cache(maxsize=256)
+def _suitable_mask(prakriti, agni, ama, allergy, items, version):
+    import numpy as np
+
+    allergy_list = [a.strip() for a in allergy.split(",") if a.strip()]
+    profile = food_rules.make_profile(prakriti, agni, ama, allergy_list)
+    verdicts = rules.current().foods.evaluate_foods(items, profile)
+    return np.array([verdicts[i][0] for i in items], dtype=bool)
+
+
+def recommend_for(p, k=5):
+    """Top-k suitable foods for a patient from their recent MealLog history."""
+    model = get_recommender()
+    today = datetime.date.today()
+    since = today - datetime.timedelta(days=RECOMMENDER_HISTORY_DAYS)
+    history, todays = defaultdict(float), set()
+    for day, meal, food, eaten in db.session.execute(
+            db.select(MealLog.date, MealLog.meal, MealLog.food, MealLog.eaten)
+            .where(MealLog.patient_id == p.id, MealLog.date >= since)):
+        food = food or meal_resolver().resolve(meal)
+        if not food:
+            continue
+        history[food] += (2.0 if eaten else 1.0) * 0.9 ** (today - day).days
+        if day == today:
+            todays.add(food)
+    allowed = _suitable_mask(p.prakriti, p.agni, p.ama, p.allergy or "",
+                             tuple(model.items), plans.plan_cache_version)
+    return model.top_k(history, k=k, allowed=allowed, exclude=todays), len(history)
@@ -0,0 +1,165 @@
+"""
+Daily nutrition rollup: DailyNutrition rows are kept current with
+INSERT .. ON CONFLICT deltas as meals are logged or eaten, and can be rebuilt
+from the meal history (MealLog and the archive) for backfills.
+"""
+import datetime
+
+from .catalog import meal_resolver, nutrient_table, nutrition_db
+from .history import meal_records
+from .models import DailyNutrition, Patient, db
+
+ROLLUP_FIELDS = ("calories", "protein", "carbs", "fat", "eaten_count", "logged_count")
+MACROS = ROLLUP_FIELDS[:4]      # the nutrients.NUTRIENTS columns, without importing numpy
+MEAL_MAX_LENGTH = 250           # MealLog.meal
+MEAL_TYPE_MAX_LENGTH = 50       # MealLog.meal_type
+REBUILD_BATCH = 200             # patients per rebuild transaction
+LAST_ID = 2 ** 63 - 1
+
+
+def _upsert(dialect):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def daily_nutrition_upserts(deltas, dialect):
+    """INSERT .. ON CONFLICT statements adding deltas {(patient_id, date): {field: amount}}."""
+    insert = _upsert(dialect)
+    for (pid, day), delta in deltas.items():
+        values = {f: delta.get(f, 0) for f in ROLLUP_FIELDS}
+        if not any(values.values()):
+            continue
+        stmt = insert(DailyNutrition).values(patient_id=pid, date=day, **values)
+        yield stmt.on_conflict_do_update(
+            index_elements=[DailyNutrition.patient_id, DailyNutrition.date],
+            set_={f: getattr(DailyNutrition, f) + values[f] for f in ROLLUP_FIELDS if values[f]})
+
+
+def bump_daily_nutrition(deltas):
+    """
+    Add deltas to DailyNutrition rows, creating them as needed.
+    deltas: {(patient_id, date): {field: amount}}. Runs in the caller's transaction.
+    """
+    for stmt in daily_nutrition_upserts(deltas, db.engine.dialect.name):
+        db.session.execute(stmt)
+
+
+def meal_nutrients(food):
+    info = nutrition_db.get(food) or {}
+    return {k: info.get(k, 0) for k in MACROS}
+
+
+def clean_meal(value, where):
+    """A client's meal name, stripped. Raises ValueError unless it is a non-empty string that fits MealLog.meal."""
+    name = value.strip() if isinstance(value, str) else ""
+    if not name:
+        raise ValueError(f"{where}: 'meal' must be a non-empty string")
+    if len(name) > MEAL_MAX_LENGTH:
+        raise ValueError(f"{where}: 'meal' is longer than {MEAL_MAX_LENGTH} characters")
+    return name
+
+
+def clean_meal_type(value, where):
+    """A client's meal type, "Snack" when missing or blank. Raises ValueError unless it is a string that fits."""
+    if value is None:
+        return "Snack"
+    if not isinstance(value, str):
+        raise ValueError(f"{where}: 'meal_type' must be a string")
+    value = value.strip()
+    if len(value) > MEAL_TYPE_MAX_LENGTH:
+        raise ValueError(f"{where}: 'meal_type' is longer than {MEAL_TYPE_MAX_LENGTH} characters")
+    return value or "Snack"
+
+
+def meal_rows(patient_id, meals):
+    """
+    Validate client meal entries and build MealLog insert rows plus rollup deltas.
+    meals: [{"meal", "meal_type"?, "date"?, "eaten"?}]. Raises ValueError on bad input.
+    """
+    today = datetime.date.today()
+    rows, deltas = [], {}
+    for i, item in enumerate(meals):
+        if not isinstance(item, dict):
+            raise ValueError(f"meals[{i}]: must be an object")
+        name = clean_meal(item.get("meal"), f"meals[{i}]")
+        meal_type = clean_meal_type(item.get("meal_type"), f"meals[{i}]")
+        try:
+            day = datetime.date.fromisoformat(item["date"]) if item.get("date") else today
+        except (TypeError, ValueError):
+            raise ValueError(f"meals[{i}]: invalid date")
+        food = meal_resolver().resolve(name)
+        eaten = bool(item.get("eaten"))
+        rows.append({"patient_id": patient_id, "date": day, "meal": name,
+                     "meal_type": meal_type, "food": food, "eaten": eaten})
+        delta = deltas.setdefault((patient_id, day), dict.fromkeys(ROLLUP_FIELDS, 0))
+        for k, v in meal_nutrients(food).items():
+            delta[k] += v
+        delta["logged_count"] += 1
+        delta["eaten_count"] += eaten
+    return rows, deltas
+
+
+def rebuild_patients(conn, lo, hi, start=None, end=None, chunk_size=10000):
+    """
+    Recompute the DailyNutrition rows of patients lo < id <= hi from their
+    meal history, in conn's transaction. The patients' rows are locked first,
+    as every meal write does (sync.reserve), so no write lands between the read
+    and the rewrite. Returns the number of patient-days written.
+    """
+    in_range = (Patient.id > lo, Patient.id <= hi)
+    conn.execute(db.update(Patient).where(*in_range).values(change_seq=Patient.change_seq))
+    ids = list(conn.scalars(db.select(Patient.id).where(*in_range)))
+    groups, items, eaten = [], [], {}
+    if ids:
+        for m in meal_records(ids, start, end, chunk_size, conn=conn):
+            groups.append((m.patient_id, m.date))
+            items.append(m.food or meal_resolver().resolve(m.meal))
+            if m.eaten:
+                eaten[(m.patient_id, m.date)] = eaten.get((m.patient_id, m.date), 0) + 1
+    scope = [DailyNutrition.patient_id > lo, DailyNutrition.patient_id <= hi]
+    if start:
+        scope.append(DailyNutrition.date >= start)
+    if end:
+        scope.append(DailyNutrition.date <= end)
+    conn.execute(db.delete(DailyNutrition).where(*scope))
+    if not groups:
+        return 0
+    table = nutrient_table()
+    keys, totals = table.group_matrix(groups, items)
+    logged = {}
+    for g in groups:
+        logged[g] = logged.get(g, 0) + 1
+    rows = [
+        {"patient_id": pid, "date": day,
+         **{n: round(float(v), 2) for n, v in zip(table.nutrients, totals[i])},
+         "eaten_count": eaten.get((pid, day), 0), "logged_count": logged[(pid, day)]}
+        for i, (pid, day) in enumerate(keys)
+    ]
+    for i in range(0, len(rows), chunk_size):
+        conn.execute(db.insert(DailyNutrition), rows[i:i + chunk_size])
+    return len(rows)
+
+
+def rebuild_daily_nutrition(start=None, end=None, chunk_size=10000, batch_size=REBUILD_BATCH):
+    """
+    Recompute DailyNutrition from MealLog and the archive, optionally limited
+    to a date range: batch_size patients per transaction (rebuild_patients),
+    so meals logged meanwhile are never lost and writers only wait for their
+    own batch. Returns the number of patient-days written.
+    """
+    total, lo = 0, 0
+    while True:
+        hi = db.session.scalar(db.select(Patient.id).where(Patient.id > lo).order_by(Patient.id)
+                               .offset(batch_size - 1).limit(1))
+        db.session.close()
+        last = hi is None
+        if last:
+            hi = LAST_ID     # the rest, and the rows of patients deleted since
+        with db.engine.begin() as conn:
+            total += rebuild_patients(conn, lo, hi, start, end, chunk_size)
+        if last:
+            return total
+        lo = hi
@@ -0,0 +1,44 @@
+"""
+The diet rule pack in use by this process (see rule_pack.py).
+
+create_app() points the store at RULE_PACK, and the Flask app and the
+async API (api.py) check the file for changes before requests, so edits
+reach every worker within RULES_CHECK_INTERVAL seconds without a restart. Requests already running keep the pack they
+started with.
+"""
+import os
+
+import rule_pack
+
+DEFAULT_RULE_PACK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules", "default.json")
+RULES_CHECK_INTERVAL = 2.0      # seconds between stat() calls on the pack file
+
+_store = None
+
+
+def configure(path, check_interval=RULES_CHECK_INTERVAL, on_swap=None):
+    """Serve rules from the pack at path (loaded on first use)."""
+    global _store
+    _store = rule_pack.PackStore(path, check_interval, on_swap)
+    return _store
+
+
+def store():
+    if _store is None:
+        configure(os.environ.get("RULE_PACK", DEFAULT_RULE_PACK))
+    return _store
+
+
+def current():
+    """The current RulePack. Take it once and use it for the whole computation."""
+    return store().current()
+
+
+def refresh():
+    """before_request hook: pick up a changed pack file."""
+    store().refresh()
+
+
+def refresh_due():
+    """True when refresh() would touch the file; the async API only leaves the event loop for it then."""
+    return store().due()
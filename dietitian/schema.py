@@ -0,0 +1,144 @@
+"""
+The app's schema history, applied by migrations.py.
+
+Migrations are never edited once released: a schema change (a column, an
+index, a table) is a new Migration at the end of MIGRATIONS, with a Backfill
+when existing rows need rewriting. Version 1 creates whatever tables are
+missing from the models, so a new database is complete after it and the
+later steps find nothing to do; databases from before the version table run
+every step and get only what they lack.
+
+On first use (first request, `flask` command, API startup) ensure_schema()
+runs the quick schema steps, then the deferred work (index builds,
+backfills) on a background thread while the app serves requests; `flask
+migrate` runs all of it in the foreground with progress. A request never
+waits for another process's migration: it goes ahead on the schema as it is.
+"""
+import logging
+import threading
+
+from flask import current_app
+from migrations import Backfill, Migration, Migrator, add_column, create_index, create_tables
+
+from .catalog import meal_resolver
+from .models import DailyNutrition, MealLog, MealLogDeletion, Patient, db
+from .rollup import rebuild_patients
+
+log = logging.getLogger(__name__)
+
+
+def _index(name):
+    return next(ix for t in db.metadata.sorted_tables for ix in t.indexes if ix.name == name)
+
+
+def resolve_foods(conn, lo, hi):
+    """Fill MealLog.food for rows logged before it existed (readers resolve those on every read)."""
+    rows = conn.execute(db.select(MealLog.id, MealLog.meal)
+                        .where(MealLog.id > lo, MealLog.id <= hi, MealLog.food.is_(None))).all()
+    resolver = meal_resolver()
+    found = [{"mid": mid, "b_meal": meal, "b_food": food} for mid, meal in rows if (food := resolver.resolve(meal))]
+    if found:
+        # an edit since the read has resolved its own food; leave it
+        conn.execute(db.update(MealLog)
+                     .where(MealLog.id == db.bindparam("mid"), MealLog.meal == db.bindparam("b_meal"),
+                            MealLog.food.is_(None))
+                     .values(food=db.bindparam("b_food")), found)
+    return len(found)
+
+
+def stamp_change_seqs(conn, lo=None, hi=None):
+    """
+    Sequence MealLog rows written without one (databases older than the
+    change feed, bulk loads) with ids in (lo, hi] (default: all), so sync
+    clients pick them up. Each patient with such rows first reserves hi - lo
+    numbers, which locks it like any other write, then row id gets the
+    reserved number id - lo. Returns the number of rows stamped.
+    """
+    if lo is None:
+        lo, hi = 0, conn.scalar(db.select(db.func.max(MealLog.id))) or 0
+    span = hi - lo
+    unstamped = (MealLog.change_seq == 0, MealLog.id > lo, MealLog.id <= hi)
+    conn.execute(db.update(Patient)
+                 .where(Patient.id.in_(db.select(MealLog.patient_id).where(*unstamped)))
+                 .values(change_seq=Patient.change_seq + span))
+    head = db.select(Patient.change_seq).where(Patient.id == MealLog.patient_id).scalar_subquery()
+    return conn.execute(db.update(MealLog).where(*unstamped)
+                        .values(change_seq=head - span + MealLog.id - lo)).rowcount
+
+
+def _any(*where):
+    return lambda conn: conn.scalar(db.select(MealLog.id).where(*where).limit(1)) is not None
+
+
+MIGRATIONS = [
+    Migration(1, "create tables", [create_tables(metadata=db.metadata)]),
+    Migration(2, "resolved food on meal_log", [add_column("meal_log", "food", "VARCHAR(250)")],
+              Backfill(MealLog.__table__, resolve_foods, pending=_any(MealLog.food.is_(None)))),
+    Migration(3, "change feed", [
+        add_column("patient", "change_seq", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("patient", "profile_seq", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("meal_log", "change_seq", "INTEGER NOT NULL DEFAULT 0"),
+        create_tables(MealLogDeletion.__table__),
+    ], Backfill(MealLog.__table__, stamp_change_seqs, pending=_any(MealLog.change_seq == 0))),
+    Migration(4, "query indexes", [create_index(_index(name)) for name in (
+        "ix_meal_log_patient_date", "ix_meal_log_date", "ix_patient_name", "ix_patient_dosha_name",
+        "ix_meal_log_patient_seq", "ix_meal_log_deletion_patient_seq")]),
+    # daily_nutrition came in empty with "create tables" on databases that already had meals
+    Migration(5, "daily nutrition rollup", [create_tables(DailyNutrition.__table__)],
+              Backfill(Patient.__table__, rebuild_patients, pending=_any())),
+]
+
+
+def migrator():
+    return Migrator(db.engine, MIGRATIONS)
+
+
+def init_schema(wait=0):
+    """
+    Run the schema steps of pending migrations (not their index builds or
+    backfills), waiting up to wait seconds for another process doing the
+    same. Returns the migrations applied, or None if another process is at it.
+    """
+    return migrator().upgrade(wait)
+
+
+def run_deferred(progress=None, **options):
+    """Unfinished index builds and backfills, batched and throttled as configured (MIGRATION_BATCH_SIZE, _PAUSE, _MAX_LOAD)."""
+    config = current_app.config
+    kwargs = {"batch_size": config['MIGRATION_BATCH_SIZE'], "pause": config['MIGRATION_PAUSE'],
+              "max_load": config['MIGRATION_MAX_LOAD']}
+    kwargs.update({k: v for k, v in options.items() if v is not None})
+    return migrator().run_deferred(progress=progress, **kwargs)
+
+
+def start_deferred(app):
+    """Run unfinished index builds and backfills on a daemon thread (a no-op while another process runs them)."""
+    def run():
+        with app.app_context():
+            try:
+                run_deferred()
+            except Exception:
+                log.exception("deferred migration stopped; it resumes on the next start or `flask migrate`")
+
+    threading.Thread(target=run, name="schema-deferred", daemon=True).start()
+
+
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(wait=0):
+    """
+    init_schema() once per app and process, then the deferred work in the
+    background; cheap to call per request. While another process holds the
+    upgrade, requests go ahead (wait=0) and the next one tries again.
+    """
+    state = current_app.extensions["dietitian"]
+    if state["schema_ready"]:
+        return
+    with _schema_lock:
+        if not state["schema_ready"]:
+            if init_schema(wait) is None:
+                return
+            state["schema_ready"] = True
+            if current_app.config['BACKGROUND_BACKFILLS'] and migrator().unfinished():
+                start_deferred(current_app._get_current_object())
@@ -0,0 +1,240 @@
+"""
+Delta sync for mobile clients: a per-patient change feed over MealLog and
+the patient's profile, and batched offline edits with conflict detection.
+
+Every write to a patient's rows first bumps Patient.change_seq (seq_bump())
+and stamps the rows it touches with the new numbers. The bump takes the
+patient row's write lock for the rest of the transaction, so one patient's
+sequence numbers commit in order and a client holding cursor N has seen
+everything numbered N or lower. Deleted rows leave a MealLogDeletion
+tombstone carrying the delete's number.
+
+    changes_since(patient_id, cursor)   rows changed after cursor, in pages
+    apply_changes(patient_id, changes)  offline inserts/updates/deletes
+    sync(patient_id, cursor, changes)   both, as one request
+
+Both are served at /api/sync (views.py) and /api/v1/sync (api_router.py).
+"""
+import datetime
+
+from .catalog import meal_resolver
+from .models import MealLog, MealLogDeletion, Patient, db
+from .recommendations import recommender_existing, recommender_observe
+from .rollup import ROLLUP_FIELDS, bump_daily_nutrition, clean_meal, clean_meal_type, meal_nutrients, meal_rows
+
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+SYNC_MAX_CHANGES = 500
+SYNC_MEAL_FIELDS = ("id", "date", "meal", "meal_type", "food", "eaten", "seq")
+SYNC_PATIENT_FIELDS = ("name", "age", "prakriti", "agni", "ama", "allergy")
+SYNC_EDITABLE = ("meal", "meal_type", "date", "eaten")
+
+
+class CursorAhead(ValueError):
+    """The client's cursor is past this patient's sequence: it must resync from 0."""
+
+
+def seq_bump(patient_id, n=1):
+    """UPDATE reserving n sequence numbers for a patient; RETURNING gives the last one."""
+    return (db.update(Patient).where(Patient.id == patient_id)
+            .values(change_seq=Patient.change_seq + n)
+            .returning(Patient.change_seq))
+
+
+def profile_bump():
+    """Extra UPDATE Patient values for a profile change (questionnaire results, ...)."""
+    return {"change_seq": Patient.change_seq + 1, "profile_seq": Patient.change_seq + 1}
+
+
+def stamp(rows, last_seq):
+    """Number insert rows with the sequence numbers ending at last_seq (from seq_bump)."""
+    first = last_seq - len(rows) + 1
+    for i, row in enumerate(rows):
+        row["change_seq"] = first + i
+    return rows
+
+
+def reserve(patient_id, n=1):
+    """seq_bump() in the current session's transaction; returns the last reserved number."""
+    db.session.info.setdefault("changed_patients", set()).add(patient_id)    # live.py wakes their streams
+    return db.session.execute(seq_bump(patient_id, n)).scalar_one()
+
+
+def _meal(m):
+    return [m.id, m.date.isoformat(), m.meal, m.meal_type, m.food, bool(m.eaten), m.change_seq]
+
+
+def _in_feed(model, patient_id, cursor, upto):
+    return model.patient_id == patient_id, model.change_seq > cursor, model.change_seq <= upto
+
+
+def feed_page_end(model, patient_id, cursor, head, limit):
+    """The change_seq of model's limit-th feed entry after cursor (a page ends there when it exists)."""
+    return (db.select(model.change_seq).where(*_in_feed(model, patient_id, cursor, head))
+            .order_by(model.change_seq).offset(limit - 1).limit(1))
+
+
+def feed_meals(patient_id, cursor, upto):
+    """MealLog rows changed in (cursor, upto], in feed order."""
+    return (db.select(MealLog).where(*_in_feed(MealLog, patient_id, cursor, upto))
+            .order_by(MealLog.change_seq, MealLog.id))
+
+
+def feed_deletions(patient_id, cursor, upto):
+    """Ids of MealLog rows deleted in (cursor, upto], in feed order."""
+    return (db.select(MealLogDeletion.meal_id).where(*_in_feed(MealLogDeletion, patient_id, cursor, upto))
+            .order_by(MealLogDeletion.change_seq))
+
+
+def changes_since(patient_id, cursor=0, limit=SYNC_PAGE_SIZE):
+    """
+    The patient's changes after cursor: {"cursor", "more", "fields", "meals",
+    "deleted", "patient"}. meals are SYNC_MEAL_FIELDS lists, deleted the ids
+    of removed rows, patient the profile when it changed (always on cursor 0).
+    Pass the returned cursor next time; while "more" is true there is another
+    page. A page ends on a sequence boundary, so it may run a little past limit.
+    Raises CursorAhead when cursor is beyond anything issued.
+    """
+    head, profile_seq = db.session.execute(
+        db.select(Patient.change_seq, Patient.profile_seq).where(Patient.id == patient_id)).one()
+    if cursor > head:
+        raise CursorAhead(f"cursor {cursor} is ahead of {head}")
+    upto = head
+    for model in (MealLog, MealLogDeletion):
+        nth = db.session.scalar(feed_page_end(model, patient_id, cursor, head, limit))
+        if nth is not None:
+            upto = min(upto, nth)
+    meals = db.session.scalars(feed_meals(patient_id, cursor, upto))
+    deleted = db.session.scalars(feed_deletions(patient_id, cursor, upto))
+    patient = None
+    if cursor == 0 or cursor < profile_seq <= upto:
+        row = db.session.execute(
+            db.select(*(getattr(Patient, f) for f in SYNC_PATIENT_FIELDS)).where(Patient.id == patient_id)).one()
+        patient = dict(zip(SYNC_PATIENT_FIELDS, row))
+    return {"cursor": upto, "more": upto < head, "fields": SYNC_MEAL_FIELDS,
+            "meals": [_meal(m) for m in meals], "deleted": deleted.all(), "patient": patient}
+
+
+def _contribution(m):
+    """m's share of its DailyNutrition row."""
+    return {**meal_nutrients(m.food), "logged_count": 1, "eaten_count": int(bool(m.eaten))}
+
+
+def _add(deltas, key, contribution, sign):
+    delta = deltas.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+    for k, v in contribution.items():
+        delta[k] += sign * v
+
+
+def _edits(i, change):
+    values = {}
+    for field in SYNC_EDITABLE:
+        if field not in change:
+            continue
+        v = change[field]
+        if field == "meal":
+            values["meal"] = clean_meal(v, f"changes[{i}]")
+            values["food"] = meal_resolver().resolve(values["meal"])
+        elif field == "date":
+            try:
+                values["date"] = datetime.date.fromisoformat(v)
+            except (TypeError, ValueError):
+                raise ValueError(f"changes[{i}]: invalid date")
+        elif field == "eaten":
+            values["eaten"] = bool(v)
+        else:
+            values["meal_type"] = clean_meal_type(v, f"changes[{i}]")
+    return values
+
+
+def apply_changes(patient_id, changes):
+    """
+    Apply a batch of offline edits in one transaction and commit.
+
+    changes: [{"op": "insert", "ref"?, "meal", "meal_type"?, "date"?, "eaten"?},
+              {"op": "update", "id", "base_seq", <any of meal/meal_type/date/eaten>},
+              {"op": "delete", "id", "base_seq"}]
+    base_seq is the row's "seq" as the client last synced it. An update or
+    delete whose row has changed since (or is gone) is not applied and comes
+    back as a conflict with the server's current row, for the client to merge.
+    Returns {"applied": [{"index", "ref", "id", "seq"}], "conflicts": [{"index",
+    "id", "reason", "meal"}]}. Raises ValueError on malformed input (nothing is
+    written).
+    """
+    if not isinstance(changes, list):
+        raise ValueError("'changes' must be a list")
+    if len(changes) > SYNC_MAX_CHANGES:
+        raise ValueError(f"at most {SYNC_MAX_CHANGES} changes per request")
+    if not changes:
+        return {"applied": [], "conflicts": []}
+    inserts, rows, deltas, edits = [], [], {}, []
+    for i, change in enumerate(changes):
+        op = change.get("op") if isinstance(change, dict) else None
+        if op == "insert":
+            try:
+                (row,), delta = meal_rows(patient_id, [change])
+            except ValueError as e:
+                raise ValueError(f"changes[{i}]{str(e)[len('meals[0]'):]}")
+            inserts.append((i, change))
+            rows.append(row)
+            for key, d in delta.items():
+                _add(deltas, key, d, 1)
+        elif op in ("update", "delete"):
+            if not isinstance(change.get("id"), int) or not isinstance(change.get("base_seq"), int):
+                raise ValueError(f"changes[{i}]: 'id' and 'base_seq' must be integers")
+            edits.append((i, op, change, _edits(i, change) if op == "update" else None))
+        else:
+            raise ValueError(f"changes[{i}]: 'op' must be insert, update or delete")
+
+    # reserve numbers first: this also locks the patient, so nothing moves under the base_seq checks
+    seq = reserve(patient_id, len(changes)) - len(changes)
+    applied, conflicts, eaten_foods = [], [], []
+    current = {m.id: m for m in db.session.scalars(
+        db.select(MealLog).where(MealLog.id.in_([c["id"] for _, _, c, _ in edits]),
+                                 MealLog.patient_id == patient_id))}
+    for i, op, change, values in edits:
+        m = current.get(change["id"])
+        if m is None or m.change_seq != change["base_seq"]:
+            conflicts.append({"index": i, "id": change["id"], "reason": "deleted" if m is None else "changed",
+                              "meal": _meal(m) if m is not None else None})
+            continue
+        seq += 1
+        _add(deltas, (patient_id, m.date), _contribution(m), -1)
+        if op == "delete":
+            db.session.delete(m)
+            db.session.add(MealLogDeletion(meal_id=m.id, patient_id=patient_id, change_seq=seq))
+            del current[m.id]
+        else:
+            if values.get("eaten") and not m.eaten:
+                eaten_foods.append(values.get("food", m.food))
+            for k, v in values.items():
+                setattr(m, k, v)
+            m.change_seq = seq
+            _add(deltas, (patient_id, m.date), _contribution(m), 1)
+        applied.append({"index": i, "ref": change.get("ref"), "id": m.id, "seq": seq})
+
+    existing = recommender_existing(rows)
+    if rows:
+        stamp(rows, seq + len(rows))
+        ids = db.session.scalars(db.insert(MealLog).returning(MealLog.id, sort_by_parameter_order=True), rows)
+        for (i, change), row, meal_id in zip(inserts, rows, ids):
+            applied.append({"index": i, "ref": change.get("ref"), "id": meal_id, "seq": row["change_seq"]})
+    db.session.flush()
+    bump_daily_nutrition(deltas)
+    db.session.commit()
+    recommender_observe(rows, existing, eaten_foods)
+    applied.sort(key=lambda a: a["index"])
+    return {"applied": applied, "conflicts": conflicts}
+
+
+def sync(patient_id, cursor=0, changes=None, limit=SYNC_PAGE_SIZE):
+    """
+    One sync round trip: apply changes (if any), then the feed since cursor
+    (which includes them). Raises CursorAhead before writing anything, and
+    ValueError for malformed changes.
+    """
+    head = db.session.scalar(db.select(Patient.change_seq).where(Patient.id == patient_id))
+    if cursor > head:
+        raise CursorAhead(f"cursor {cursor} is ahead of {head}")
+    result = apply_changes(patient_id, changes) if changes is not None else {}
+    return {**changes_since(patient_id, cursor, limit), **result}
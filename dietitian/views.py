@@ -0,0 +1,433 @@
+"""
+Patient-facing pages and JSON endpoints, registered as the `main` blueprint.
+"""
+import datetime
+
+from flask import (
+    Blueprint, abort, current_app, flash, g, jsonify, make_response, redirect, render_template, request,
+    send_file, session, stream_with_context, url_for
+)
+from meal_archive import MealRecord
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .auth import invalidate_patient, login_required
+from .catalog import meal_food, meal_resolver, nutrition_summary, seasonal_recommendations
+from .exports import EXPORT_FORMATS, collect_reports, export_jobs, stream_meal_history
+from .live import VIEWS as LIVE_VIEWS, day_totals, fragments, open_stream, stream_url, streams_enabled
+from .models import MealLog, Patient, db
+from .plans import DEFAULT_TARGETS, optimized_meal_plan, plan_bundle
+from .queries import daily_nutrition_between, mark_eaten, meals_on, meals_since
+from .recommendations import recommend_for, recommender_existing, recommender_observe
+from .rollup import ROLLUP_FIELDS, bump_daily_nutrition, meal_nutrients, meal_rows
+from .sync import (
+    SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, CursorAhead, profile_bump, reserve, stamp, sync as sync_changes
+)
+
+bp = Blueprint("main", __name__)
+
+
+# helper to show current year in templates
+@bp.app_context_processor
+def inject_now():
+    return {'now_year': datetime.datetime.utcnow().year}
+
+
+# ---- Routes ----
+@bp.route('/')
+def index():
+    if session.get('user_id'):
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
+
+
+# Registration
+@bp.route('/register', methods=['GET','POST'])
+def register():
+    if request.method=="POST":
+        name = request.form.get('name')
+        age = request.form.get('age')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        allergy = request.form.get('allergy')
+        if not name or not email or not password:
+            flash("Name, email and password are required", "danger")
+            return redirect(url_for('main.register'))
+        if Patient.query.filter_by(email=email).first():
+            flash("Email already registered", "danger")
+            return redirect(url_for('main.register'))
+        hashed = generate_password_hash(password)
+        p = Patient(name=name, age=int(age) if age else None, email=email, password=hashed, allergy=allergy)
+        db.session.add(p)
+        db.session.commit()
+        flash("Registration successful — please login", "success")
+        return redirect(url_for('main.login'))
+    return render_template('register.html')
+
+
+# Login
+@bp.route('/login', methods=['GET','POST'])
+def login():
+    if request.method=="POST":
+        email = request.form.get('email')
+        password = request.form.get('password')
+        p = Patient.query.filter_by(email=email).first()
+        if not p or not check_password_hash(p.password, password):
+            flash("Invalid credentials", "danger")
+            return redirect(url_for('main.login'))
+        session['user_id'] = p.id
+        flash("Welcome back!", "success")
+        return redirect(url_for('main.dashboard'))
+    return render_template('login.html')
+
+
+# Logout
+@bp.route('/logout')
+def logout():
+    session.pop('user_id', None)
+    flash("Logged out", "info")
+    return redirect(url_for('main.login'))
+
+
+# Dashboard
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    p = g.patient
+    today = datetime.date.today()
+    live_src = stream_url('dashboard', p.id)
+    meals_today = db.session.scalars(meals_on(p.id, today)).all()
+    seasonal = seasonal_recommendations()
+    return render_template('dashboard.html', patient=p, meals=meals_today, seasonal=seasonal,
+                           totals=day_totals(p.id, today), live_src=live_src)
+
+
+# Questionnaire (prakriti + agni + ama signs)
+@bp.route('/questionnaire', methods=['GET','POST'])
+@login_required
+def questionnaire():
+    p = g.patient
+    if request.method=="POST":
+        features = {
+            "sleep": request.form.get('sleep'),
+            "skin": request.form.get('skin'),
+            "digestion": request.form.get('digestion'),
+            "appetite": request.form.get('appetite'),
+            "body_build": request.form.get('body_build'),
+            "temp_sensitivity": request.form.get('temp_sensitivity'),
+            "mood": request.form.get('mood'),
+            "agni": request.form.get('agni'),            # user-entered agni
+            "ama_signs": request.form.get('ama_signs')   # free text of ama signs
+        }
+        from prakriti import analyze_prakriti_and_agni_ama   # prakriti.py pulls in numpy
+        prakriti, agni, ama = analyze_prakriti_and_agni_ama(features)
+        db.session.execute(db.update(Patient).where(Patient.id == p.id)
+                           .values(prakriti=prakriti, agni=agni, ama=ama, **profile_bump()))
+        db.session.commit()
+        invalidate_patient(p.id)
+        flash(f"Analysis complete: Prakriti={prakriti}, Agni={agni}, Ama={ama}", "success")
+        return redirect(url_for('main.diet_plan_page'))
+    return render_template('questionnaire.html', patient=p)
+
+
+# Diet plan display (view last generated or generate from stored)
+@bp.route('/diet_plan_page')
+@login_required
+def diet_plan_page():
+    p = g.patient
+    if not p.prakriti:
+        flash("Fill the questionnaire first to get a tailored plan", "warning")
+        return redirect(url_for('main.questionnaire'))
+    bundle = plan_bundle(p)
+    etag = f"{bundle['etag']}-{datetime.datetime.utcnow().year}"
+    # pending flash messages are rendered into the page, so never answer 304 over them
+    if '_flashes' not in session and request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = make_response(render_template(
+            'diet_plan_page.html', patient=p, plan=bundle["plan"],
+            nutrition=bundle["nutrition"], evaluation=bundle["evaluation"]))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+def _fragment_view():
+    """The page a background form post came from (X-Fragment header, see live.py), or None."""
+    view = request.headers.get('X-Fragment')
+    return view if view in LIVE_VIEWS else None
+
+
+# Add a meal (log)
+@bp.route('/log_meal', methods=['POST'])
+@login_required
+def log_meal():
+    meal_name = (request.form.get('meal_name') or "").strip()
+    meal_type = request.form.get('meal_type') or "Snack"
+    view = _fragment_view()
+    if not meal_name:
+        if view:
+            return jsonify({"error": "'meal_name' is required"}), 400
+        return redirect(url_for('main.dashboard'))
+    row = {"meal": meal_name[:250], "meal_type": meal_type, "patient_id": g.patient.id,
+           "food": meal_resolver().resolve(meal_name), "date": datetime.date.today(), "eaten": False}
+    existing = recommender_existing([row])
+    row["change_seq"] = reserve(g.patient.id)
+    new = MealLog(**row)
+    db.session.add(new)
+    bump_daily_nutrition({(new.patient_id, new.date): {**meal_nutrients(new.food), "logged_count": 1}})
+    db.session.flush()
+    saved = MealRecord(new.id, new.patient_id, new.date, new.meal_type, new.meal, new.food, new.eaten)
+    db.session.commit()
+    recommender_observe([row], existing)
+    if view:
+        return jsonify(fragments(view, g.patient.id, [saved]))
+    flash(f"Saved meal: {meal_name}", "success")
+    return redirect(url_for('main.dashboard'))
+
+
+# Mark eaten toggles from meal_log page
+@bp.route('/update_meal_log', methods=['POST'])
+@login_required
+def update_meal_log():
+    # Expect form keys like eaten_<id>
+    ids = [int(key.split('_',1)[1]) for key in request.form
+           if key.startswith('eaten_') and key.split('_',1)[1].isdigit()]
+    newly_eaten, saved, eaten_foods = {}, [], []
+    if ids:
+        # one ownership-checked UPDATE; RETURNING gives the dates for the rollup
+        seq = reserve(g.patient.id)
+        saved = [MealRecord._make(r) for r in db.session.execute(mark_eaten(g.patient.id, ids, seq))]
+        for m in saved:
+            delta = newly_eaten.setdefault((g.patient.id, m.date), {"eaten_count": 0})
+            delta["eaten_count"] += 1
+            eaten_foods.append(m.food)
+    bump_daily_nutrition(newly_eaten)
+    db.session.commit()
+    recommender_observe([], [], eaten_foods)
+    view = _fragment_view()
+    if view:
+        return jsonify(fragments(view, g.patient.id, saved))
+    flash("Meal log updated", "success")
+    return redirect(url_for('main.meal_log'))
+
+
+# Show meal log
+@bp.route('/meal_log')
+@login_required
+def meal_log():
+    p = g.patient
+    # show last 7 days
+    today = datetime.date.today()
+    from_date = today - datetime.timedelta(days=7)
+    live_src = stream_url('meal_log', p.id)
+    meals = db.session.scalars(meals_since(p.id, from_date)).all()
+    return render_template('meal_log.html', patient=p, meals=meals, totals=day_totals(p.id, today),
+                           live_src=live_src)
+
+
+# Server-sent events for an open dashboard / meal log page (see live.py)
+@bp.route('/live/<view>')
+@login_required
+def live(view):
+    if view not in LIVE_VIEWS or not streams_enabled():
+        abort(404)
+    try:
+        cursor = max(int(request.headers.get('Last-Event-ID') or request.args.get('cursor') or 0), 0)
+    except ValueError:
+        cursor = 0
+    body = open_stream(view, g.patient.id, cursor)
+    if body is None:
+        return current_app.response_class("live updates are busy", status=503, mimetype="text/plain")
+    return current_app.response_class(
+        stream_with_context(body), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# Nutrition analysis page for today's meals
+@bp.route('/nutrition_analysis')
+@login_required
+def nutrition_analysis():
+    p = g.patient
+    today = datetime.date.today()
+    meals = db.session.scalars(meals_on(p.id, today)).all()
+    items = [meal_food(m) or m.meal for m in meals]
+    total, details = nutrition_summary(items)
+    return render_template('nutrition_analysis.html', patient=p, items=items, total=total, details=details)
+
+
+# ---- PDF export jobs ----
+def _parse_date(value, default):
+    try:
+        return datetime.date.fromisoformat(value) if value else default
+    except ValueError:
+        return default
+
+
+@bp.route('/export_diet')
+@login_required
+def export_diet():
+    today = datetime.date.today()
+    start = _parse_date(request.args.get('start'), today)
+    end = _parse_date(request.args.get('end'), start)
+    reports = collect_reports(start, end, [g.patient.id])
+
+    if not reports:
+        flash("No meals logged for today!" if start == end == today else "No meals logged in that period!", "warning")
+        return redirect(url_for('main.diet_plan_page'))  # fixed redirect
+
+    kind = "day" if start == end else "range"
+    job_id = export_jobs().submit(g.patient.id, kind, reports)
+    return redirect(url_for('main.export_status', job_id=job_id))
+
+
+def _owned_job(job_id):
+    status = export_jobs().status(job_id)
+    if status is None or status["owner"] != session.get('user_id'):
+        abort(404)
+    return status
+
+
+@bp.route('/exports/<job_id>')
+@login_required
+def export_status(job_id):
+    status = _owned_job(job_id)
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(status)
+    return render_template('export_status.html', job=status)
+
+
+@bp.route('/exports/<job_id>/download')
+@login_required
+def export_download(job_id):
+    status = _owned_job(job_id)
+    if status["state"] != "done":
+        return redirect(url_for('main.export_status', job_id=job_id))
+    if len(status["files"]) == 1:
+        filename = status["files"][0]
+        return send_file(export_jobs().path(job_id, filename), download_name=filename,
+                         as_attachment=True, mimetype="application/pdf")
+    return current_app.response_class(
+        stream_with_context(export_jobs().stream_zip(job_id)), mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=diet_export_{job_id}.zip"})
+
+
+# ---- Meal history export (streamed) ----
+@bp.route('/api/meals/export')
+@login_required(api=True)
+def export_meals():
+    """Full meal history as CSV or NDJSON (?format=csv|ndjson, optional start/end), streamed."""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    start = _parse_date(request.args.get('start'), None)
+    end = _parse_date(request.args.get('end'), None)
+    chunks = stream_meal_history(fmt, [g.patient.id], start, end)
+    return current_app.response_class(
+        stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=meals_{g.patient.id}.{fmt}"})
+
+
+# User profile
+@bp.route('/profile')
+@login_required
+def profile():
+    p = g.patient
+    return render_template('profile.html', patient=p)
+
+
+# Bulk meal logging for clients syncing several days at once
+MAX_BULK_MEALS = 500
+
+
+@bp.route('/api/meals/bulk', methods=['POST'])
+@login_required(api=True)
+def log_meals_bulk():
+    """
+    Body: {"meals": [{"meal": "Khichdi", "meal_type": "Lunch", "date": "YYYY-MM-DD", "eaten": false}, ...]}
+    date defaults to today, meal_type to Snack. All rows are inserted with one executemany.
+    """
+    data = request.get_json(silent=True) or {}
+    meals = data.get("meals")
+    if not isinstance(meals, list) or not meals:
+        return jsonify({"error": "'meals' must be a non-empty list"}), 400
+    if len(meals) > MAX_BULK_MEALS:
+        return jsonify({"error": f"at most {MAX_BULK_MEALS} meals per request"}), 400
+
+    try:
+        rows, deltas = meal_rows(g.patient.id, meals)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    existing = recommender_existing(rows)
+    stamp(rows, reserve(g.patient.id, len(rows)))
+    db.session.execute(db.insert(MealLog), rows)
+    bump_daily_nutrition(deltas)
+    db.session.commit()
+    recommender_observe(rows, existing)
+    return jsonify({"inserted": len(rows)}), 201
+
+
+# Delta sync (see sync.py)
+@bp.route('/api/sync', methods=['GET', 'POST'])
+@login_required(api=True)
+def sync():
+    """
+    GET ?cursor=N&limit=M: changes since cursor (0 for a full download).
+    POST {"cursor": N, "changes": [...]}: apply offline edits, then the same
+    feed since cursor, with "applied" and "conflicts" added.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+    try:
+        cursor = int(data.get("cursor") or 0)
+        limit = min(max(int(data.get("limit") or SYNC_PAGE_SIZE), 1), SYNC_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "'cursor' and 'limit' must be integers"}), 400
+    if cursor < 0:
+        return jsonify({"error": "'cursor' must not be negative"}), 400
+    changes = data.get("changes", []) if request.method == "POST" else None
+    try:
+        return jsonify(sync_changes(g.patient.id, cursor, changes, limit))
+    except CursorAhead as e:
+        return jsonify({"error": str(e), "reset": True}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Nutrition trend read from the daily rollup
+@bp.route('/api/nutrition/trend')
+@login_required(api=True)
+def nutrition_trend():
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    rows = db.session.scalars(daily_nutrition_between(g.patient.id, start, end)).all()
+    return jsonify({
+        "start": start.isoformat(), "end": end.isoformat(),
+        "days": [{"date": r.date.isoformat(), **{f: getattr(r, f) for f in ROLLUP_FIELDS}} for r in rows],
+    })
+
+
+# Meal plan with portions optimized for calorie/protein targets
+@bp.route('/api/plan/optimized')
+@login_required(api=True)
+def optimized_plan():
+    calories = request.args.get('calories', DEFAULT_TARGETS["calories"], type=float)
+    protein = request.args.get('protein', DEFAULT_TARGETS["protein"], type=float)
+    days = request.args.get('days', 1, type=int)
+    if not (500 <= calories <= 5000 and 10 <= protein <= 300 and 1 <= days <= 28):
+        return jsonify({"error": "calories must be 500-5000, protein 10-300, days 1-28"}), 400
+    plans = optimized_meal_plan(g.patient, calories, protein, days)
+    return jsonify({"targets": {"calories": calories, "protein": protein}, "days": plans})
+
+
+# ---- Recommendations ----
+@bp.route('/api/ml/suggest', methods=['POST'])
+@login_required(api=True)
+def ml_suggest():
+    """Personalized foods from the co-occurrence model. Body: {"k": 5} (optional)."""
+    data = request.get_json(silent=True) or {}
+    k = data.get("k", 5)
+    k = min(max(k, 1), 20) if isinstance(k, int) else 5
+    items, history_size = recommend_for(g.patient, k)
+    return jsonify({"recommended_items": items, "history_items": history_size})
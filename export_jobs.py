@@ -0,0 +1,272 @@
+"""
+Background PDF export jobs.
+
+PDFs are rendered in a local process pool instead of inside the request. A job
+is one or more reports (one per patient); its state lives in
+<root>/<job_id>/status.json so any web worker can answer status and download
+requests. Multi-report jobs are downloaded as a ZIP streamed from the rendered
+files.
+
+Each web process has its own pool of max_workers render processes, so keep it
+small (EXPORT_WORKERS): the machine runs web workers x max_workers of them.
+The render process writes the report, or <report>.error if rendering failed,
+and status() derives progress from those files, so a job finishes even if the
+web process that submitted it has restarted. A job still running after
+timeout seconds, or whose submitting process is gone, is reported failed.
+"""
+import io
+import json
+import os
+import socket
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+MEAL_SECTIONS = ("Breakfast", "Lunch", "Dinner")
+EXPORT_WORKERS = 2          # render processes per web process
+EXPORT_JOB_TIMEOUT = 600    # seconds before a running job is reported failed
+
+
+def _add_day(pdf, name, day):
+    """One page per day: meals grouped by type, then a nutrition table."""
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, f"{name} - Diet Plan ({day['date']})", ln=True, align="C")
+    pdf.ln(8)
+
+    pdf.set_font("Arial", "B", 14)
+
+    # Loop through meals
+    for section in MEAL_SECTIONS:
+        items = [m for m in day["meals"] if m["meal_type"] == section]
+        if items:
+            pdf.set_fill_color(200, 230, 201)  # Light green header
+            pdf.cell(0, 10, section, ln=True, fill=True)
+            pdf.ln(2)
+            pdf.set_font("Arial", "", 12)
+            for m in items:
+                safe_meal = f"- {m['meal']}"
+                safe_meal = safe_meal.replace("—", "-").replace("–", "-").replace("•", "-")
+                # back to the left margin, or the next meal has no width left
+                pdf.multi_cell(0, 7, safe_meal, new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(3)
+            pdf.set_font("Arial", "B", 14)
+
+    # Nutrition summary table
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Nutrition Summary", ln=True)
+    pdf.ln(2)
+
+    pdf.set_font("Arial", "B", 12)
+    col_widths = [70, 30, 30, 30, 30]
+    headers = ["Item", "Calories", "Protein", "Carbs", "Fat"]
+
+    # Table header
+    for i, header in enumerate(headers):
+        pdf.cell(col_widths[i], 10, header, border=1, align="C")
+    pdf.ln()
+
+    pdf.set_font("Arial", "", 12)
+    total_calories = total_protein = total_carbs = total_fat = 0
+
+    for m in day["meals"]:
+        meal_name = (m["meal"][:50] + "...") if len(m["meal"]) > 50 else m["meal"]
+
+        pdf.cell(col_widths[0], 8, meal_name, border=1)
+        pdf.cell(col_widths[1], 8, str(m["calories"]), border=1, align="C")
+        pdf.cell(col_widths[2], 8, str(m["protein"]), border=1, align="C")
+        pdf.cell(col_widths[3], 8, str(m["carbs"]), border=1, align="C")
+        pdf.cell(col_widths[4], 8, str(m["fat"]), border=1, align="C")
+        pdf.ln()
+
+        total_calories += m["calories"]
+        total_protein += m["protein"]
+        total_carbs += m["carbs"]
+        total_fat += m["fat"]
+
+    # Total row
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(col_widths[0], 8, "Total", border=1, align="C")
+    pdf.cell(col_widths[1], 8, str(total_calories), border=1, align="C")
+    pdf.cell(col_widths[2], 8, str(total_protein), border=1, align="C")
+    pdf.cell(col_widths[3], 8, str(total_carbs), border=1, align="C")
+    pdf.cell(col_widths[4], 8, str(total_fat), border=1, align="C")
+    pdf.ln()
+
+
+def render_diet_pdf(name, days):
+    """
+    Render a diet report and return the PDF bytes.
+
+    days: [{"date": iso string, "meals": [{"meal", "meal_type", "calories",
+    "protein", "carbs", "fat"}, ...]}, ...]
+    """
+    from fpdf import FPDF   # only export workers pay for the import
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    for day in days:
+        _add_day(pdf, name, day)
+    out = io.BytesIO()
+    pdf.output(out)
+    return out.getvalue()
+
+
+def _write_file(path, data):
+    with open(path + ".part", "wb") as f:
+        f.write(data)
+    os.replace(path + ".part", path)
+
+
+def _render_to_file(path, name, days):
+    """Render into path, or write the error to path.error; returns the seconds spent rendering."""
+    t0 = time.perf_counter()
+    try:
+        data = render_diet_pdf(name, days)
+    except Exception as e:
+        _write_file(path + ".error", f"{type(e).__name__}: {e}".encode())
+        raise
+    elapsed = time.perf_counter() - t0
+    _write_file(path, data)
+    return elapsed
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target that hands out what zipfile has written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ExportJobs:
+    def __init__(self, root, max_workers=EXPORT_WORKERS, timeout=EXPORT_JOB_TIMEOUT, on_render=None):
+        """on_render(seconds) is called in the submitting process after each report is rendered."""
+        self.root = root
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.on_render = on_render
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _write_status(self, job_id, status):
+        path = os.path.join(self._dir(job_id), "status.json")
+        with open(path + ".part", "w") as f:
+            json.dump(status, f)
+        os.replace(path + ".part", path)
+
+    def status(self, job_id):
+        """Job state dict, or None for an unknown id."""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self._dir(job_id), "status.json")) as f:
+                status = json.load(f)
+        except FileNotFoundError:
+            return None
+        if status["state"] == "running":
+            self._progress(job_id, status)
+        return status
+
+    def _progress(self, job_id, status):
+        """Update a running job from the files its render processes wrote; saves it once it has ended."""
+        status["done"] = 0
+        for filename in status["files"]:
+            path = self.path(job_id, filename)
+            if os.path.exists(path):
+                status["done"] += 1
+            elif os.path.exists(path + ".error"):
+                with open(path + ".error") as f:
+                    status["state"], status["error"] = "failed", f.read()
+                break
+        else:
+            if status["done"] == status["total"]:
+                status["state"] = "done"
+            elif time.time() - status["started"] > self.timeout:
+                status["state"], status["error"] = "failed", f"not finished after {self.timeout}s"
+            elif status["host"] == socket.gethostname() and not _alive(status["pid"]):
+                status["state"], status["error"] = "failed", "the process running it stopped"
+        if status["state"] != "running":
+            self._write_status(job_id, status)
+
+    def submit(self, owner, kind, reports):
+        """
+        Queue reports for rendering and return the job id.
+
+        owner: patient id allowed to download the result (None = CLI only).
+        reports: [(filename, patient name, days), ...]
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._dir(job_id))
+        status = {
+            "id": job_id, "owner": owner, "kind": kind, "state": "running",
+            "total": len(reports), "done": 0, "error": None,
+            "files": [filename for filename, _, _ in reports],
+            "started": time.time(), "host": socket.gethostname(), "pid": os.getpid(),
+        }
+        if not reports:
+            status["state"] = "done"
+        self._write_status(job_id, status)
+        for filename, name, days in reports:
+            path = self.path(job_id, filename)
+            self.pool.submit(_render_to_file, path, name, days).add_done_callback(partial(self._finished, path))
+        return job_id
+
+    def _finished(self, path, fut):
+        error = fut.exception()
+        if error is None:
+            if self.on_render:
+                self.on_render(fut.result())
+        elif not os.path.exists(path + ".error"):
+            # the render process died (BrokenProcessPool) before it could record the failure
+            _write_file(path + ".error", f"{type(error).__name__}: {error}".encode())
+
+    def path(self, job_id, filename):
+        return os.path.join(self._dir(job_id), filename)
+
+    def stream_zip(self, job_id, chunk_size=64 * 1024):
+        """Yield a ZIP of the job's files without building it in memory."""
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+            for filename in self.status(job_id)["files"]:
+                with open(self.path(job_id, filename), "rb") as src, zf.open(filename, "w") as dst:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield sink.drain()
+        yield sink.drain()
@@ -0,0 +1,157 @@
+"""
+Compiled food-suitability rules.
+
+evaluate_food() used to rescan every allergen and keyword list with
+`any(x in name ...)` for every item on every render. Here the keyword lists
+are compiled once into a single multi-pattern matcher that turns a food name
+into a bitmask of the keywords it contains, each patient profile is compiled
+into a short chain of (mask, verdict) checks, and verdicts are memoized per
+(profile, food) with LRU eviction. Results are identical to the original
+per-item rules.
+
+The rule tables come from the rule pack (see rule_pack.py). Each FoodRules
+instance owns its matcher and caches, so a reloaded pack is a new instance
+and never sees verdicts memoized under the old rules.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+VERDICT_CACHE_SIZE = 65536
+
+# Profile key for memoization. allergies is a tuple of the patient's allergy strings.
+FoodProfile = namedtuple("FoodProfile", ["prakriti", "agni", "ama", "allergies"])
+
+
+def make_profile(prakriti, agni, ama, allergy_list=None):
+    return FoodProfile(prakriti, agni, ama, tuple(allergy_list or ()))
+
+
+class KeywordMatcher:
+    """
+    Finds every pattern contained in a text with one regex scan.
+
+    Patterns are tried longest-first at each position, so the captured match
+    is the longest pattern starting there; every other pattern that matches at
+    the same position is a prefix of it, which `implied` accounts for.
+    """
+
+    def __init__(self, patterns):
+        self.bits = {}
+        for p in patterns:
+            if p and p not in self.bits:
+                self.bits[p] = 1 << len(self.bits)
+        self.implied = {
+            p: sum(b for q, b in self.bits.items() if p.startswith(q))
+            for p in self.bits
+        }
+        if self.bits:
+            alternation = "|".join(re.escape(p) for p in sorted(self.bits, key=len, reverse=True))
+            self.regex = re.compile("(?=(%s))" % alternation)
+        else:
+            self.regex = None
+
+    def mask_of(self, words):
+        return sum(self.bits[w] for w in set(words) if w in self.bits)
+
+    def scan(self, text):
+        if self.regex is None:
+            return 0
+        mask = 0
+        for m in self.regex.finditer(text):
+            mask |= self.implied[m.group(1)]
+        return mask
+
+
+@lru_cache(maxsize=1024)
+def _compile_allergies(allergies):
+    """Return (matcher, [(bit, display name)]) keeping the first spelling of each allergen."""
+    order = []
+    seen = set()
+    for a in allergies:
+        key = a.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            order.append((key, a.strip()))
+    matcher = KeywordMatcher([k for k, _ in order])
+    return matcher, [(matcher.bits[k], shown) for k, shown in order]
+
+
+class FoodRules:
+    """
+    Suitability rules compiled from the rule tables (order matters: first
+    matching rule wins).
+
+    prakriti_rules: [(prakriti keyword, good keywords, good message, bad keywords, bad message)]
+    digestion_rules: [(field, value, good keywords, good message, fallback message)];
+        these are terminal: a food either matches or is rejected
+    default_verdict: (ok, message) when nothing matches
+    """
+
+    def __init__(self, prakriti_rules, digestion_rules, default_verdict):
+        self.prakriti_rules = tuple(prakriti_rules)
+        self.digestion_rules = tuple(digestion_rules)
+        self.default_verdict = tuple(default_verdict)
+        keywords = []
+        for _, good, _, bad, _ in self.prakriti_rules:
+            keywords += good
+            keywords += bad
+        for _, _, good, _, _ in self.digestion_rules:
+            keywords += good
+        self._keywords = KeywordMatcher(keywords)
+        self._always = 1 << len(self._keywords.bits)   # bit set on every food, used for fallbacks
+        self._food_mask = lru_cache(maxsize=VERDICT_CACHE_SIZE)(self._food_mask)
+        self._compile_rules = lru_cache(maxsize=1024)(self._compile_rules)
+        self._verdict = lru_cache(maxsize=VERDICT_CACHE_SIZE)(self._verdict)
+
+    def _food_mask(self, name):
+        return self._keywords.scan(name.lower()) | self._always
+
+    def _compile_rules(self, prakriti, agni, ama):
+        """Reduce the rule tables to a list of (mask, verdict) checks for one profile."""
+        checks = []
+        p = (prakriti or "").lower()
+        if prakriti:
+            for dosha, good, good_msg, bad, bad_msg in self.prakriti_rules:
+                if dosha in p:
+                    checks.append((self._keywords.mask_of(good), (True, good_msg)))
+                    checks.append((self._keywords.mask_of(bad), (False, bad_msg)))
+        values = {"agni": agni, "ama": ama}
+        for field, value, good, good_msg, fallback_msg in self.digestion_rules:
+            if values[field] == value:
+                checks.append((self._keywords.mask_of(good), (True, good_msg)))
+                checks.append((self._always, (False, fallback_msg)))
+                break
+        checks.append((self._always, self.default_verdict))
+        return tuple(checks)
+
+    def _verdict(self, food_name, profile):
+        if profile.allergies:
+            matcher, allergens = _compile_allergies(profile.allergies)
+            hit = matcher.scan(food_name.lower())
+            if hit:
+                for bit, shown in allergens:
+                    if hit & bit:
+                        return False, f"Contains allergen '{shown}'. Avoid."
+        mask = self._food_mask(food_name)
+        for check, verdict in self._compile_rules(profile.prakriti, profile.agni, profile.ama):
+            if mask & check:
+                return verdict
+        return self.default_verdict
+
+    def evaluate(self, food_name, profile):
+        """Return (ok_boolean, message) for one food and a FoodProfile."""
+        return self._verdict(food_name, profile)
+
+    def evaluate_foods(self, items, profile):
+        """Evaluate many foods for one profile. Returns {item: (ok, message)} in input order."""
+        return {item: self._verdict(item, profile) for item in items}
+
+    def cache_info(self):
+        return self._verdict.cache_info()
+
+    def clear_cache(self):
+        """Drop memoized verdicts."""
+        self._verdict.cache_clear()
+        self._food_mask.cache_clear()
+        self._compile_rules.cache_clear()
@@ -0,0 +1,417 @@
+"""
+Memory-mapped food-composition catalogue.
+
+Large food tables (tens of thousands of foods, dozens of nutrients) are
+imported once into a compact binary file and opened read-only with mmap, so
+every worker process shares the same page-cache pages and opening it costs
+the same whatever its size. Nothing is decoded up front: lookups hash the
+name into a sorted key array, nutrient values are float32 columns gathered
+per request, and the meal-name resolver's trigram index is stored
+precomputed in CSR form.
+
+File layout (little-endian, every section 8-byte aligned):
+
+    b"FOODCAT1" | uint64 header length | JSON header | sections
+
+The header lists the nutrients, the food count, the sources and the byte
+offset, dtype and length of each section:
+
+    name_offsets  uint64[count + 1]   into `names`
+    names         uint8[]             UTF-8 names, concatenated, in row order
+    name_keys     uint64[count]       sorted name hashes (blake2b-64) ...
+    name_rows     uint32[count]       ... and their rows
+    norm_keys     uint64[]            sorted hashes of normalized names ...
+    norm_rows     uint32[]            ... and the first row with each
+    gram_offsets  uint32[37**3 + 1]   trigram code -> slice of gram_rows
+    gram_rows     uint32[]            rows containing each trigram
+    gram_counts   uint16[count]       distinct trigrams per name
+    values        float32[nutrients * count]  one column per nutrient; NaN = missing
+
+Build with write_store() (or `flask import-foods`), open with FoodStore.
+"""
+import csv
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+
+import numpy as np
+
+from meal_resolver import normalize, same_dish, trigrams
+from nutrients import NUTRIENTS, NutrientTable
+
+MAGIC = b"FOODCAT1"
+FORMAT = 1
+GRAM_ALPHABET = " abcdefghijklmnopqrstuvwxyz0123456789"    # what normalize() leaves
+GRAM_CODES = len(GRAM_ALPHABET) ** 3
+LOOKUP_CACHE_SIZE = 65536
+SPILL_ROWS = 4096
+
+_GRAM_CHAR = {c: i for i, c in enumerate(GRAM_ALPHABET)}
+
+# header spellings of the four nutrients the app needs, after column_key()
+NUTRIENT_ALIASES = {
+    "calories": "calories", "energy": "calories", "energy_kcal": "calories", "kcal": "calories",
+    "protein": "protein", "proteins": "protein", "protein_g": "protein",
+    "carbs": "carbs", "carbohydrate": "carbs", "carbohydrates": "carbs", "carbohydrate_g": "carbs",
+    "fat": "fat", "total_fat": "fat", "fat_total": "fat", "fat_g": "fat", "total_lipid_fat": "fat",
+}
+
+
+class FoodStoreError(ValueError):
+    pass
+
+
+def name_key(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def gram_code(gram):
+    a, b, c = (_GRAM_CHAR[ch] for ch in gram)
+    return (a * len(GRAM_ALPHABET) + b) * len(GRAM_ALPHABET) + c
+
+
+def column_key(header):
+    """"Energy (kcal)" -> "energy_kcal"."""
+    return re.sub(r"[^a-z0-9]+", "_", header.lower()).strip("_")
+
+
+# ---- Reading ----
+class FoodStore(Mapping):
+    """
+    Read-only view of a catalogue file, usable wherever a nutrition_db dict
+    is: store[name] / store.get(name) give {nutrient: value} (missing values
+    left out, integral values as int), `name in store`, iteration in row order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise FoodStoreError(f"{path}: not a food catalogue file")
+        header_len = int.from_bytes(self._mm[8:16], "little")
+        self.header = json.loads(self._mm[16:16 + header_len])
+        if self.header.get("format") != FORMAT:
+            raise FoodStoreError(f"{path}: unsupported catalogue format {self.header.get('format')!r}")
+        self.count = self.header["count"]
+        self.nutrients = tuple(self.header["nutrients"])
+        buf = memoryview(self._mm)
+        sections = {}
+        for name, (offset, dtype, length) in self.header["sections"].items():
+            sections[name] = np.frombuffer(buf, dtype=np.dtype(dtype), count=length, offset=offset)
+        self._name_offsets = sections["name_offsets"]
+        self._names = sections["names"]
+        self._name_keys, self._name_rows = sections["name_keys"], sections["name_rows"]
+        self._norm_keys, self._norm_rows = sections["norm_keys"], sections["norm_rows"]
+        self._gram_offsets, self._gram_rows = sections["gram_offsets"], sections["gram_rows"]
+        self._gram_counts = sections["gram_counts"]
+        self._values = sections["values"].reshape(len(self.nutrients), self.count)
+        self._column = {n: i for i, n in enumerate(self.nutrients)}
+        self.row = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._row)
+        self.info = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._info)     # shared dicts: don't mutate
+
+    def name(self, row):
+        lo, hi = self._name_offsets[row], self._name_offsets[row + 1]
+        return self._names[lo:hi].tobytes().decode("utf-8")
+
+    @staticmethod
+    def _find(keys, rows, key):
+        lo = int(np.searchsorted(keys, key, side="left"))
+        hi = int(np.searchsorted(keys, key, side="right"))
+        return rows[lo:hi]
+
+    def _row(self, name):
+        """Row of a food name, or -1."""
+        if not isinstance(name, str):
+            return -1
+        for row in self._find(self._name_keys, self._name_rows, np.uint64(name_key(name))):
+            if self.name(row) == name:
+                return int(row)
+        return -1
+
+    def rows(self, items):
+        row = self.row
+        return np.fromiter((row(i) for i in items), dtype=np.intp)
+
+    def column(self, nutrient):
+        """float32 values of one nutrient for every food (a view into the file)."""
+        return self._values[self._column[nutrient]]
+
+    def values(self, rows, nutrients):
+        """(len(rows), len(nutrients)) float64 gather; missing values are 0."""
+        out = np.empty((len(rows), len(nutrients)), dtype=np.float64)
+        for j, n in enumerate(nutrients):
+            out[:, j] = self.column(n)[rows]
+        out[np.isnan(out)] = 0.0
+        return out
+
+    def _info(self, row):
+        out = {}
+        for n, v in zip(self.nutrients, self._values[:, row].tolist()):
+            if v == v:
+                out[n] = int(v) if v.is_integer() else float(f"{v:.6g}")
+        return out
+
+    # Mapping protocol
+    def __getitem__(self, name):
+        row = self.row(name)
+        if row < 0:
+            raise KeyError(name)
+        return self.info(row)
+
+    def __contains__(self, name):
+        return self.row(name) >= 0
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.name(row)
+
+    def __len__(self):
+        return self.count
+
+    def nutrient_table(self, nutrients=NUTRIENTS):
+        return StoreNutrientTable(self, nutrients)
+
+    def resolver(self, min_score=0.5, cache_size=4096):
+        return StoreResolver(self, min_score, cache_size)
+
+
+class StoreNutrientTable(NutrientTable):
+    """nutrients.NutrientTable over a FoodStore: gathers rows from the mapped columns."""
+
+    def __init__(self, store, nutrients=NUTRIENTS):
+        missing = [n for n in nutrients if n not in store.nutrients]
+        if missing:
+            raise FoodStoreError(f"{store.path}: no {', '.join(missing)} column")
+        self.store = store
+        self.nutrients = tuple(nutrients)
+
+    @property
+    def names(self):
+        return list(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, name):
+        return name in self.store
+
+    def row(self, name):
+        return self.store.row(name)
+
+    def rows(self, items):
+        return self.store.rows(items)
+
+    def info(self, name):
+        return self.store.get(name)
+
+    def values(self, rows):
+        return self.store.values(rows, self.nutrients)
+
+    def ints(self, rows):
+        values = self.values(rows)
+        return (values == np.round(values)).all(axis=0)
+
+
+class StoreResolver:
+    """meal_resolver.MealResolver over the store's precomputed exact and trigram indexes."""
+
+    def __init__(self, store, min_score=0.5, cache_size=4096):
+        self.store = store
+        self.min_score = min_score
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, text):
+        """Return the best matching catalogue name for text, or None."""
+        s = self.store
+        norm = normalize(text)
+        if not norm:
+            return None
+        for row in s._find(s._norm_keys, s._norm_rows, np.uint64(name_key(norm))):
+            name = s.name(row)
+            if normalize(name) == norm:
+                return name
+        query = trigrams(norm)
+        postings = [s._gram_rows[s._gram_offsets[c]:s._gram_offsets[c + 1]]
+                    for c in map(gram_code, query)]
+        if not any(len(p) for p in postings):
+            return None
+        rows, shared = np.unique(np.concatenate(postings), return_counts=True)
+        scores = 2.0 * shared / (len(query) + s._gram_counts[rows].astype(np.float64))
+        ok = scores > self.min_score
+        rows, scores = rows[ok], scores[ok]
+        for row in rows[np.argsort(-scores, kind="stable")]:    # ties: lowest row, like MealResolver
+            name = s.name(row)
+            if same_dish(norm, normalize(name)):
+                return name
+        return None
+
+
+# ---- Writing ----
+def read_csv_foods(paths, name_column="name", column_map=None):
+    """
+    Stream foods from composition-table CSVs.
+
+    Every column except the name column is a nutrient; headers go through
+    column_key() and then column_map / NUTRIENT_ALIASES ({"energy_kcal":
+    "calories"}, ...). Returns (nutrients, rows) where rows yields
+    (name, [value or nan per nutrient]); blank or non-numeric cells are nan.
+    """
+    column_map = {column_key(k): v for k, v in (column_map or {}).items()}
+    name_key_ = column_key(name_column)
+    layouts, nutrients = [], []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            header = next(csv.reader(f), None)
+        if not header:
+            raise FoodStoreError(f"{path}: empty file")
+        keys = [column_key(h) for h in header]
+        if name_key_ not in keys:
+            raise FoodStoreError(f"{path}: no {name_column!r} column")
+        mapped = [None if k == name_key_ else column_map.get(k, NUTRIENT_ALIASES.get(k, k)) for k in keys]
+        for n in mapped:
+            if n and n not in nutrients:
+                nutrients.append(n)
+        layouts.append((path, keys.index(name_key_), mapped))
+    index = {n: i for i, n in enumerate(nutrients)}
+
+    def rows():
+        for path, name_at, mapped in layouts:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                next(reader)
+                for record in reader:
+                    if len(record) <= name_at or not record[name_at].strip():
+                        continue
+                    values = [float("nan")] * len(nutrients)
+                    for cell, n in zip(record, mapped):
+                        if n:
+                            try:
+                                values[index[n]] = float(cell)
+                            except ValueError:
+                                pass
+                    yield record[name_at].strip(), values
+    return nutrients, rows()
+
+
+def _section_writer(out, sections):
+    def write(name, arr):
+        pad = -out.tell() % 8
+        out.write(b"\0" * pad)
+        sections[name] = [out.tell(), arr.dtype.str, int(arr.size)]
+        arr.tofile(out)
+    return write
+
+
+def write_store(path, nutrients, foods, sources=(), required=NUTRIENTS):
+    """
+    Write a catalogue file from foods: iterable of (name, values aligned with
+    nutrients; nan = missing). A later duplicate name replaces the earlier
+    row's values. Values are spilled to a temporary file while reading, so
+    memory holds names and indexes but not the nutrient matrix. Columns
+    with no values at all are dropped, except the `required` ones. The file is replaced atomically.
+    Returns the number of foods written.
+    """
+    nutrients = list(nutrients)
+    k = len(nutrients)
+    names, row_of = [], {}
+    present = np.zeros(k, dtype=bool)
+    with tempfile.TemporaryFile() as spill:
+        pending = []
+        overrides = {}
+
+        def flush():
+            if pending:
+                block = np.asarray(pending, dtype=np.float32).reshape(-1, k)
+                block.tofile(spill)
+                pending.clear()
+
+        for name, values in foods:
+            if len(values) != k:
+                raise FoodStoreError(f"{name!r}: expected {k} values, got {len(values)}")
+            vec = np.asarray(values, dtype=np.float32)
+            present |= ~np.isnan(vec)
+            row = row_of.get(name)
+            if row is None:
+                row_of[name] = len(names)
+                names.append(name)
+                pending.append(vec)
+                if len(pending) >= SPILL_ROWS:
+                    flush()
+            else:
+                overrides[row] = vec
+        flush()
+        count = len(names)
+        spill.flush()
+        matrix = (np.memmap(spill, dtype=np.float32, mode="r+", shape=(count, k))
+                  if count and k else np.zeros((count, k), dtype=np.float32))
+        for row, vec in overrides.items():
+            matrix[row] = vec
+        keep = [j for j in range(k) if present[j] or nutrients[j] in required]
+
+        encoded = [n.encode("utf-8") for n in names]
+        name_offsets = np.zeros(count + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in encoded], out=name_offsets[1:])
+        keys = np.fromiter((name_key(n) for n in names), dtype=np.uint64, count=count)
+        order = np.argsort(keys, kind="stable")
+
+        norm_first = {}
+        gram_codes, gram_rows = array("I"), array("I")
+        gram_counts = np.zeros(count, dtype=np.uint16)
+        for row, name in enumerate(names):
+            norm = normalize(name)
+            norm_first.setdefault(norm, row)
+            grams = trigrams(norm)
+            gram_counts[row] = len(grams)
+            for g in grams:
+                gram_codes.append(gram_code(g))
+                gram_rows.append(row)
+        norm_keys = np.fromiter((name_key(n) for n in norm_first), dtype=np.uint64, count=len(norm_first))
+        norm_rows = np.fromiter(norm_first.values(), dtype=np.uint32, count=len(norm_first))
+        norm_order = np.argsort(norm_keys, kind="stable")
+        codes = np.frombuffer(gram_codes, dtype=np.uint32)
+        grows = np.frombuffer(gram_rows, dtype=np.uint32)
+        by_code = np.argsort(codes, kind="stable")
+        gram_offsets = np.zeros(GRAM_CODES + 1, dtype=np.uint32)
+        np.cumsum(np.bincount(codes, minlength=GRAM_CODES), out=gram_offsets[1:])
+
+        tmp = f"{path}.tmp"
+        sections = {}
+        with open(tmp, "wb") as out:
+            out.write(b"\0" * 16)
+            # the header is written last, once the offsets are known; reserve room for it
+            header_room = 4096 + 64 * len(nutrients) + sum(len(str(s)) + 8 for s in sources)
+            out.write(b" " * header_room)
+            write = _section_writer(out, sections)
+            write("name_offsets", name_offsets)
+            write("names", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            write("name_keys", keys[order])
+            write("name_rows", order.astype(np.uint32))
+            write("norm_keys", norm_keys[norm_order])
+            write("norm_rows", norm_rows[norm_order])
+            write("gram_offsets", gram_offsets)
+            write("gram_rows", grows[by_code])
+            write("gram_counts", gram_counts)
+            out.write(b"\0" * (-out.tell() % 8))
+            sections["values"] = [out.tell(), np.dtype(np.float32).str, count * len(keep)]
+            for j in keep:
+                np.ascontiguousarray(matrix[:, j]).tofile(out)
+            header = json.dumps({
+                "format": FORMAT, "count": count, "nutrients": [nutrients[j] for j in keep],
+                "sources": [str(s) for s in sources], "sections": sections,
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            }).encode()
+            if len(header) > header_room:
+                raise FoodStoreError("catalogue header overflow")
+            out.seek(0)
+            out.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        del matrix
+    os.replace(tmp, path)
+    return count
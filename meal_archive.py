@@ -0,0 +1,184 @@
+"""
+Cold storage for old MealLog rows: one compressed segment file per month.
+
+A segment holds every archived row dated in its month, grouped into one
+zlib-compressed block per patient, so a patient's history is read by
+decompressing one small block per month and a roster export by walking the
+blocks in order. Rows are never updated in place: archiving more rows into a
+month rewrites its segment (merge()), atomically.
+
+Segment layout:
+
+    b"MEALSEG1" | blocks | JSON index | uint64 index offset | b"MEALSEG1"
+
+The index lists, per patient in id order, the block's offset, length, row
+count and first/last date. A block is compressed JSON with one list per
+field (dates as ordinals), rows sorted by (date, id).
+"""
+import datetime
+import heapq
+import json
+import os
+import re
+import zlib
+from collections import namedtuple
+from itertools import groupby
+
+MAGIC = b"MEALSEG1"
+FORMAT = 1
+FIELDS = ("id", "patient_id", "date", "meal_type", "meal", "food", "eaten")
+COMPRESSION_LEVEL = 6
+
+MealRecord = namedtuple("MealRecord", FIELDS)
+
+_SEGMENT = re.compile(r"^(\d{4})-(\d{2})\.seg$")
+
+
+def record_key(r):
+    return r.patient_id, r.date, r.id
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+class MealArchive:
+    """The segment files under root (created on first write)."""
+
+    def __init__(self, root):
+        self.root = root
+        self._indexes = {}
+
+    def path(self, month):
+        return os.path.join(self.root, f"{month:%Y-%m}.seg")
+
+    def months(self):
+        """First days of the archived months, oldest first."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        found = (_SEGMENT.match(n) for n in names)
+        return sorted(datetime.date(int(m[1]), int(m[2]), 1) for m in found if m)
+
+    def index(self, month):
+        """The segment's index ({"rows", "blocks": [[pid, offset, length, count, first, last]], ...}), or None."""
+        path = self.path(month)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._indexes.get(month)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, "rb") as f:
+            f.seek(-16, os.SEEK_END)
+            tail = f.read(16)
+            if tail[8:] != MAGIC:
+                raise ValueError(f"{path}: not a meal archive segment")
+            offset = int.from_bytes(tail[:8], "little")
+            f.seek(offset)
+            index = json.loads(f.read(st.st_size - 16 - offset))
+        index["by_patient"] = {b[0]: b for b in index["blocks"]}
+        self._indexes[month] = (signature, index)
+        return index
+
+    def read(self, month, patient_ids=None, start=None, end=None):
+        """Archived rows of one month, sorted by (patient_id, date, id)."""
+        index = self.index(month)
+        if index is None:
+            return
+        if patient_ids is None:
+            blocks = index["blocks"]
+        else:
+            blocks = [index["by_patient"][pid] for pid in sorted(set(patient_ids)) if pid in index["by_patient"]]
+        lo = start.toordinal() if start else None
+        hi = end.toordinal() if end else None
+        with open(self.path(month), "rb") as f:
+            for pid, offset, length, _count, first, last in blocks:
+                if (lo is not None and last < lo) or (hi is not None and first > hi):
+                    continue
+                f.seek(offset)
+                cols = json.loads(zlib.decompress(f.read(length)))
+                for i, day in enumerate(cols["date"]):
+                    if (lo is None or day >= lo) and (hi is None or day <= hi):
+                        yield MealRecord(cols["id"][i], pid, datetime.date.fromordinal(day), cols["meal_type"][i],
+                                         cols["meal"][i], cols["food"][i], bool(cols["eaten"][i]))
+
+    def records(self, patient_ids=None, start=None, end=None):
+        """Archived rows of every month overlapping [start, end], sorted by (patient_id, date, id)."""
+        months = [m for m in self.months()
+                  if (start is None or next_month(m) > start) and (end is None or m <= end)]
+        streams = [self.read(m, patient_ids, start, end) for m in months]
+        return heapq.merge(*streams, key=record_key)
+
+    def write(self, month, records):
+        """
+        Replace the month's segment with records (MealRecords sorted by
+        (patient_id, date, id), all dated in month). Written to a temporary
+        file and renamed into place. Returns the number of rows written.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(month)
+        tmp = f"{path}.tmp"
+        blocks, total = [], 0
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            for pid, rows in groupby(records, key=lambda r: r.patient_id):
+                rows = list(rows)
+                for r in rows:
+                    if month_of(r.date) != month:
+                        raise ValueError(f"meal {r.id} dated {r.date} does not belong in {month:%Y-%m}")
+                cols = {
+                    "id": [r.id for r in rows], "date": [r.date.toordinal() for r in rows],
+                    "meal_type": [r.meal_type for r in rows], "meal": [r.meal for r in rows],
+                    "food": [r.food for r in rows], "eaten": [int(bool(r.eaten)) for r in rows],
+                }
+                data = zlib.compress(json.dumps(cols, separators=(",", ":")).encode(), COMPRESSION_LEVEL)
+                blocks.append([pid, f.tell(), len(data), len(rows), cols["date"][0], cols["date"][-1]])
+                f.write(data)
+                total += len(rows)
+            offset = f.tell()
+            f.write(json.dumps({"format": FORMAT, "month": f"{month:%Y-%m}", "fields": FIELDS,
+                                "rows": total, "blocks": blocks}).encode())
+            f.write(offset.to_bytes(8, "little") + MAGIC)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return total
+
+    def merge(self, month, records):
+        """
+        Add records (sorted by (patient_id, date, id)) to the month's segment.
+        A record with the id of an archived one replaces it. Returns the
+        segment's new row count.
+        """
+        old = ((r, 0) for r in self.read(month))
+        new = ((r, 1) for r in records)
+
+        def merged():
+            for _, group in groupby(heapq.merge(old, new, key=lambda t: t[0].patient_id),
+                                    key=lambda t: t[0].patient_id):
+                rows = {}
+                for r, _ in sorted(group, key=lambda t: t[1]):
+                    rows[r.id] = r
+                yield from sorted(rows.values(), key=record_key)
+        return self.write(month, merged())
+
+    def drop(self, month, ids):
+        """Remove the records with these ids from the month's segment. Returns the segment's new row count."""
+        ids = set(ids)
+        return self.write(month, (r for r in self.read(month) if r.id not in ids))
+
+    def stats(self):
+        """[(month, rows, patients, bytes)] per segment."""
+        out = []
+        for month in self.months():
+            index = self.index(month)
+            out.append((month, index["rows"], len(index["blocks"]), os.path.getsize(self.path(month))))
+        return out
@@ -0,0 +1,161 @@
+"""
+Macro-target meal plan optimizer.
+
+For one patient profile the candidate pool of each meal slot (suitable foods
+that have nutrient data) is expanded once into an option table: every
+combination of `items_per_meal` foods with every portion size, with its
+calories/protein/carbs/fat as arrays. A day is then planned with a bounded
+search over the slots: the first two slots are combined by broadcasting,
+pruned to states under the targets and deduplicated onto a (calories,
+protein) grid, and each surviving state is completed with the closest options
+of the last slot found by binary search on calories.
+
+Week plans run the same search per day, excluding foods used in the previous
+`cooldown` days whenever the pools are large enough.
+"""
+from itertools import combinations, product
+
+import numpy as np
+
+PORTIONS = (0.5, 1.0, 1.5, 2.0)
+MACROS = ("calories", "protein", "carbs", "fat")
+CAL_BUCKET = 25.0      # kcal
+PROTEIN_BUCKET = 2.0   # g
+WINDOW = 16            # last-slot options examined either side of the calorie residual
+MAX_RANKED = 64        # best completions checked for a food repeated across slots
+
+
+def _grid_first(macros):
+    """Mask of the first row landing in each (calories, protein) grid cell."""
+    cal = (macros[:, 0] // CAL_BUCKET).astype(np.int64)
+    prot = (macros[:, 1] // PROTEIN_BUCKET).astype(np.int64)
+    cells = cal * (int(prot.max(initial=0)) + 1) + prot
+    # scatter in reverse so the earliest row wins each cell, without sorting
+    owner = np.full(int(cells.max(initial=0)) + 1, -1, dtype=np.int64)
+    owner[cells[::-1]] = np.arange(len(cells) - 1, -1, -1)
+    mask = np.zeros(len(cells), dtype=bool)
+    mask[owner[owner >= 0]] = True
+    return mask
+
+
+class SlotOptions:
+    """Every (foods, portions) choice for one meal slot, as parallel arrays."""
+
+    def __init__(self, pool, foods, items_per_meal, portions):
+        self.pool = list(pool)
+        k = min(items_per_meal, len(self.pool))
+        combos, amounts = [], []
+        for idx in combinations(range(len(self.pool)), k) if k else ():
+            for por in product(portions, repeat=k):
+                combos.append(idx)
+                amounts.append(por)
+        self.items = np.array(combos, dtype=np.intp).reshape(len(combos), k)
+        self.portions = np.array(amounts, dtype=np.float64).reshape(len(combos), k)
+        per_food = np.array([[foods[f].get(m, 0) for m in MACROS] for f in self.pool],
+                            dtype=np.float64).reshape(len(self.pool), len(MACROS))
+        # macros[o] = sum over the option's foods of portion * nutrients
+        self.macros = (per_food[self.items] * self.portions[:, :, None]).sum(axis=1) \
+            if len(combos) else np.zeros((0, len(MACROS)))
+
+    def __len__(self):
+        return len(self.items)
+
+    def usable(self, banned):
+        """Mask of options that use none of the banned foods."""
+        if not banned:
+            return np.ones(len(self), dtype=bool)
+        bad = np.array([f in banned for f in self.pool], dtype=bool)
+        return ~bad[self.items].any(axis=1)
+
+    def describe(self, o):
+        return [{"item": self.pool[i], "portion": float(p)}
+                for i, p in zip(self.items[o], self.portions[o])]
+
+
+class MealOptimizer:
+    def __init__(self, slot_pools, foods, items_per_meal=2, portions=PORTIONS):
+        """slot_pools: {"Breakfast": [food names], ...} already filtered for the profile."""
+        self.slots = {
+            slot: SlotOptions([f for f in pool if f in foods], foods, items_per_meal, portions)
+            for slot, pool in slot_pools.items()
+        }
+
+    def plan_day(self, calories, protein, banned=()):
+        """Best plan for one day. Returns {"plan", "totals", "error"} or None if a slot is empty."""
+        names = list(self.slots)
+        tables = []
+        for slot in names:
+            opts = self.slots[slot]
+            if not len(opts):
+                return None
+            mask = opts.usable(banned)
+            if not mask.any():
+                mask = np.ones(len(opts), dtype=bool)   # pool too small to honour the exclusions
+            tables.append((np.flatnonzero(mask), opts.macros[mask]))
+
+        # states: (option index per slot so far, summed macros)
+        choice = tables[0][0][:, None]
+        totals = tables[0][1]
+        for ids, macros in tables[1:-1]:
+            choice, totals = self._extend(choice, totals, ids, macros, calories, protein)
+
+        last_ids, last_macros = tables[-1]
+        order = np.argsort(last_macros[:, 0], kind="stable")
+        last_ids, last_macros = last_ids[order], last_macros[order]
+        residual = calories - totals[:, 0]
+        centre = np.searchsorted(last_macros[:, 0], residual)
+        window = np.clip(centre[:, None] + np.arange(-WINDOW, WINDOW + 1), 0, len(last_ids) - 1)
+        cal = totals[:, 0, None] + last_macros[window, 0]
+        prot = totals[:, 1, None] + last_macros[window, 1]
+        err = np.abs(cal - calories) / calories + np.abs(prot - protein) / protein
+        # best candidate that doesn't serve the same food in two slots, else the best one
+        flat = err.ravel()
+        ranked = np.argpartition(flat, min(MAX_RANKED, flat.size) - 1)[:MAX_RANKED]
+        ranked = ranked[np.argsort(flat[ranked], kind="stable")]
+        for r in ranked:
+            s, w = np.unravel_index(r, err.shape)
+            picks = list(choice[s]) + [last_ids[window[s, w]]]
+            foods = [self.slots[slot].pool[i] for slot, o in zip(names, picks) for i in self.slots[slot].items[o]]
+            if len(set(foods)) == len(foods):
+                break
+        else:
+            s, w = np.unravel_index(ranked[0], err.shape)
+            picks = list(choice[s]) + [last_ids[window[s, w]]]
+
+        plan, day_totals = {}, np.zeros(len(MACROS))
+        for slot, o in zip(names, picks):
+            opts = self.slots[slot]
+            plan[slot] = opts.describe(o)
+            day_totals += opts.macros[o]
+        return {
+            "plan": plan,
+            "totals": {m: round(float(v), 1) for m, v in zip(MACROS, day_totals)},
+            "error": round(float(err[s, w]), 4),
+        }
+
+    @staticmethod
+    def _extend(choice, totals, ids, macros, calories, protein):
+        """Add one slot by broadcasting, prune overshoots and keep one state per grid cell."""
+        keep = np.flatnonzero(_grid_first(macros))
+        ids, macros = ids[keep], macros[keep]
+        combined = totals[:, None, :] + macros[None, :, :]
+        keep = (combined[:, :, 0] <= calories * 1.05) & (combined[:, :, 1] <= protein * 1.2)
+        if not keep.any():
+            keep[:] = True
+        s, o = np.nonzero(keep)
+        combined = combined[s, o]
+        first = np.flatnonzero(_grid_first(combined))
+        return np.hstack([choice[s[first]], ids[o[first], None]]), combined[first]
+
+    def plan_days(self, calories, protein, days=7, cooldown=2):
+        """Plans for consecutive days; foods used in the last `cooldown` days are avoided."""
+        out, recent = [], []
+        for _ in range(days):
+            banned = set().union(*recent) if recent else set()
+            day = self.plan_day(calories, protein, banned)
+            if day is None:
+                return []
+            out.append(day)
+            recent.append({it["item"] for items in day["plan"].values() for it in items})
+            recent = recent[-cooldown:] if cooldown else []
+        return out
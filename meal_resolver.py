@@ -0,0 +1,87 @@
+"""
+Free-text meal name -> food catalogue entry.
+
+MealLog.meal is whatever the patient typed, so "khichdi" or "Moong Dal Khichdi "
+never matched nutrition_db exactly. The resolver normalizes text, tries an
+exact normalized lookup, then falls back to a trigram index scored with the
+Dice coefficient. A fuzzy match only counts when it names the same dish
+(same_dish): sharing "vegetable" or "chicken" is not enough, so "Vegetable
+soup" does not become "Vegetable curry"; uncertain names resolve to None.
+Resolved strings are kept in an LRU cache.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+TOKEN_MIN_SCORE = 0.6       # word-level Dice for typos: "khichadi" ~ "khichdi", not "curd" ~ "curry"
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+def trigrams(norm):
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _same_word(a, b):
+    if a == b:
+        return True
+    ga, gb = trigrams(a), trigrams(b)
+    return 2.0 * len(ga & gb) / (len(ga) + len(gb)) >= TOKEN_MIN_SCORE
+
+
+def same_dish(norm, name_norm):
+    """
+    Whether the normalized query plausibly names the normalized catalogue
+    name: the head nouns (last words) match and every word of the name
+    appears in the query, allowing typos. "masala dosa" -> "dosa" passes;
+    "chicken soup" -> "chicken curry" and "rice" -> "curd rice" do not.
+    """
+    words, name_words = norm.split(), name_norm.split()
+    if not words or not name_words or not _same_word(words[-1], name_words[-1]):
+        return False
+    return all(any(_same_word(w, n) for w in words) for n in name_words)
+
+
+class MealResolver:
+    def __init__(self, names, min_score=0.5, cache_size=4096):
+        self.min_score = min_score
+        self.names = list(names)
+        self.exact = {}
+        self.grams = []
+        self.index = defaultdict(list)
+        for i, name in enumerate(self.names):
+            norm = normalize(name)
+            self.exact.setdefault(norm, name)
+            grams = trigrams(norm)
+            self.grams.append(len(grams))
+            for g in grams:
+                self.index[g].append(i)
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, text):
+        """Return the best matching catalogue name for text, or None."""
+        norm = normalize(text)
+        if not norm:
+            return None
+        if norm in self.exact:
+            return self.exact[norm]
+        query = trigrams(norm)
+        shared = defaultdict(int)
+        for g in query:
+            for i in self.index.get(g, ()):
+                shared[i] += 1
+        scored = sorted((-2.0 * n / (len(query) + self.grams[i]), i) for i, n in shared.items())
+        for score, i in scored:
+            if -score <= self.min_score:
+                break
+            if same_dish(norm, normalize(self.names[i])):
+                return self.names[i]
+        return None
+
+    def resolve_many(self, texts):
+        return [self.resolve(t) for t in texts]
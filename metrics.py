@@ -0,0 +1,132 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are keyed by a tuple of label values and updated
+under the registry lock; collected metrics are read from callbacks at scrape
+time (used for cache hits/misses, which the caches already count). render()
+returns the text served at /metrics.
+
+Each worker process keeps its own numbers, so scrape every worker (or run a
+single worker) when collecting.
+"""
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, doc, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for key, v in sorted(self.values.items()):
+            yield self.name, _labels(self.labels, key), v
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}   # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            row = self.values.get(label_values)
+            if row is None:
+                row = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[bisect.bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+    def samples(self):
+        for key, row in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += n
+                yield f"{self.name}_bucket", _labels(self.labels, key, f'le="{_number(bound)}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labels, key), row[-1]
+            yield f"{self.name}_count", _labels(self.labels, key), cumulative
+
+
+class Collected:
+    """Values come from fn() -> [(label values, value), ...] at scrape time."""
+
+    def __init__(self, name, doc, labels, fn, kind="gauge"):
+        self.name, self.doc, self.labels, self.fn, self.kind = name, doc, tuple(labels), fn, kind
+
+    def samples(self):
+        for key, v in self.fn():
+            yield self.name, _labels(self.labels, key), v
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def _add(self, metric):
+        metric.lock = self.lock
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, doc, labels=()):
+        return self._add(Counter(name, doc, labels))
+
+    def histogram(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, doc, labels, buckets))
+
+    def collected(self, name, doc, labels, fn, kind="gauge"):
+        return self._add(Collected(name, doc, labels, fn, kind))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for m in self.metrics:
+                lines.append(f"# HELP {m.name} {m.doc}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+                for name, labels, value in m.samples():
+                    lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def cache_stats(caches):
+    """Collector callback for {name: lru_cache-wrapped function or (hits, misses) callable}."""
+    def collect():
+        out = []
+        for name, cache in caches.items():
+            if hasattr(cache, "cache_info"):
+                info = cache.cache_info()
+                hits, misses = info.hits, info.misses
+            else:
+                hits, misses = cache()
+            out.append(((name, "hits"), hits))
+            out.append(((name, "misses"), misses))
+        return out
+    return collect
@@ -0,0 +1,354 @@
+"""
+Versioned schema migrations that run against a live database.
+
+A Migration is a version number, a name, steps and optionally a Backfill.
+Migrator.upgrade() runs the schema steps of every migration not yet
+recorded in the schema_migration table, in version order. They run at
+startup, on the request path, and may meet a database that predates the
+version table, so they must be quick and idempotent: create a table if
+missing, add a nullable or defaulted column if missing (create_tables,
+add_column below).
+
+Everything slow is deferred to run_deferred(), which `flask migrate` or a
+background thread runs while the app serves requests: steps marked
+deferred() (index builds: create_index), then the backfill. A backfill
+walks the table in primary-key order in short transactions, and each batch
+commits together with its checkpoint, so an interrupted backfill resumes
+where it stopped. Between batches it sleeps long enough to keep its share
+of the database's time under max_load. The code must work while deferred
+work is pending (new writes fill the new column themselves, readers fall
+back for rows not yet done, queries merely run slower without the new
+index); anything that needs every row done (a NOT NULL constraint, dropping
+the fallback) goes in a later migration.
+
+Two leases in schema_migration_lock keep other processes out: "schema" for
+upgrade() and "migrate" for the deferred work. They are renewed by a
+heartbeat while held and expire if the holder dies. Requests never wait for
+one: a process that finds the schema lease taken serves with the schema as
+it is and tries again on its next request. On PostgreSQL indexes are built
+CONCURRENTLY; SQLite and MySQL build them in place (on SQLite writers wait
+for the build).
+"""
+import datetime
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import (BigInteger, Column, DateTime, Float, Integer, MetaData, String, Table, func, inspect,
+                        insert, select, text, update)
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+log = logging.getLogger(__name__)
+
+LEASE_SECONDS = 60     # renewed every third of it while held; a dead holder's lease lapses after it
+BATCH_SIZE = 1000
+SCHEMA_LEASE = "schema"
+WORK_LEASE = "migrate"
+
+metadata = MetaData()
+
+versions = Table(
+    "schema_migration", metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+    Column("backfill_cursor", BigInteger),                  # last key done; NULL until the backfill starts
+    Column("backfill_stop", BigInteger),                    # highest key when it started
+    Column("backfill_rows", BigInteger, nullable=False, default=0),
+    Column("completed_at", DateTime),                       # NULL while the backfill is pending
+)
+
+lease = Table(
+    "schema_migration_lock", metadata,
+    Column("name", String(50), primary_key=True),
+    Column("owner", String(100), nullable=False),
+    Column("expires_at", Float, nullable=False),            # unix time
+)
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Backfill:
+    """
+    A rewrite of table's existing rows in key order. apply(conn, lo, hi)
+    updates the rows with lo < key <= hi and returns how many it changed;
+    pending(conn), if given, says whether there is anything to do at all.
+    """
+
+    def __init__(self, table, apply, pending=None, key=None):
+        self.table = table
+        self.apply = apply
+        self.pending = pending
+        self.key = key if key is not None else table.primary_key.columns.values()[0]
+
+
+class Migration:
+    def __init__(self, version, name, steps=(), backfill=None):
+        self.version = version
+        self.name = name
+        self.steps = list(steps)
+        self.backfill = backfill
+
+    def __repr__(self):
+        return f"<Migration {self.version} {self.name}>"
+
+    @property
+    def schema_steps(self):
+        return [s for s in self.steps if not getattr(s, "deferred", False)]
+
+    @property
+    def deferred_steps(self):
+        return [s for s in self.steps if getattr(s, "deferred", False)]
+
+    @property
+    def has_deferred(self):
+        return bool(self.deferred_steps) or self.backfill is not None
+
+
+def deferred(step):
+    """Mark a slow step (an index build, a table rewrite) to run after startup, with the backfills."""
+    step.deferred = True
+    return step
+
+
+def create_tables(*tables, metadata=None):
+    """Step: create tables (default: every table in metadata) that don't exist yet, with their indexes."""
+    def step(engine):
+        with engine.begin() as conn:
+            if metadata is not None:
+                metadata.create_all(conn)
+            else:
+                for table in tables:
+                    table.create(conn, checkfirst=True)
+    return step
+
+
+def add_column(table, name, ddl):
+    """Step: ALTER TABLE table ADD COLUMN name ddl, unless it is there. ddl must allow existing rows (NULL or DEFAULT)."""
+    def step(engine):
+        with engine.begin() as conn:
+            if name not in {c["name"] for c in inspect(conn).get_columns(table)}:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+    return step
+
+
+def create_index(index):
+    """
+    Deferred step: create index if missing; CONCURRENTLY on PostgreSQL,
+    replacing an invalid leftover of a failed build.
+    """
+    def step(engine):
+        if engine.dialect.name != "postgresql":
+            with engine.begin() as conn:
+                # IF NOT EXISTS rather than checkfirst: expression indexes aren't reflected
+                conn.execute(CreateIndex(index, if_not_exists=True))
+            return
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            invalid = conn.scalar(text(
+                "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name"), {"name": index.name})
+            if invalid:
+                conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY "{index.name}"')
+            options = index.dialect_options["postgresql"]
+            options["concurrently"] = True
+            try:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+            finally:
+                options["concurrently"] = False
+    return deferred(step)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class Migrator:
+    """Applies migrations (sorted by version) to engine's database."""
+
+    def __init__(self, engine, migrations, lease_seconds=LEASE_SECONDS):
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+
+    def _prepare(self):
+        with self.engine.begin() as conn:
+            for table in metadata.sorted_tables:
+                conn.execute(CreateTable(table, if_not_exists=True))
+            have = set(conn.scalars(select(lease.c.name)))
+        for name in (SCHEMA_LEASE, WORK_LEASE):
+            if name not in have:
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(insert(lease).values(name=name, owner="", expires_at=0))
+                except IntegrityError:
+                    pass    # another process got there first
+
+    def applied(self):
+        """{version: schema_migration row} for the recorded migrations."""
+        with self.engine.connect() as conn:
+            return {r.version: r for r in conn.execute(select(versions))}
+
+    def status(self):
+        """[(migration, row or None)] in version order."""
+        self._prepare()
+        applied = self.applied()
+        return [(m, applied.get(m.version)) for m in self.migrations]
+
+    def unfinished(self):
+        """Migrations whose schema steps ran but whose deferred steps or backfill haven't finished."""
+        return [m for m, row in self.status() if row is not None and row.completed_at is None]
+
+    # ---- lease ----
+
+    def _claim(self, conn, name):
+        """Take or renew a lease in conn's transaction; False if another live process holds it."""
+        now = time.time()
+        return bool(conn.execute(
+            update(lease).where(lease.c.name == name,
+                                (lease.c.owner == self.owner) | (lease.c.expires_at < now))
+            .values(owner=self.owner, expires_at=now + self.lease_seconds)).rowcount)
+
+    def _renew(self, conn, name):
+        if not self._claim(conn, name):
+            raise MigrationError(f"lost the {name!r} migration lease to another process")
+
+    def _heartbeat(self, name, stop):
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                with self.engine.begin() as conn:
+                    if not self._claim(conn, name):
+                        log.error("migration lease %r was taken over by another process", name)
+                        return
+            except SQLAlchemyError:
+                # e.g. SQLite locked by the index build being waited on; the lease has time left
+                log.warning("could not renew the migration lease %r, retrying", name, exc_info=True)
+
+    @contextmanager
+    def _lease(self, name, wait=0):
+        """
+        Hold a lease for the block, waiting up to wait seconds for it, and
+        keep renewing it while the block runs. Yields False if it wasn't had.
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            with self.engine.begin() as conn:
+                if self._claim(conn, name):
+                    break
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(0.5)
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(name, stop), name=f"lease-{name}", daemon=True)
+        beat.start()
+        try:
+            yield True
+        finally:
+            stop.set()
+            beat.join()
+            with self.engine.begin() as conn:
+                conn.execute(update(lease).where(lease.c.name == name, lease.c.owner == self.owner)
+                             .values(expires_at=0))
+
+    # ---- schema steps ----
+
+    def upgrade(self, wait=0):
+        """
+        Run the schema steps of every unrecorded migration and record it
+        (with its deferred work, if any, pending). Waits up to wait seconds
+        for another process's upgrade (requests pass 0). Returns the
+        migrations applied, or None if another process is upgrading.
+        """
+        self._prepare()
+        done = self.applied()
+        if all(m.version in done for m in self.migrations):
+            return []
+        ran = []
+        with self._lease(SCHEMA_LEASE, wait) as held:
+            if not held:
+                return None
+            done = self.applied()
+            for m in self.migrations:
+                if m.version in done:
+                    continue
+                log.info("migration %s %s", m.version, m.name)
+                for step in m.schema_steps:
+                    step(self.engine)
+                with self.engine.begin() as conn:
+                    self._renew(conn, SCHEMA_LEASE)
+                    conn.execute(insert(versions).values(
+                        version=m.version, name=m.name, applied_at=_now(), backfill_rows=0,
+                        completed_at=None if m.has_deferred else _now()))
+                ran.append(m)
+        return ran
+
+    # ---- deferred steps and backfills ----
+
+    def run_deferred(self, batch_size=BATCH_SIZE, pause=0.0, max_load=0.5, progress=None):
+        """
+        Finish unfinished migrations, oldest first: their deferred steps,
+        then their backfill. Backfills sleep at least pause seconds between
+        batches, and longer if needed to keep them busy for at most max_load
+        of the time. progress(migration, cursor, stop, rows) is called after
+        each batch. Returns {version: rows backfilled by this run}, or None if
+        another process is running them.
+        """
+        if not 0 < max_load <= 1:
+            raise ValueError("max_load must be in (0, 1]")
+        if not self.unfinished():
+            return {}
+        done = {}
+        with self._lease(WORK_LEASE) as held:
+            if not held:
+                return None
+            for m, row in self.status():
+                if row is None or row.completed_at is not None:
+                    continue
+                if row.backfill_cursor is None:     # deferred steps are idempotent: rerun after an interruption
+                    for step in m.deferred_steps:
+                        log.info("migration %s %s: deferred step", m.version, m.name)
+                        step(self.engine)
+                        with self.engine.begin() as conn:
+                            self._renew(conn, WORK_LEASE)
+                done[m.version] = self._backfill(m, row, batch_size, pause, max_load, progress) if m.backfill else 0
+                with self.engine.begin() as conn:
+                    conn.execute(update(versions).where(versions.c.version == m.version)
+                                 .values(completed_at=_now()))
+                log.info("migration %s %s: done", m.version, m.name)
+        return done
+
+    def _backfill(self, m, row, batch_size, pause, max_load, progress):
+        b, key = m.backfill, m.backfill.key
+        cursor, stop, rows = row.backfill_cursor, row.backfill_stop, 0
+        where = versions.c.version == m.version
+        if cursor is None:
+            with self.engine.begin() as conn:
+                lo, stop = conn.execute(select(func.min(key), func.max(key))).one()
+                if lo is None or (b.pending is not None and not b.pending(conn)):
+                    cursor = stop = 0
+                else:
+                    cursor = lo - 1
+                conn.execute(update(versions).where(where).values(backfill_cursor=cursor, backfill_stop=stop))
+        while cursor < stop:
+            started = time.monotonic()
+            with self.engine.begin() as conn:
+                self._renew(conn, WORK_LEASE)
+                hi = conn.scalar(select(key).where(key > cursor).order_by(key).offset(batch_size - 1).limit(1))
+                hi = stop if hi is None else min(hi, stop)
+                n = b.apply(conn, cursor, hi) or 0
+                conn.execute(update(versions).where(where).values(
+                    backfill_cursor=hi, backfill_rows=versions.c.backfill_rows + n))
+            cursor, rows = hi, rows + n
+            if progress:
+                progress(m, cursor, stop, rows)
+            if cursor < stop:
+                elapsed = time.monotonic() - started
+                time.sleep(max(pause, elapsed * (1 - max_load) / max_load))
+        return rows
@@ -0,0 +1,103 @@
+"""
+Array-backed nutrient table.
+
+The food catalogue is stored as a dense (foods x nutrients) NumPy matrix with a
+name -> row index, so totals for many items, patients or days are one
+gather (matrix[rows] * quantity) followed by one grouped reduce.
+"""
+import numpy as np
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+
+
+class NutrientTable:
+    def __init__(self, foods, nutrients=NUTRIENTS):
+        """foods: {name: {nutrient: value}} (the nutrition_db shape)."""
+        self.nutrients = tuple(nutrients)
+        self.names = list(foods)
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.matrix = np.array(
+            [[foods[n].get(k, 0) for k in self.nutrients] for n in self.names],
+            dtype=np.float64,
+        ).reshape(len(self.names), len(self.nutrients))
+        # remember which cells were ints so totals render like the old dict sums (338, not 338.0)
+        self.is_int = np.array(
+            [[isinstance(foods[n].get(k, 0), int) for k in self.nutrients] for n in self.names],
+            dtype=bool,
+        ).reshape(self.matrix.shape)
+        self._foods = foods
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def row(self, name):
+        return self.index.get(name, -1)
+
+    def rows(self, items):
+        """Row numbers for items; unknown names map to -1."""
+        get = self.index.get
+        return np.fromiter((get(i, -1) for i in items), dtype=np.intp)
+
+    def info(self, name):
+        """The original {nutrient: value} dict for one food, or None."""
+        return self._foods.get(name)
+
+    def values(self, rows):
+        """(len(rows), nutrients) float64 values for known row numbers."""
+        return self.matrix[rows]
+
+    def ints(self, rows):
+        """Per nutrient: were all the values in these rows written as ints?"""
+        return self.is_int[rows].all(axis=0)
+
+    def totals(self, items, quantities=None):
+        """Sum nutrients over items (optionally weighted). Returns a 1-D array."""
+        rows = self.rows(items)
+        known = rows >= 0
+        values = self.values(rows[known])
+        if quantities is not None:
+            values = values * np.asarray(quantities, dtype=np.float64)[known, None]
+        return values.sum(axis=0)
+
+    def group_matrix(self, groups, items, quantities=None):
+        """
+        Sum nutrients for many (group, item) pairs in one pass.
+
+        groups: one hashable key per item (patient id, (patient_id, date), ...).
+        Returns (keys, totals) where totals[i] is the nutrient vector of keys[i].
+        """
+        rows = self.rows(items)
+        keys = list(dict.fromkeys(groups))
+        slot = {k: i for i, k in enumerate(keys)}
+        group_idx = np.fromiter((slot[g] for g in groups), dtype=np.intp, count=len(rows))
+        known = rows >= 0
+        values = self.values(rows[known])
+        if quantities is not None:
+            values = values * np.asarray(quantities, dtype=np.float64)[known, None]
+        totals = np.zeros((len(keys), len(self.nutrients)), dtype=np.float64)
+        np.add.at(totals, group_idx[known], values)
+        return keys, totals
+
+    def group_totals(self, groups, items, quantities=None):
+        """Like group_matrix but returns {group: {nutrient: rounded total}}."""
+        keys, totals = self.group_matrix(groups, items, quantities)
+        return {
+            k: {n: round(float(v), 1) for n, v in zip(self.nutrients, totals[i])}
+            for i, k in enumerate(keys)
+        }
+
+    def summary(self, items, quantities=None):
+        """Return (total, details) with the same shape as the old nutrition_summary."""
+        items = list(items)
+        rows = self.rows(items)
+        known = rows >= 0
+        total_vec = self.totals(items, quantities)
+        all_int = self.ints(rows[known]) if quantities is None else np.zeros(len(self.nutrients), bool)
+        total = {}
+        for n, v, as_int in zip(self.nutrients, total_vec, all_int):
+            total[n] = int(round(v)) if as_int else round(float(v), 1)
+        details = {i: self.info(i) for i, r in zip(items, rows) if r >= 0}
+        return total, details
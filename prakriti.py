@@ -0,0 +1,125 @@
+"""
+Prakriti / Agni / Ama scoring from questionnaire answers.
+
+analyze_prakriti_and_agni_ama() scores one features dict; score_features()
+scores many at once by encoding each answer column to dosha codes and summing
+per-dosha counts as array operations. Both give identical results.
+"""
+import numpy as np
+
+DOSHAS = ("Vata", "Pitta", "Kapha")
+
+FEATURE_MAP = {
+    "sleep": {"light": "Vata", "disturbed": "Vata", "deep": "Kapha", "balanced": "Pitta"},
+    "skin": {"dry": "Vata", "oily": "Pitta", "moist": "Kapha", "normal": "Pitta"},
+    "digestion": {"irregular": "Vata", "strong": "Pitta", "slow": "Kapha", "normal": "Pitta"},
+    "appetite": {"variable": "Vata", "strong": "Pitta", "low": "Kapha"},
+    "body_build": {"thin": "Vata", "medium": "Pitta", "heavy": "Kapha"},
+    "temp_sensitivity": {"cold": "Vata", "hot": "Pitta", "cool": "Kapha"},
+    "mood": {"anxious": "Vata", "irritable": "Pitta", "calm": "Kapha"}
+}
+
+
+def analyze_prakriti_and_agni_ama(features):
+    """
+    features: dict with keys like 'sleep','skin','digestion','appetite','body_build','temp_sensitivity','mood','agni','ama_signs'
+    Returns: (prakriti_string, agni, ama)
+    """
+    scores = {"Vata": 0, "Pitta": 0, "Kapha": 0}
+    mapping = FEATURE_MAP
+    for k, v in features.items():
+        if not v: continue
+        val = v.strip().lower()
+        if k in mapping:
+            pick = mapping[k].get(val)
+            if pick:
+                scores[pick] += 1
+
+    sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    top = [k for k,v in sorted_scores if v == sorted_scores[0][1] and v>0]
+    if len(top)==0:
+        prakriti = "Balanced"
+    elif len(top)==1:
+        prakriti = top[0]
+    else:
+        prakriti = "-".join(top)
+
+    # Agni: use provided 'agni' in features or infer from digestion/appetite
+    agni = features.get("agni")
+    if not agni:
+        digestion = features.get("digestion","").strip().lower()
+        appetite = features.get("appetite","").strip().lower()
+        if digestion == "weak" or appetite == "low" or digestion=="slow":
+            agni = "weak"
+        elif digestion == "strong":
+            agni = "strong"
+        else:
+            agni = "normal"
+
+    # Ama: signs from features['ama_signs'] (string like bloating, heaviness)
+    ama_signs = features.get("ama_signs","").strip().lower()
+    if ama_signs:
+        ama = "present"
+    else:
+        ama = "absent"
+
+    return prakriti, agni, ama
+
+
+def _prakriti_labels():
+    """Label for every bitmask of tied top doshas (bit i = DOSHAS[i])."""
+    labels = []
+    for mask in range(1 << len(DOSHAS)):
+        top = [d for i, d in enumerate(DOSHAS) if mask & (1 << i)]
+        labels.append("-".join(top) if top else "Balanced")
+    return labels
+
+PRAKRITI_LABELS = _prakriti_labels()
+
+
+def _encode(column, answers):
+    """Map a column of answers to dosha codes (len(DOSHAS) = no score)."""
+    values = np.array([v or "" for v in column], dtype=str)
+    uniq, inverse = np.unique(values, return_inverse=True)
+    none = len(DOSHAS)
+    lut = np.array(
+        [DOSHAS.index(answers[u.strip().lower()]) if u and u.strip().lower() in answers else none for u in uniq],
+        dtype=np.intp,
+    )
+    return lut[inverse.reshape(-1)]
+
+
+def score_features(rows):
+    """
+    Score a batch of features dicts (as produced by csv.DictReader).
+    Returns a list of (prakriti_string, agni, ama) in row order.
+    """
+    rows = list(rows)
+    n = len(rows)
+    if not n:
+        return []
+    counts = np.zeros((n, len(DOSHAS) + 1), dtype=np.int32)
+    everyone = np.arange(n)
+    for field, answers in FEATURE_MAP.items():
+        counts[everyone, _encode([r.get(field) for r in rows], answers)] += 1
+    counts = counts[:, :len(DOSHAS)]
+    best = counts.max(axis=1)
+    top = (counts == best[:, None]) & (best[:, None] > 0)
+    masks = top @ (1 << np.arange(len(DOSHAS)))
+    labels = [PRAKRITI_LABELS[m] for m in masks.tolist()]
+
+    results = []
+    for prakriti, r in zip(labels, rows):
+        agni = r.get("agni")
+        if not agni:
+            digestion = (r.get("digestion") or "").strip().lower()
+            appetite = (r.get("appetite") or "").strip().lower()
+            if digestion == "weak" or appetite == "low" or digestion == "slow":
+                agni = "weak"
+            elif digestion == "strong":
+                agni = "strong"
+            else:
+                agni = "normal"
+        ama = "present" if (r.get("ama_signs") or "").strip().lower() else "absent"
+        results.append((prakriti, agni, ama))
+    return results
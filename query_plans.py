@@ -0,0 +1,47 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot queries.
+
+Each route's MealLog/DailyNutrition query (and the practitioner roster's
+Patient query) is explained against a seeded SQLite database; a plan step
+that SCANs one of the hot tables (instead of SEARCHing an index) is reported
+as a regression. Run with `flask check-query-plans`.
+"""
+import datetime
+
+HOT_TABLES = ("meal_log", "daily_nutrition", "patient")
+
+
+def explain(conn, stmt):
+    """Return the plan detail lines SQLite reports for a SQLAlchemy statement."""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    args = []
+    for name in compiled.positiontup or ():
+        value = params[name]
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        args.append(value)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), tuple(args))
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan, tables=HOT_TABLES):
+    """Plan lines that walk a whole hot table or index."""
+    bad = []
+    for line in plan:
+        words = line.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in tables:
+            bad.append(line)
+    return bad
+
+
+def check(conn, queries, tables=HOT_TABLES):
+    """
+    queries: {name: statement}. Returns {name: (plan, offending lines)} for
+    every query, so callers can print the plans and fail on any offenders.
+    """
+    results = {}
+    for name, stmt in queries.items():
+        plan = explain(conn, stmt)
+        results[name] = (plan, full_scans(plan, tables))
+    return results
@@ -0,0 +1,179 @@
+"""
+Item-item meal recommender built from MealLog history.
+
+Foods logged by the same patient on the same day co-occur. The model keeps a
+sparse co-occurrence matrix (compacted CSR arrays plus a small dict of recent
+increments) and per-food logged/eaten counts. A query scores every food by its
+cosine-normalized co-occurrence with the patient's recent foods, weighted by
+how often it is actually eaten, and returns the top k that pass a caller
+supplied suitability mask.
+
+Incremental updates come from log/eaten events in this process; compact()
+folds them into the CSR arrays and build()/load() replace the whole model
+(see `flask rebuild-recommender`).
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+
+class CooccurrenceModel:
+    def __init__(self, items):
+        self.items = list(items)
+        self.index = {name: i for i, name in enumerate(self.items)}
+        n = len(self.items)
+        self.logged = np.zeros(n, dtype=np.float64)
+        self.eaten = np.zeros(n, dtype=np.float64)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self.delta = defaultdict(Counter)
+        self.delta_size = 0
+        self.built_at = time.time()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _ids(self, foods):
+        return [self.index[f] for f in foods if f in self.index]
+
+    # ---- incremental updates ----
+    def record_meals(self, existing, new):
+        """new foods were logged on a day that already had `existing` foods."""
+        old_ids, new_ids = self._ids(existing), self._ids(new)
+        with self.lock:
+            for pos, i in enumerate(new_ids):
+                self.logged[i] += 1
+                for j in old_ids + new_ids[:pos]:
+                    if i != j:
+                        self.delta[i][j] += 1
+                        self.delta[j][i] += 1
+                        self.delta_size += 2
+
+    def record_eaten(self, foods):
+        with self.lock:
+            for i in self._ids(foods):
+                self.eaten[i] += 1
+
+    def compact(self):
+        """Fold pending increments into the CSR arrays."""
+        with self.lock:
+            if not self.delta:
+                return
+            rows, cols, vals = self._coo()
+            dr, dc, dv = [], [], []
+            for i, counts in self.delta.items():
+                dr.extend([i] * len(counts))
+                dc.extend(counts.keys())
+                dv.extend(counts.values())
+            rows.append(np.array(dr, dtype=np.int64))
+            cols.append(np.array(dc, dtype=np.int32))
+            vals.append(np.array(dv, dtype=np.float32))
+            self._set_csr(np.concatenate(rows), np.concatenate(cols), np.concatenate(vals))
+            self.delta = defaultdict(Counter)
+            self.delta_size = 0
+
+    def _coo(self):
+        counts = np.diff(self.indptr)
+        return ([np.repeat(np.arange(len(self.items), dtype=np.int64), counts)],
+                [self.indices], [self.data])
+
+    def _set_csr(self, rows, cols, vals):
+        """Sum duplicate (row, col) entries and store as CSR."""
+        n = len(self.items)
+        keys = rows * n + cols
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        summed = np.zeros(len(uniq), dtype=np.float32)
+        np.add.at(summed, inverse, vals)
+        urows = uniq // n
+        self.indices = (uniq % n).astype(np.int32)
+        self.data = summed
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(urows, minlength=n), out=self.indptr[1:])
+
+    # ---- full rebuild ----
+    @classmethod
+    def build(cls, items, baskets):
+        """
+        baskets: iterable of (foods, eaten_flags) per patient-day.
+        Pairs are accumulated in arrays and reduced once.
+        """
+        model = cls(items)
+        rows, cols = [], []
+        for foods, eaten in baskets:
+            ids = []
+            for f, e in zip(foods, eaten):
+                i = model.index.get(f)
+                if i is None:
+                    continue
+                model.logged[i] += 1
+                if e:
+                    model.eaten[i] += 1
+                ids.append(i)
+            if len(ids) > 1:
+                a = np.array(ids, dtype=np.int64)
+                r, c = np.meshgrid(a, a, indexing="ij")
+                keep = ~np.eye(len(a), dtype=bool)
+                rows.append(r[keep])
+                cols.append(c[keep].astype(np.int32))
+        if rows:
+            r = np.concatenate(rows)
+            c = np.concatenate(cols)
+            model._set_csr(r, c, np.ones(len(r), dtype=np.float32))
+        return model
+
+    def save(self, path):
+        with self.lock:
+            np.savez(path, items=np.array(self.items, dtype=object), logged=self.logged, eaten=self.eaten,
+                     indptr=self.indptr, indices=self.indices, data=self.data,
+                     built_at=np.array(self.built_at))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as f:
+            model = cls(f["items"].tolist())
+            model.logged, model.eaten = f["logged"], f["eaten"]
+            model.indptr, model.indices, model.data = f["indptr"], f["indices"], f["data"]
+            model.built_at = float(f["built_at"])
+        return model
+
+    # ---- queries ----
+    def scores(self, history):
+        """history: {food: weight}. Returns a score per item."""
+        n = len(self.items)
+        norm = 1.0 / np.sqrt(np.maximum(self.logged, 1.0))
+        s = np.zeros(n, dtype=np.float64)
+        with self.lock:
+            for food, w in history.items():
+                i = self.index.get(food)
+                if i is None:
+                    continue
+                lo, hi = self.indptr[i], self.indptr[i + 1]
+                cols = self.indices[lo:hi]
+                s[cols] += w * norm[i] * self.data[lo:hi] * norm[cols]
+                for j, c in self.delta.get(i, {}).items():
+                    s[j] += w * norm[i] * c * norm[j]
+            eaten_ratio = (self.eaten + 1.0) / (self.logged + 2.0)
+        if not s.any():
+            # cold start: popular foods that people actually eat
+            s = np.log1p(self.logged)
+        return s * eaten_ratio
+
+    def top_k(self, history, k=5, allowed=None, exclude=()):
+        """Best k foods for a history, restricted to `allowed` (bool mask) and minus `exclude`."""
+        s = self.scores(history)
+        if allowed is not None:
+            s = np.where(allowed, s, -np.inf)
+        for food in exclude:
+            i = self.index.get(food)
+            if i is not None:
+                s[i] = -np.inf
+        k = min(k, int(np.isfinite(s).sum()))
+        if k <= 0:
+            return []
+        best = np.argpartition(-s, k - 1)[:k]
+        best = best[np.argsort(-s[best], kind="stable")]
+        return [self.items[i] for i in best]
@@ -0,0 +1,294 @@
+"""
+Diet rule packs.
+
+A rule pack is a JSON (or YAML, if PyYAML is installed) file holding
+everything a practitioner may want to tune without a deploy: the food
+suitability keyword rules, the per-dosha meal plans (a slot may name a
+fallback list for catalogues without one of its foods), the light meal swapped
+in for weak agni / ama, and the seasonal tips by month. See rules/default.json.
+
+load() validates a pack and compiles it into lookup tables (a
+food_rules.FoodRules, the plan per dosha keyword, a 12-entry month table);
+any problem raises RulePackError naming the offending field. PackStore keeps
+the current pack for a process and swaps in a new one when the file changes:
+the new pack is fully built before the reference is replaced, readers take
+the reference once per call, and a pack that fails to load leaves the old
+one in place.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from food_rules import FoodRules
+
+log = logging.getLogger(__name__)
+
+MEAL_SLOTS = ("Breakfast", "Lunch", "Dinner")
+DIGESTION_FIELDS = ("agni", "ama")
+
+
+class RulePackError(ValueError):
+    pass
+
+
+class RulePack:
+    """A validated, compiled rule pack. Treat as immutable."""
+
+    def __init__(self, version, source, checksum, foods, plans, light_meal, seasonal, plan_fallbacks=None):
+        self.version = version
+        self.source = source
+        self.checksum = checksum
+        self.foods = foods              # food_rules.FoodRules
+        self.plans = plans              # [(dosha keyword, {slot: [food]})], "default" last
+        self.light_meal = light_meal    # (food, {field: value}) or None
+        self.seasonal = seasonal        # tuple of 12 food lists, January first
+        self.plan_fallbacks = plan_fallbacks or {}     # {dosha keyword: {slot: (food, [food])}}
+
+    def plan_for(self, prakriti, available=None):
+        """
+        The meal plan template for a prakriti label (first dosha keyword it
+        contains). Given available (the catalogue), a slot whose fallback
+        names a food missing from it gets the fallback list instead.
+        """
+        p = (prakriti or "").lower()
+        dosha, plan = self.plans[-1]
+        if p and p != "balanced":
+            dosha, plan = next(((d, pl) for d, pl in self.plans[:-1] if d in p), (dosha, plan))
+        fallbacks = self.plan_fallbacks.get(dosha)
+        if available is None or not fallbacks:
+            return plan
+        return {slot: fallbacks[slot][1] if slot in fallbacks and fallbacks[slot][0] not in available else foods
+                for slot, foods in plan.items()}
+
+    def planned_foods(self):
+        """Every food the meal plans can name, fallbacks included."""
+        foods = [f for _, plan in self.plans for slot in plan.values() for f in slot]
+        foods += [f for slots in self.plan_fallbacks.values() for _, fallback in slots.values() for f in fallback]
+        return list(dict.fromkeys(foods))
+
+    def wants_light_meal(self, agni, ama):
+        if self.light_meal is None:
+            return False
+        values = {"agni": agni, "ama": ama}
+        return any(values[f] == v for f, v in self.light_meal[1].items())
+
+    def seasonal_for(self, month):
+        return self.seasonal[month - 1]
+
+
+def _require(cond, where, message):
+    if not cond:
+        raise RulePackError(f"{where}: {message}")
+
+
+def _string(value, where):
+    _require(isinstance(value, str) and value.strip(), where, "expected a non-empty string")
+    return value
+
+
+def _strings(value, where):
+    _require(isinstance(value, list), where, "expected a list of strings")
+    return [_string(v, f"{where}[{i}]") for i, v in enumerate(value)]
+
+
+def _table(data, key, where="pack"):
+    _require(isinstance(data, dict), where, "expected an object")
+    _require(key in data, f"{where}.{key}", "missing")
+    return data[key]
+
+
+def compile_pack(data, source="<memory>", checksum=""):
+    """Validate parsed pack data and build a RulePack."""
+    version = _table(data, "version")
+    _require(isinstance(version, (str, int)) and str(version).strip(), "version", "expected a string or number")
+
+    prakriti_rules = []
+    rules = _table(data, "prakriti_rules")
+    _require(isinstance(rules, list), "prakriti_rules", "expected a list")
+    for i, r in enumerate(rules):
+        where = f"prakriti_rules[{i}]"
+        prakriti_rules.append((
+            _string(_table(r, "dosha", where), f"{where}.dosha").lower(),
+            [k.lower() for k in _strings(_table(r, "good", where), f"{where}.good")],
+            _string(_table(r, "good_message", where), f"{where}.good_message"),
+            [k.lower() for k in _strings(_table(r, "bad", where), f"{where}.bad")],
+            _string(_table(r, "bad_message", where), f"{where}.bad_message"),
+        ))
+
+    digestion_rules = []
+    rules = _table(data, "digestion_rules")
+    _require(isinstance(rules, list), "digestion_rules", "expected a list")
+    for i, r in enumerate(rules):
+        where = f"digestion_rules[{i}]"
+        field = _table(r, "field", where)
+        _require(field in DIGESTION_FIELDS, f"{where}.field", f"expected one of {', '.join(DIGESTION_FIELDS)}")
+        digestion_rules.append((
+            field,
+            _string(_table(r, "value", where), f"{where}.value"),
+            [k.lower() for k in _strings(_table(r, "good", where), f"{where}.good")],
+            _string(_table(r, "good_message", where), f"{where}.good_message"),
+            _string(_table(r, "fallback_message", where), f"{where}.fallback_message"),
+        ))
+
+    default = _table(data, "default_verdict")
+    ok = _table(default, "ok", "default_verdict")
+    _require(isinstance(ok, bool), "default_verdict.ok", "expected true or false")
+    default_verdict = (ok, _string(_table(default, "message", "default_verdict"), "default_verdict.message"))
+
+    plans, plan_fallbacks = [], {}
+    raw_plans = _table(data, "meal_plans")
+    _require(isinstance(raw_plans, dict), "meal_plans", "expected an object")
+    _require("default" in raw_plans, "meal_plans.default", "missing")
+    for key, plan in raw_plans.items():
+        where = f"meal_plans.{key}"
+        _require(isinstance(plan, dict) and set(plan) == set(MEAL_SLOTS), where,
+                 f"expected exactly the slots {', '.join(MEAL_SLOTS)}")
+        slots = {}
+        for slot in MEAL_SLOTS:
+            raw = plan[slot]
+            if isinstance(raw, dict):
+                # {"foods": [...], "fallback": {"without": food, "foods": [...]}}
+                fallback = _table(raw, "fallback", f"{where}.{slot}")
+                plan_fallbacks.setdefault(key.lower(), {})[slot] = (
+                    _string(_table(fallback, "without", f"{where}.{slot}.fallback"), f"{where}.{slot}.fallback.without"),
+                    _strings(_table(fallback, "foods", f"{where}.{slot}.fallback"), f"{where}.{slot}.fallback.foods"))
+                raw = _table(raw, "foods", f"{where}.{slot}")
+            slots[slot] = _strings(raw, f"{where}.{slot}")
+        plans.append((key.lower(), slots))
+    plans.sort(key=lambda p: p[0] == "default")     # stable: dosha order kept, default last
+
+    light_meal = None
+    if data.get("light_meal") is not None:
+        raw = data["light_meal"]
+        food = _string(_table(raw, "food", "light_meal"), "light_meal.food")
+        when = _table(raw, "when", "light_meal")
+        _require(isinstance(when, dict) and when and set(when) <= set(DIGESTION_FIELDS), "light_meal.when",
+                 f"expected an object keyed by {' / '.join(DIGESTION_FIELDS)}")
+        light_meal = (food, {f: _string(v, f"light_meal.when.{f}") for f, v in when.items()})
+
+    months = [None] * 12
+    seasons = _table(data, "seasonal")
+    _require(isinstance(seasons, list), "seasonal", "expected a list")
+    for i, season in enumerate(seasons):
+        where = f"seasonal[{i}]"
+        foods = _strings(_table(season, "foods", where), f"{where}.foods")
+        season_months = _table(season, "months", where)
+        _require(isinstance(season_months, list) and season_months, f"{where}.months", "expected a list of months")
+        for m in season_months:
+            _require(isinstance(m, int) and 1 <= m <= 12, f"{where}.months", f"{m!r} is not a month (1-12)")
+            _require(months[m - 1] is None, f"{where}.months", f"month {m} is already covered")
+            months[m - 1] = foods
+    missing = [str(m + 1) for m, foods in enumerate(months) if foods is None]
+    _require(not missing, "seasonal", f"no tips for month {', '.join(missing)}")
+
+    return RulePack(str(version), source, checksum, FoodRules(prakriti_rules, digestion_rules, default_verdict),
+                    plans, light_meal, tuple(months), plan_fallbacks)
+
+
+def parse(raw, path):
+    """Parse pack bytes as YAML (.yaml/.yml) or JSON."""
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RulePackError("YAML rule packs need PyYAML (pip install pyyaml)")
+        try:
+            return yaml.safe_load(raw)
+        except yaml.YAMLError as e:
+            raise RulePackError(str(e))
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        raise RulePackError(str(e))
+
+
+def load(path):
+    """Read, validate and compile the pack at path."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return compile_pack(parse(raw, path), path, hashlib.sha1(raw).hexdigest())
+    except RulePackError as e:
+        raise RulePackError(f"{path}: {e}") from None
+
+
+class PackStore:
+    """
+    The current rule pack for this process, reloaded when its file changes.
+
+    refresh() is cheap enough to call on every request: it stats the file at
+    most every check_interval seconds and only one thread reloads at a time.
+    on_swap(old, new) runs after a new pack has been installed.
+    """
+
+    def __init__(self, path, check_interval=2.0, on_swap=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_swap = on_swap
+        self._lock = threading.Lock()
+        self._pack = None
+        self._signature = None
+        self._checked_at = 0.0
+        self.last_error = None
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def current(self):
+        pack = self._pack
+        if pack is None:
+            with self._lock:
+                if self._pack is None:
+                    self._signature = self._stat()
+                    self._pack = load(self.path)
+                    self._checked_at = time.monotonic()
+                pack = self._pack
+        return pack
+
+    def due(self):
+        """True when refresh() would load or stat the file (async callers run it off the event loop then)."""
+        return self._pack is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def refresh(self, force=False):
+        """Reload the pack if its file changed. Returns True when a new pack was installed."""
+        if self._pack is None:
+            self.current()
+            return False
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False   # another thread is checking; keep serving the current pack
+        try:
+            self._checked_at = now
+            try:
+                signature = self._stat()
+            except OSError as e:
+                self._fail(f"{self.path}: {e}")
+                return False
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            try:
+                new = load(self.path)
+            except (OSError, RulePackError) as e:
+                self._fail(str(e))
+                return False
+            old, self._pack = self._pack, new
+            self.last_error = None
+        finally:
+            self._lock.release()
+        if new.checksum == old.checksum:
+            return False
+        log.info("rule pack %s: version %s -> %s", self.path, old.version, new.version)
+        if self.on_swap:
+            self.on_swap(old, new)
+        return True
+
+    def _fail(self, message):
+        self.last_error = message
+        log.error("rule pack not reloaded, keeping version %s: %s", self._pack.version, message)
@@ -0,0 +1,83 @@
+// Live updates for the dashboard and meal log (see dietitian/live.py).
+// Forms post in the background and patch in the rows they get back; an
+// EventSource applies changes made anywhere else. Without JS the forms
+// still post and redirect as before.
+(function () {
+    "use strict";
+    const root = document.querySelector("[data-live]");
+    if (!root || !window.fetch) return;
+    const view = root.dataset.live;
+    const list = root.querySelector("[data-live-list]");
+    const empty = root.querySelector("[data-live-empty]");
+
+    function element(html) {
+        const t = document.createElement(list.tagName === "TBODY" ? "tbody" : "ul");
+        t.innerHTML = html.trim();
+        return t.firstElementChild;
+    }
+
+    function put(id, html) {
+        const old = list.querySelector('[data-meal-id="' + id + '"]');
+        if (!html) {
+            if (old) old.remove();
+        } else if (old) {
+            old.replaceWith(element(html));
+        } else if (view === "meal_log") {
+            list.prepend(element(html));    // newest day first
+        } else {
+            list.append(element(html));
+        }
+    }
+
+    function apply(data) {
+        (data.meals || []).forEach(function (m) { put(m.id, m.html); });
+        (data.removed || []).forEach(function (id) { put(id, null); });
+        if (data.totals) {
+            const totals = root.querySelector("[data-live-totals]");
+            const fresh = document.createElement("div");
+            fresh.innerHTML = data.totals.trim();
+            if (totals && fresh.firstElementChild) totals.replaceWith(fresh.firstElementChild);
+        }
+        if (empty) empty.hidden = list.children.length > 0;
+    }
+
+    function post(form, body) {
+        return fetch(form.action, {
+            method: "POST", body: body, credentials: "same-origin",
+            headers: {"X-Fragment": view, "Accept": "application/json"},
+        }).then(function (resp) {
+            if (!resp.ok) throw new Error(resp.status);
+            return resp.json();
+        }).then(apply);
+    }
+
+    const add = root.querySelector("form.meal-form");
+    if (add) {
+        add.addEventListener("submit", function (e) {
+            e.preventDefault();
+            post(add, new FormData(add)).then(function () {
+                add.reset();
+                add.querySelector("input[name=meal_name]").focus();
+            }, function () { add.submit(); });
+        });
+    }
+
+    // meal log: ticking a box saves just that row
+    list.addEventListener("change", function (e) {
+        const box = e.target;
+        if (box.type !== "checkbox" || !box.checked) return;
+        const form = box.form;
+        const body = new FormData();
+        body.append(box.name, "on");
+        box.disabled = true;
+        post(form, body).catch(function () { box.disabled = false; });
+    });
+
+    // no data-live-src when the server has streams off (LIVE_STREAMS); a 503
+    // (all streams taken) closes the source and the page keeps its fragments
+    if (window.EventSource && root.dataset.liveSrc) {
+        const source = new EventSource(root.dataset.liveSrc);
+        source.addEventListener("changes", function (e) { apply(JSON.parse(e.data)); });
+        source.addEventListener("reset", function () { source.close(); location.reload(); });
+    }
+})();
@@ -0,0 +1,13 @@
+from export_jobs import render_diet_pdf
+
+
+def _meal(meal, meal_type):
+    return {"meal": meal, "meal_type": meal_type, "calories": 100, "protein": 3, "carbs": 15, "fat": 2}
+
+
+def test_render_several_meals_of_one_type():
+    days = [{"date": "2024-01-01", "meals": [_meal("Idli", "Breakfast"), _meal("Poha", "Breakfast"),
+                                              _meal("Khichdi", "Lunch"), _meal("Sambar", "Lunch"),
+                                              _meal("A long meal name " * 12, "Lunch")]}]
+    pdf = render_diet_pdf("Patient", days)
+    assert pdf.startswith(b"%PDF")
@@ -0,0 +1,10 @@
+from dietitian import create_app
+from dietitian.cli import seeded_query_plans
+
+
+def test_hot_queries_use_indexes():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True, "AUTO_CREATE_SCHEMA": False})
+    with app.app_context():
+        results = seeded_query_plans(patients=100, days=30)
+    scans = {name: (bad, plan) for name, (plan, bad) in results.items() if bad}
+    assert not scans, f"hot queries scan a whole table: {scans}"